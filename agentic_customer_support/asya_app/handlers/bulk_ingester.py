@@ -0,0 +1,337 @@
+"""Bulk ticket ingestion - streams JSONL files into the first actor's queue.
+
+For backfills and replays. Records flow through a generator pipeline
+(files -> lines -> chunks -> envelopes -> batches), so memory stays constant
+however large the input is. Each chunk is validated in one pass with the same
+rules as ticket_ingester.process, valid tickets are wrapped in envelopes and
+published in batches, and a checkpoint of per-file byte offsets is written
+after every published batch so an interrupted run resumes where it stopped.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('ticket_id', 'customer_id', 'message')
+# Marks bulk tickets so ticket_ingester skips interactive admission control and deadlines
+INGEST_MODE = 'backfill'
+DEFAULT_ROUTE = [
+    'ticket-ingester',
+    'intent-classifier',
+    'knowledge-retriever',
+    'response-generator',
+    'response-validator',
+    'response-formatter',
+    'escalation-handler',
+]
+
+# (file, byte offset just past the record, parsed ticket or None, parse error or None)
+Record = Tuple[str, int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def iter_input_files(paths: Iterable[str]) -> Iterator[Path]:
+    """Yield JSONL files: files as given, directories searched recursively in sorted order."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob('*.jsonl') if p.is_file())
+        else:
+            yield path
+
+
+def iter_records(files: Iterable[Path], offsets: Optional[Dict[str, int]] = None) -> Iterator[Record]:
+    """
+    Stream records from JSONL files, starting each file at its checkpoint offset.
+
+    Args:
+        files: Input files
+        offsets: File path -> byte offset already ingested
+
+    Yields:
+        (file, end_offset, ticket, error) per non-blank line
+    """
+    offsets = offsets or {}
+    for path in files:
+        name = str(path)
+        with open(path, 'rb') as fh:
+            offset = offsets.get(name, 0)
+            fh.seek(offset)
+            for line in fh:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    ticket = json.loads(line)
+                except ValueError as exc:
+                    yield name, offset, None, f"invalid JSON: {exc}"
+                    continue
+                if not isinstance(ticket, dict):
+                    yield name, offset, None, "record is not a JSON object"
+                    continue
+                yield name, offset, ticket, None
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(records: List[Record]) -> Tuple[List[Record], List[Tuple[Record, str]]]:
+    """
+    Validate a chunk of records column by column.
+
+    Applies ticket_ingester's rules (required fields, non-empty message) once
+    per chunk instead of once per ticket.
+
+    Returns:
+        (valid records, [(invalid record, error)])
+    """
+    tickets = [record[2] for record in records]
+    errors: List[Optional[str]] = [record[3] for record in records]
+
+    for field in REQUIRED_FIELDS:
+        column = [ticket.get(field) if ticket is not None else None for ticket in tickets]
+        errors = [
+            error or (f"missing required field: {field}" if value is None else None)
+            for error, value in zip(errors, column)
+        ]
+
+    messages = [ticket.get('message') if ticket is not None else None for ticket in tickets]
+    errors = [
+        error or (None if isinstance(message, str) and message.strip() else "Message cannot be empty")
+        for error, message in zip(errors, messages)
+    ]
+
+    valid = [record for record, error in zip(records, errors) if error is None]
+    invalid = [(record, error) for record, error in zip(records, errors) if error is not None]
+    return valid, invalid
+
+
+def make_envelope(ticket: Dict[str, Any], route: List[str], source: str) -> Dict[str, Any]:
+    return {
+        'id': str(uuid.uuid4()),
+        'payload': {**ticket, 'ingest_mode': INGEST_MODE},
+        'route': {'actors': list(route), 'current': 0},
+        'headers': {'ingest_source': source},
+    }
+
+
+class LocalQueuePublisher:
+    """Publishes batches to a LocalBroker (tests, dry runs)."""
+
+    def __init__(self, broker: Any, send_timeout: Optional[float] = None):
+        self.broker = broker
+        self.send_timeout = send_timeout
+
+    def publish_batch(self, actor: str, envelopes: List[Dict[str, Any]]) -> None:
+        queue = self.broker.queue_for_actor(actor)
+        for envelope in envelopes:
+            queue.send(envelope, timeout=self.send_timeout)
+
+    def queue_depth(self, actor: str) -> int:
+        return len(self.broker.queue_for_actor(actor))
+
+
+class SqsPublisher:
+    """Publishes batches to the Asya SQS queue of an actor (asya-<actor>)."""
+
+    MAX_BATCH = 10  # SQS SendMessageBatch limit
+
+    def __init__(self, queue_url_template: str, client: Any = None, endpoint_url: Optional[str] = None):
+        """
+        Args:
+            queue_url_template: Queue URL with an {actor} placeholder, e.g.
+                'https://sqs.us-east-1.amazonaws.com/123/asya-{actor}'
+            client: Optional boto3 SQS client
+            endpoint_url: Optional endpoint (LocalStack)
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError as exc:
+                raise ImportError("SqsPublisher requires boto3") from exc
+            client = boto3.client('sqs', endpoint_url=endpoint_url)
+        self.client = client
+        self.queue_url_template = queue_url_template
+
+    def publish_batch(self, actor: str, envelopes: List[Dict[str, Any]]) -> None:
+        queue_url = self.queue_url_template.format(actor=actor)
+        for batch in chunked(envelopes, self.MAX_BATCH):
+            response = self.client.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[{'Id': str(i), 'MessageBody': json.dumps(env)} for i, env in enumerate(batch)],
+            )
+            if response.get('Failed'):
+                raise RuntimeError(f"SQS rejected {len(response['Failed'])} message(s): {response['Failed'][:3]}")
+
+    def queue_depth(self, actor: str) -> int:
+        attributes = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url_template.format(actor=actor),
+            AttributeNames=['ApproximateNumberOfMessages'],
+        )
+        return int(attributes['Attributes']['ApproximateNumberOfMessages'])
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, int]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return {name: int(offset) for name, offset in json.load(fh).get('offsets', {}).items()}
+
+
+def save_checkpoint(path: Optional[str], offsets: Dict[str, int]) -> None:
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as fh:
+        json.dump({'offsets': offsets, 'saved_at': time.time()}, fh)
+    os.replace(tmp, path)
+
+
+class BulkIngester:
+    """Streams tickets from JSONL inputs into the first actor's queue."""
+
+    def __init__(
+        self,
+        publisher: Any,
+        route: Optional[List[str]] = None,
+        chunk_size: int = 1000,
+        batch_size: int = 100,
+        max_queue_depth: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        update_checkpoint: bool = True,
+        report_every_s: float = 10.0,
+        backoff_s: float = 0.05,
+        max_backoff_s: float = 5.0
+    ):
+        """
+        Initialize the bulk ingester.
+
+        Args:
+            publisher: Object with publish_batch(actor, envelopes) and queue_depth(actor)
+            route: Actor route for each envelope (defaults to the full pipeline)
+            chunk_size: Records validated together
+            batch_size: Envelopes per publish call
+            max_queue_depth: Pause publishing while the first queue is deeper than this
+            checkpoint_path: File holding per-file byte offsets for resume
+            update_checkpoint: Save progress to checkpoint_path; False only reads it, so
+                a run that publishes nothing (dry run) cannot skip records of the next one
+            report_every_s: Interval between progress log lines
+            backoff_s: Initial backpressure sleep, doubled up to max_backoff_s
+            max_backoff_s: Longest single backpressure sleep
+        """
+        self.publisher = publisher
+        self.route = list(route or DEFAULT_ROUTE)
+        self.chunk_size = int(chunk_size)
+        self.batch_size = int(batch_size)
+        self.max_queue_depth = max_queue_depth
+        self.checkpoint_path = checkpoint_path
+        self.update_checkpoint = update_checkpoint
+        self.report_every_s = report_every_s
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+
+    def _wait_for_capacity(self, stats: Dict[str, Any]) -> None:
+        if self.max_queue_depth is None:
+            return
+        delay = self.backoff_s
+        started = time.monotonic()
+        waited = False
+        while self.publisher.queue_depth(self.route[0]) > self.max_queue_depth:
+            waited = True
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_backoff_s)
+        if waited:
+            stats['backpressure_waits'] += 1
+            stats['backpressure_wait_s'] += time.monotonic() - started
+
+    def run(self, paths: Iterable[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ingest every record under paths.
+
+        Args:
+            paths: JSONL files and/or directories
+            limit: Stop after publishing this many tickets (the rest is resumable)
+
+        Returns:
+            Throughput report
+        """
+        offsets = load_checkpoint(self.checkpoint_path)
+        stats: Dict[str, Any] = {
+            'read': 0,
+            'valid': 0,
+            'invalid': 0,
+            'published': 0,
+            'batches': 0,
+            'backpressure_waits': 0,
+            'backpressure_wait_s': 0.0,
+            'invalid_samples': [],
+        }
+        started = last_report = time.monotonic()
+        first_actor = self.route[0]
+
+        records = iter_records(iter_input_files(paths), offsets)
+        for chunk in chunked(records, self.chunk_size):
+            valid, invalid = validate_chunk(chunk)
+            stats['read'] += len(chunk)
+            stats['valid'] += len(valid)
+            stats['invalid'] += len(invalid)
+            for (name, offset, _, _), error in invalid[: max(0, 10 - len(stats['invalid_samples']))]:
+                stats['invalid_samples'].append({'file': name, 'offset': offset, 'error': error})
+
+            # Checkpoint offsets only advance up to the first unpublished record
+            pending = {(name, offset) for name, offset, _, _ in valid}
+            for batch in chunked(valid, self.batch_size):
+                if limit is not None:
+                    batch = batch[: max(0, limit - stats['published'])]
+                    if not batch:
+                        break
+                self._wait_for_capacity(stats)
+                self.publisher.publish_batch(
+                    first_actor, [make_envelope(ticket, self.route, name) for name, _, ticket, _ in batch]
+                )
+                stats['published'] += len(batch)
+                stats['batches'] += 1
+                pending.difference_update((name, offset) for name, offset, _, _ in batch)
+                self._advance(offsets, chunk, pending)
+                self._save_checkpoint(offsets)
+
+            if limit is not None and stats['published'] >= limit:
+                break
+            self._advance(offsets, chunk, pending)
+            self._save_checkpoint(offsets)
+
+            now = time.monotonic()
+            if now - last_report >= self.report_every_s:
+                last_report = now
+                logger.info(f"Bulk ingest progress: {stats['published']} published, {stats['published'] / (now - started):.0f} tickets/s")
+
+        elapsed = time.monotonic() - started
+        stats['elapsed_s'] = round(elapsed, 3)
+        stats['tickets_per_s'] = round(stats['published'] / elapsed, 1) if elapsed > 0 else 0.0
+        stats['backpressure_wait_s'] = round(stats['backpressure_wait_s'], 3)
+        stats['checkpoint'] = dict(offsets)
+        logger.info(f"Bulk ingest finished: {stats['published']} published, {stats['invalid']} invalid, {stats['tickets_per_s']} tickets/s")
+        return stats
+
+    def _save_checkpoint(self, offsets: Dict[str, int]) -> None:
+        if self.update_checkpoint:
+            save_checkpoint(self.checkpoint_path, offsets)
+
+    @staticmethod
+    def _advance(offsets: Dict[str, int], chunk: List[Record], pending: set) -> None:
+        """Move each file's offset past the records of the chunk that are fully handled."""
+        for name, offset, _, _ in chunk:
+            if (name, offset) in pending:
+                break
+            offsets[name] = offset
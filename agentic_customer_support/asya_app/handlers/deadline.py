@@ -0,0 +1,80 @@
+"""Deadline helpers - carries the end-to-end latency budget through the pipeline."""
+
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_S = float(os.getenv('TICKET_DEADLINE_S', '5.0'))
+
+
+def stamp_deadline(payload: Dict[str, Any], budget_s: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Stamp an absolute deadline onto the ticket.
+
+    A deadline already present (e.g. set by the client) is kept.
+
+    Args:
+        payload: Ticket payload
+        budget_s: Seconds from now; defaults to TICKET_DEADLINE_S (5s)
+
+    Returns:
+        Payload with 'deadline_at' (epoch seconds)
+    """
+    if payload.get('deadline_at') is None:
+        budget = DEFAULT_BUDGET_S if budget_s is None else budget_s
+        payload['deadline_at'] = time.time() + budget
+    return payload
+
+
+def remaining_budget(payload: Dict[str, Any], headers: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    """
+    Seconds left before the ticket's deadline.
+
+    Args:
+        payload: Ticket payload
+        headers: Envelope headers, consulted when the payload has no deadline
+
+    Returns:
+        Remaining seconds (negative once expired), or None without a deadline
+    """
+    deadline = payload.get('deadline_at')
+    if deadline is None and headers:
+        deadline = headers.get('deadline_at')
+    if deadline is None:
+        return None
+    try:
+        return float(deadline) - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+def shed_if_expired(payload: Dict[str, Any], stage: str, headers: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Mark an expired ticket so later stages skip it and it goes to a human.
+
+    Expired tickets get validation_status 'expired'; every stage already passes
+    through tickets that are not 'valid', and the escalation handler picks them up.
+
+    Args:
+        payload: Ticket payload
+        stage: Name of the stage doing the check (recorded for diagnostics)
+        headers: Optional envelope headers
+
+    Returns:
+        True when the ticket was shed
+    """
+    if payload.get('validation_status') != 'valid':
+        return payload.get('validation_status') == 'expired'
+
+    remaining = remaining_budget(payload, headers)
+    if remaining is None or remaining > 0:
+        return False
+
+    payload['validation_status'] = 'expired'
+    payload['expired_at_stage'] = stage
+    payload['escalate'] = True
+    logger.warning(f"Ticket {payload.get('ticket_id')} expired before {stage} ({-remaining:.3f}s late); shedding")
+    return True
@@ -0,0 +1,192 @@
+"""Duplicate ticket suppression - probabilistic filter plus exact recent-key store."""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RotatingBloomFilter:
+    """
+    Time-windowed Bloom filter.
+
+    Keeps `generations` fixed-size bit arrays, each covering window_s seconds.
+    New keys go into the newest generation; lookups check all of them; the
+    oldest generation is dropped on rotation. Memory is fixed at construction:
+    generations * bits_per_generation / 8 bytes, however many tickets arrive.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01, window_s: float = 43200.0, generations: int = 2):
+        """
+        Initialize the filter.
+
+        Args:
+            capacity: Expected keys per generation window
+            error_rate: Target false-positive rate at capacity
+            window_s: Seconds covered by one generation
+            generations: Number of generations kept (coverage = generations * window_s)
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        self.window_s = float(window_s)
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(self.error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self._generations: List[bytearray] = [bytearray((self.num_bits + 7) // 8) for _ in range(max(1, generations))]
+        self._rotated_at = time.monotonic()
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(bits) for bits in self._generations)
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _maybe_rotate(self) -> None:
+        now = time.monotonic()
+        elapsed = int((now - self._rotated_at) // self.window_s)
+        if elapsed <= 0:
+            return
+        for _ in range(min(elapsed, len(self._generations))):
+            self._generations.pop()
+            self._generations.insert(0, bytearray((self.num_bits + 7) // 8))
+        self._rotated_at += elapsed * self.window_s
+
+    def add(self, key: str) -> None:
+        self._maybe_rotate()
+        bits = self._generations[0]
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        self._maybe_rotate()
+        positions = self._positions(key)
+        return any(
+            all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+            for bits in self._generations
+        )
+
+
+class RecentKeyStore:
+    """Bounded exact store of recent keys with a TTL (LRU eviction beyond max_entries)."""
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: float = 3600.0):
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry['seen_at'] > self.ttl_s:
+            del self._entries[key]
+            return None
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', message.lower()).split())
+
+
+class DuplicateSuppressor:
+    """
+    Detects re-submitted tickets by ticket_id and by (customer_id, normalized message).
+
+    The Bloom filter answers "definitely new" for almost every ticket without
+    touching the exact store. Keys it reports as seen are confirmed against the
+    exact store, which knows the original ticket id; a Bloom hit whose key has
+    already left the exact store (or is a false positive) is let through and
+    flagged as a possible duplicate, so the filter never drops a ticket alone.
+    """
+
+    def __init__(self, bloom: RotatingBloomFilter = None, store: RecentKeyStore = None):
+        self.bloom = bloom if bloom is not None else RotatingBloomFilter()
+        self.store = store if store is not None else RecentKeyStore()
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'duplicates': 0, 'possible_duplicates': 0}
+
+    @classmethod
+    def from_env(cls) -> 'DuplicateSuppressor':
+        """Build a suppressor from DEDUP_* environment variables."""
+        return cls(
+            bloom=RotatingBloomFilter(
+                capacity=int(os.getenv('DEDUP_EXPECTED_PER_WINDOW', '1000000')),
+                error_rate=float(os.getenv('DEDUP_ERROR_RATE', '0.01')),
+                window_s=float(os.getenv('DEDUP_WINDOW_S', '43200')),
+            ),
+            store=RecentKeyStore(
+                max_entries=int(os.getenv('DEDUP_EXACT_MAX_ENTRIES', '100000')),
+                ttl_s=float(os.getenv('DEDUP_EXACT_TTL_S', '3600')),
+            ),
+        )
+
+    @staticmethod
+    def keys_for(payload: Dict[str, Any]) -> List[str]:
+        normalized = normalize_message(str(payload.get('message', '')))
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+        return [f"id:{payload.get('ticket_id')}", f"msg:{payload.get('customer_id')}:{digest}"]
+
+    def check(self, payload: Dict[str, Any], remember: bool = True) -> Dict[str, Any]:
+        """
+        Classify a ticket and remember it.
+
+        Args:
+            payload: Ticket with ticket_id, customer_id and message
+            remember: Record the ticket if it is not a duplicate; pass False
+                when it may still be turned away, and call remember() once
+                it is accepted, so a retry is not taken for a copy
+
+        Returns:
+            {'status': 'new' | 'duplicate' | 'possible_duplicate'} plus
+            'duplicate_of' (original ticket id) for duplicates
+        """
+        keys = self.keys_for(payload)
+        with self._lock:
+            self.stats['checked'] += 1
+            seen = [key for key in keys if key in self.bloom]
+            for key in seen:
+                entry = self.store.get(key)
+                if entry is not None:
+                    entry['duplicate_count'] += 1
+                    self.stats['duplicates'] += 1
+                    return {'status': 'duplicate', 'duplicate_of': entry['ticket_id'], 'matched_on': key.split(':', 1)[0]}
+
+            if remember:
+                self._remember(payload.get('ticket_id'), keys)
+            if seen:
+                self.stats['possible_duplicates'] += 1
+                return {'status': 'possible_duplicate'}
+            return {'status': 'new'}
+
+    def remember(self, payload: Dict[str, Any]) -> None:
+        """Record an accepted ticket, so later copies are reported as duplicates."""
+        with self._lock:
+            self._remember(payload.get('ticket_id'), self.keys_for(payload))
+
+    def _remember(self, ticket_id: Any, keys: List[str]) -> None:
+        entry = {'ticket_id': ticket_id, 'seen_at': time.monotonic(), 'duplicate_count': 0}
+        for key in keys:
+            self.bloom.add(key)
+            self.store.put(key, entry)
@@ -23,7 +23,9 @@ def process(payload: Dict[str, Any]) -> Dict[str, Any]:
     logger.info(f"Handling escalation for ticket: {ticket_id}")
     
     # Determine if escalation is needed
+    expired = payload.get('validation_status') == 'expired'
     should_escalate = (
+        expired or
         urgency == 'high' or
         payload.get('judge_score', 1.0) < 0.5 or
         payload.get('escalate', False)
@@ -32,6 +34,8 @@ def process(payload: Dict[str, Any]) -> Dict[str, Any]:
     if should_escalate:
         payload['escalated'] = True
         payload['escalation_reason'] = (
+            'deadline_expired' if expired else
+            'refinement_exhausted' if payload.get('refinement_outcome') in ('max_attempts', 'deadline') else
             'high_urgency' if urgency == 'high' else
             'low_quality_response' if payload.get('judge_score', 1.0) < 0.5 else
             'manual_escalation'
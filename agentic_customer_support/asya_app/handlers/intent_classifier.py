@@ -3,8 +3,33 @@
 import logging
 from typing import Dict, Any
 
+from .deadline import shed_if_expired
+
 logger = logging.getLogger(__name__)
 
+URGENT_KEYWORDS = ['urgent', 'asap', 'immediately', 'critical', 'emergency']
+MEDIUM_URGENCY_KEYWORDS = ['soon', 'quickly', 'fast']
+
+
+def classify_urgency(message: str) -> str:
+    """
+    Classify urgency level from keywords.
+    
+    Cheap enough to run at ingestion, before full classification.
+    
+    Args:
+        message: Lower-cased customer message
+    
+    Returns:
+        'high', 'medium' or 'low'
+    """
+    if any(word in message for word in URGENT_KEYWORDS):
+        return 'high'
+    elif any(word in message for word in MEDIUM_URGENCY_KEYWORDS):
+        return 'medium'
+    else:
+        return 'low'
+
 
 class IntentClassifier:
     """Classifies customer support ticket intent and urgency."""
@@ -31,6 +56,7 @@ class IntentClassifier:
         Returns:
             Payload enriched with intent and urgency classifications
         """
+        shed_if_expired(payload, 'intent-classifier')
         if payload.get('validation_status') != 'valid':
             logger.warning(f"Skipping classification for invalid ticket: {payload.get('ticket_id')}")
             return payload
@@ -67,11 +93,5 @@ class IntentClassifier:
     
     def _classify_urgency(self, message: str) -> str:
         """Classify urgency level."""
-        urgent_keywords = ['urgent', 'asap', 'immediately', 'critical', 'emergency']
-        if any(word in message for word in urgent_keywords):
-            return 'high'
-        elif any(word in message for word in ['soon', 'quickly', 'fast']):
-            return 'medium'
-        else:
-            return 'low'
+        return classify_urgency(message)
 
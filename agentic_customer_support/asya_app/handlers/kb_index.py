@@ -0,0 +1,586 @@
+"""Knowledge base index - BM25 inverted index over markdown passages, persisted for mmap loading."""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): every process uses the first slot
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from had has have how i if in into is it its
+me my no not of on or our please so that the their them then there these they this to was we were
+what when where which who why will with would you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens without stopwords, with light suffix stripping."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 5 and token.endswith('ing'):
+            token = token[:-3]
+        elif len(token) > 4 and token.endswith('ed'):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_markdown(text: str, source: str) -> Iterator[Dict[str, Any]]:
+    """
+    Split a markdown document into passages: one per paragraph, titled by its heading.
+
+    Args:
+        text: Markdown content
+        source: Path of the document relative to the KB root
+
+    Yields:
+        Passage dicts with source, title and content
+    """
+    title = Path(source).stem.replace('_', ' ')
+    paragraph: List[str] = []
+
+    def flush():
+        content = ' '.join(line.strip() for line in paragraph).strip()
+        paragraph.clear()
+        if content:
+            return {'source': source, 'title': title, 'content': content}
+        return None
+
+    for line in text.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading or not line.strip():
+            passage = flush()
+            if passage:
+                yield passage
+            if heading:
+                title = heading.group(1).strip()
+            continue
+        paragraph.append(line)
+    passage = flush()
+    if passage:
+        yield passage
+
+
+def iter_kb_files(kb_root: Path) -> Iterator[Path]:
+    """Markdown files under the KB root, in sorted order."""
+    yield from sorted(p for p in kb_root.rglob('*.md') if p.is_file())
+
+
+def kb_manifest(kb_root: Path) -> Dict[str, List[int]]:
+    """Relative path -> [mtime_ns, size] for every KB file."""
+    manifest = {}
+    for path in iter_kb_files(kb_root):
+        stat = path.stat()
+        manifest[path.relative_to(kb_root).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+    return manifest
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring.
+
+    Postings store a precomputed BM25 term-frequency component ("impact") per
+    (term, passage), so a query only multiplies by idf and sums. Postings of
+    each term are sorted by impact, which lets very common terms be truncated
+    to their max_postings_per_term best passages: latency stays bounded as the
+    KB grows, and the skipped postings are the lowest-scoring ones of the
+    lowest-idf terms.
+
+    On disk (index_dir):
+        meta.json            vocabulary (term -> [start, df]), BM25 parameters, KB manifest
+        doc_ids.u32          posting passage ids, grouped by term
+        impacts.f32          posting impacts, parallel to doc_ids
+        passages.jsonl       one JSON passage per line
+        passage_offsets.u64  byte offset of each passage line
+    Binary arrays use native byte order and are memory-mapped on load.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, List[int]],
+        doc_ids: Any,
+        impacts: Any,
+        passage_reader: Any,
+        num_passages: int,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_postings_per_term: int = 5000,
+        manifest: Optional[Dict[str, List[int]]] = None,
+        sources: Optional[Dict[str, List[int]]] = None
+    ):
+        self.vocab = vocab
+        self._doc_ids = doc_ids
+        self._impacts = impacts
+        self._passages = passage_reader
+        self.num_passages = num_passages
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max_postings_per_term
+        self.manifest = manifest or {}
+        # Passages of a file are contiguous: source -> [first doc id, last doc id + 1]
+        self.sources = sources or {}
+
+    # --- building ---
+    @classmethod
+    def build(cls, passages: Iterable[Dict[str, Any]], k1: float = 1.2, b: float = 0.75, **kwargs) -> 'BM25Index':
+        """Build an in-memory index from passage dicts (source, title, content)."""
+        passages = list(passages)
+        term_freqs: List[Counter] = []
+        for passage in passages:
+            term_freqs.append(Counter(tokenize(f"{passage.get('title', '')} {passage['content']}")))
+        lengths = [sum(tf.values()) for tf in term_freqs]
+        avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        postings: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        for doc_id, (tf, length) in enumerate(zip(term_freqs, lengths)):
+            norm = k1 * (1 - b + b * length / avgdl) if avgdl else k1
+            for term, freq in tf.items():
+                postings[term].append((freq * (k1 + 1) / (freq + norm), doc_id))
+
+        vocab: Dict[str, List[int]] = {}
+        doc_ids = array('I')
+        impacts = array('f')
+        for term in sorted(postings):
+            entries = sorted(postings[term], reverse=True)
+            vocab[term] = [len(doc_ids), len(entries)]
+            doc_ids.extend(doc_id for _, doc_id in entries)
+            impacts.extend(impact for impact, _ in entries)
+
+        sources: Dict[str, List[int]] = {}
+        for doc_id, passage in enumerate(passages):
+            sources.setdefault(passage['source'], [doc_id, doc_id])[1] = doc_id + 1
+
+        return cls(vocab, doc_ids, impacts, _ListPassages(passages), len(passages), k1=k1, b=b, sources=sources, **kwargs)
+
+    @classmethod
+    def build_from_directory(cls, kb_root: str, only: Optional[Iterable[str]] = None, **kwargs) -> 'BM25Index':
+        """Build an index from the markdown files under kb_root (all, or the relative paths in only)."""
+        root = Path(kb_root)
+        wanted = set(only) if only is not None else None
+        manifest = kb_manifest(root)
+        passages = []
+        for path in iter_kb_files(root):
+            source = path.relative_to(root).as_posix()
+            if wanted is not None and source not in wanted:
+                manifest.pop(source, None)
+                continue
+            passages.extend(split_markdown(path.read_text(encoding='utf-8'), source))
+        index = cls.build(passages, **kwargs)
+        index.manifest = manifest
+        logger.info(f"Built BM25 index: {index.num_passages} passages, {len(index.vocab)} terms from {root}")
+        return index
+
+    # --- persistence ---
+    def save(self, index_dir: str) -> None:
+        """Write the index files; meta.json is replaced last so readers never see a partial index."""
+        out = Path(index_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / 'doc_ids.u32', 'wb') as fh:
+            array('I', self._doc_ids).tofile(fh)
+        with open(out / 'impacts.f32', 'wb') as fh:
+            array('f', self._impacts).tofile(fh)
+        offsets = array('Q')
+        with open(out / 'passages.jsonl', 'wb') as fh:
+            for doc_id in range(self.num_passages):
+                offsets.append(fh.tell())
+                fh.write(json.dumps(self._passages[doc_id], ensure_ascii=False).encode('utf-8') + b'\n')
+        with open(out / 'passage_offsets.u64', 'wb') as fh:
+            offsets.tofile(fh)
+        meta = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'k1': self.k1,
+            'b': self.b,
+            'num_passages': self.num_passages,
+            'vocab': self.vocab,
+            'manifest': self.manifest,
+            'sources': self.sources,
+        }
+        tmp = out / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, out / 'meta.json')
+
+    @classmethod
+    def load(cls, index_dir: str, **kwargs) -> 'BM25Index':
+        """Memory-map a saved index."""
+        root = Path(index_dir)
+        meta = json.loads((root / 'meta.json').read_text())
+        if meta.get('format_version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported KB index format: {meta.get('format_version')}")
+        return cls(
+            meta['vocab'],
+            _mmap_array(root / 'doc_ids.u32', 'I'),
+            _mmap_array(root / 'impacts.f32', 'f'),
+            _MmapPassages(root / 'passages.jsonl', _mmap_array(root / 'passage_offsets.u64', 'Q')),
+            meta['num_passages'],
+            k1=meta['k1'],
+            b=meta['b'],
+            manifest=meta.get('manifest'),
+            sources=meta.get('sources'),
+            **kwargs,
+        )
+
+    # --- querying ---
+    def idf(self, df: int, num_passages: Optional[int] = None) -> float:
+        n = self.num_passages if num_passages is None else num_passages
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def postings(self, term: str) -> Tuple[Any, Any]:
+        """(doc ids, impacts) of a term, best first and truncated to max_postings_per_term."""
+        entry = self.vocab.get(term)
+        if entry is None:
+            return (), ()
+        start, df = entry
+        end = start + min(df, self.max_postings_per_term)
+        return self._doc_ids[start:end], self._impacts[start:end]
+
+    def passage(self, doc_id: int) -> Dict[str, Any]:
+        return dict(self._passages[doc_id])
+
+    def search(self, query: str, top_k: int = 3, extra_terms: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Score passages against a query.
+
+        Args:
+            query: Free text (e.g. the ticket message)
+            top_k: Number of passages to return
+            extra_terms: Additional raw terms (e.g. the intent), tokenized like the query
+
+        Returns:
+            Passages with 'relevance_score' (BM25 score divided by the query's
+            maximum attainable score, 0-1) and 'bm25_score'
+        """
+        counts = Counter(tokenize(query))
+        for term in extra_terms:
+            counts.update(tokenize(term))
+
+        scores: Dict[int, float] = {}
+        upper_bound = 0.0
+        for term, qtf in counts.items():
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            weight = self.idf(entry[1]) * qtf
+            upper_bound += weight * (self.k1 + 1)
+            get = scores.get
+            for doc_id, impact in zip(*self.postings(term)):
+                scores[doc_id] = get(doc_id, 0.0) + weight * impact
+
+        results = []
+        for doc_id, score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1]):
+            passage = self.passage(doc_id)
+            passage['bm25_score'] = round(score, 4)
+            passage['relevance_score'] = round(score / upper_bound, 4) if upper_bound else 0.0
+            results.append(passage)
+        return results
+
+
+def _mmap_array(path: Path, typecode: str) -> Any:
+    """Read-only, zero-copy view of a binary array file."""
+    if path.stat().st_size == 0:
+        return array(typecode)
+    with open(path, 'rb') as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+class _ListPassages:
+    def __init__(self, passages: List[Dict[str, Any]]):
+        self._passages = passages
+
+    def __getitem__(self, doc_id: int) -> Dict[str, Any]:
+        return self._passages[doc_id]
+
+
+class _MmapPassages:
+    def __init__(self, path: Path, offsets: Any):
+        with open(path, 'rb') as fh:
+            self._data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if path.stat().st_size else b''
+        self._offsets = offsets
+
+    def __getitem__(self, doc_id: int) -> Dict[str, Any]:
+        start = self._offsets[doc_id]
+        end = self._data.find(b'\n', start)
+        return json.loads(self._data[start:end if end >= 0 else len(self._data)])
+
+
+class SegmentedIndex:
+    """
+    BM25 search over a base segment plus delta segments.
+
+    A KB change does not rebuild the index: changed and added files are
+    indexed into a new delta segment, and their older passages (and those of
+    deleted files) are tombstoned by source in the segments that hold them.
+    Scores use collection-wide statistics (live passage count, summed document
+    frequency), so a passage ranks the same whichever segment it lives in; the
+    document frequency still counts tombstoned passages until the segments are
+    merged, as in Lucene. Instances are immutable: refresh_index() returns a
+    new one, so in-flight searches keep a consistent view.
+
+    On disk (index_dir):
+        segments.json     version, segment names, tombstoned sources, KB manifest
+        segments/<name>/  one BM25Index per segment
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        segments: List[Tuple[str, BM25Index]],
+        tombstones: Dict[str, List[str]],
+        manifest: Dict[str, List[int]],
+        version: int
+    ):
+        self.index_dir = index_dir
+        self.segments = segments
+        self.tombstones = tombstones
+        self.manifest = manifest
+        self.version = version
+        self._dead: List[set] = []
+        for name, segment in segments:
+            dead = set()
+            for source in tombstones.get(name, ()):
+                start, end = segment.sources.get(source, (0, 0))
+                dead.update(range(start, end))
+            self._dead.append(dead)
+        self.num_passages = sum(seg.num_passages for _, seg in segments) - sum(len(d) for d in self._dead)
+
+    @property
+    def live_sources(self) -> Dict[str, str]:
+        """KB file -> segment holding its current passages."""
+        live = {}
+        for name, segment in self.segments:
+            dead = set(self.tombstones.get(name, ()))
+            live.update({source: name for source in segment.sources if source not in dead})
+        return live
+
+    def search(self, query: str, top_k: int = 3, extra_terms: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Same contract as BM25Index.search, across all live passages."""
+        counts = Counter(tokenize(query))
+        for term in extra_terms:
+            counts.update(tokenize(term))
+        if not self.segments:
+            return []
+        k1 = self.segments[0][1].k1
+
+        scores: Dict[Tuple[int, int], float] = {}
+        upper_bound = 0.0
+        for term, qtf in counts.items():
+            df = sum(seg.vocab[term][1] for _, seg in self.segments if term in seg.vocab)
+            if not df:
+                continue
+            weight = self.segments[0][1].idf(df, max(self.num_passages, df)) * qtf
+            upper_bound += weight * (k1 + 1)
+            get = scores.get
+            for seg_no, (_, segment) in enumerate(self.segments):
+                dead = self._dead[seg_no]
+                for doc_id, impact in zip(*segment.postings(term)):
+                    if doc_id in dead:
+                        continue
+                    key = (seg_no, doc_id)
+                    scores[key] = get(key, 0.0) + weight * impact
+
+        results = []
+        for (seg_no, doc_id), score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1]):
+            passage = self.segments[seg_no][1].passage(doc_id)
+            passage['bm25_score'] = round(score, 4)
+            passage['relevance_score'] = round(score / upper_bound, 4) if upper_bound else 0.0
+            results.append(passage)
+        return results
+
+    def save_state(self) -> None:
+        """Write segments.json atomically; this is the commit point of an update."""
+        state = {
+            'version': self.version,
+            'segments': [name for name, _ in self.segments],
+            'tombstones': self.tombstones,
+            'manifest': self.manifest,
+        }
+        tmp = os.path.join(self.index_dir, 'segments.json.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(state, fh)
+        os.replace(tmp, os.path.join(self.index_dir, 'segments.json'))
+
+
+def fuse(
+    lexical: List[Dict[str, Any]],
+    dense: List[Dict[str, Any]],
+    alpha: float = 0.5,
+    top_k: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    Hybrid ranking: alpha * dense relevance + (1 - alpha) * lexical relevance.
+
+    Both inputs carry relevance_score in 0-1; a passage missing from one list
+    scores 0 there. Passages are matched on (source, content).
+
+    Returns:
+        Top passages with 'relevance_score' set to the fused score and
+        'retrieval' set to 'hybrid'
+    """
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for weight, results in ((1 - alpha, lexical), (alpha, dense)):
+        for passage in results:
+            key = (passage.get('source'), passage.get('content'))
+            entry = merged.setdefault(key, {**passage, 'relevance_score': 0.0})
+            entry.update({k: v for k, v in passage.items() if k.endswith('_score') and k != 'relevance_score'})
+            entry['relevance_score'] += weight * passage.get('relevance_score', 0.0)
+    ranked = sorted(merged.values(), key=lambda p: p['relevance_score'], reverse=True)[:top_k]
+    for passage in ranked:
+        passage['relevance_score'] = round(passage['relevance_score'], 4)
+        passage['retrieval'] = 'hybrid'
+    return ranked
+
+
+# KB digest -> (index dir, open lock file) of the slot this process holds
+_claimed_slots: Dict[str, Tuple[str, Any]] = {}
+_claim_lock = threading.Lock()
+
+
+def default_index_dir(kb_root: str) -> str:
+    """
+    Index directory used when none is configured, under the system temp dir so
+    it is writable even when the KB is a read-only mount.
+
+    The directory is keyed on the KB's absolute path, so a restarted process
+    picks up the index its predecessor left instead of rebuilding it. Processes
+    on one host (e.g. several replicas) each hold an exclusive lock on one
+    slot, '<digest>-0', '<digest>-1', ..., so they never write segments into
+    each other's directory, and there are never more directories than
+    replicas that ran at once.
+    """
+    digest = hashlib.blake2b(os.path.realpath(kb_root).encode('utf-8'), digest_size=8).hexdigest()
+    with _claim_lock:
+        if digest not in _claimed_slots:
+            base = os.path.join(tempfile.gettempdir(), 'kb-index')
+            os.makedirs(base, exist_ok=True)
+            slot = 0
+            while True:
+                index_dir = os.path.join(base, f"{digest}-{slot}")
+                lock_file = open(f"{index_dir}.lock", 'a')
+                if fcntl is None:
+                    break
+                try:
+                    # Held until the process exits
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    lock_file.close()
+                    slot += 1
+            _claimed_slots[digest] = (index_dir, lock_file)
+        return _claimed_slots[digest][0]
+
+
+def _write_segment(index_dir: str, name: str, kb_root: str, only: Optional[Iterable[str]] = None, **kwargs) -> Tuple[str, BM25Index]:
+    path = os.path.join(index_dir, 'segments', name)
+    BM25Index.build_from_directory(kb_root, only=only, **kwargs).save(path)
+    return name, BM25Index.load(path, **kwargs)
+
+
+def _full_rebuild(kb_root: str, index_dir: str, version: int, **kwargs) -> SegmentedIndex:
+    # Base segments get their own name, so a merge never overwrites the delta segment of its version
+    base = _write_segment(index_dir, f"base-{version:06d}", kb_root, **kwargs)
+    index = SegmentedIndex(index_dir, [base], {}, kb_manifest(Path(kb_root)), version)
+    index.save_state()
+    return index
+
+
+def open_index(kb_root: str, index_dir: Optional[str] = None, **kwargs) -> SegmentedIndex:
+    """
+    Load the persisted index for a KB and bring it up to date with the KB files.
+
+    Args:
+        kb_root: Directory of markdown files
+        index_dir: Where the index lives (default: default_index_dir(kb_root))
+    """
+    index_dir = index_dir or default_index_dir(kb_root)
+    state_path = os.path.join(index_dir, 'segments.json')
+    if not os.path.exists(state_path):
+        return _full_rebuild(kb_root, index_dir, 1, **kwargs)
+    with open(state_path) as fh:
+        state = json.load(fh)
+    segments = [
+        (name, BM25Index.load(os.path.join(index_dir, 'segments', name), **kwargs))
+        for name in state['segments']
+    ]
+    index = SegmentedIndex(index_dir, segments, state['tombstones'], state['manifest'], state['version'])
+    logger.info(f"Loaded KB index v{index.version} from {index_dir} ({index.num_passages} passages, {len(segments)} segments)")
+    return refresh_index(index, kb_root, **kwargs)
+
+
+def refresh_index(index: SegmentedIndex, kb_root: str, max_segments: int = 4, **kwargs) -> SegmentedIndex:
+    """
+    Apply KB file changes to an index as a new version.
+
+    Added and changed files go into one new delta segment; older passages of
+    changed and deleted files are tombstoned. When there are more than
+    max_segments segments, or tombstones cover half the passages, everything is
+    merged into a fresh base segment instead. Returns the same index when
+    nothing changed.
+
+    Args:
+        index: Current index (left untouched)
+        kb_root: Directory of markdown files
+        max_segments: Segment count that triggers a merge
+    """
+    current = kb_manifest(Path(kb_root))
+    if current == index.manifest:
+        return index
+    changed = [source for source, stat in current.items() if index.manifest.get(source) != stat]
+    removed = [source for source in index.manifest if source not in current]
+    version = index.version + 1
+
+    live = index.live_sources
+    tombstones = {name: list(sources) for name, sources in index.tombstones.items()}
+    for source in changed + removed:
+        if source in live:
+            tombstones.setdefault(live[source], []).append(source)
+    segments = list(index.segments)
+    if changed:
+        segments.append(_write_segment(index.index_dir, f"seg-{version:06d}", kb_root, only=changed, **kwargs))
+
+    updated = SegmentedIndex(index.index_dir, segments, tombstones, current, version)
+    total = sum(seg.num_passages for _, seg in segments)
+    if len(segments) > max_segments or (total and updated.num_passages < total / 2):
+        updated = _full_rebuild(kb_root, index.index_dir, version, **kwargs)
+    else:
+        updated.save_state()
+    _remove_unused_segments(updated)
+    logger.info(
+        f"KB index v{version}: {len(changed)} changed/added, {len(removed)} removed file(s), "
+        f"{len(updated.segments)} segment(s)"
+    )
+    return updated
+
+
+def _remove_unused_segments(index: SegmentedIndex) -> None:
+    # Open memory maps of older index versions stay valid after their files are unlinked
+    segments_dir = os.path.join(index.index_dir, 'segments')
+    in_use = {name for name, _ in index.segments}
+    for name in os.listdir(segments_dir):
+        if name not in in_use:
+            shutil.rmtree(os.path.join(segments_dir, name), ignore_errors=True)
@@ -0,0 +1,129 @@
+"""Knowledge base hot reload - polls the KB directory and swaps in updated indexes."""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from .kb_index import SegmentedIndex, default_index_dir, kb_manifest, open_index, refresh_index
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSnapshot(NamedTuple):
+    """Indexes of one KB version; readers take the whole snapshot at once."""
+
+    version: int
+    lexical: Optional[SegmentedIndex]
+    dense: Optional[Any]
+
+
+class KnowledgeBaseWatcher:
+    """
+    Keeps the KB indexes in step with the files under kb_root.
+
+    A daemon thread polls the directory manifest (mtime and size of each file)
+    every poll_interval_s. On a change, only the added, changed and deleted
+    files are re-indexed, and a new IndexSnapshot is published with one
+    attribute assignment. Requests read `current` once and keep that snapshot
+    until they finish; no lock is held while searching, and the previous
+    version's memory maps stay valid while they use them.
+    """
+
+    def __init__(
+        self,
+        kb_root: str,
+        index_dir: Optional[str] = None,
+        lexical: bool = True,
+        dense: bool = False,
+        poll_interval_s: float = 5.0,
+        max_segments: int = 4
+    ):
+        """
+        Open the indexes and, if poll_interval_s > 0, start watching.
+
+        Args:
+            kb_root: Directory of markdown KB files
+            index_dir: Where indexes are persisted (default: default_index_dir(kb_root))
+            lexical: Maintain the BM25 index
+            dense: Maintain the vector index (needs numpy)
+            poll_interval_s: Seconds between directory scans; 0 disables the thread
+            max_segments: BM25 segment count that triggers a merge
+        """
+        self.kb_root = kb_root
+        self.index_dir = index_dir or default_index_dir(kb_root)
+        self.lexical = lexical
+        self.dense = dense
+        self.poll_interval_s = float(poll_interval_s)
+        self.max_segments = int(max_segments)
+        self.reloads = 0
+
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._manifest = kb_manifest(Path(kb_root))
+        self.current = IndexSnapshot(*self._open())
+        if self.poll_interval_s > 0:
+            self.start()
+
+    def _open(self):
+        lexical = open_index(self.kb_root, self.index_dir) if self.lexical else None
+        dense = self._open_dense() if self.dense else None
+        return self._version(lexical, dense), lexical, dense
+
+    def _open_dense(self) -> Any:
+        # numpy is only needed for dense/hybrid retrieval
+        from .vector_index import open_vector_index
+        return open_vector_index(self.kb_root, str(Path(self.index_dir) / 'vectors'))
+
+    @staticmethod
+    def _version(lexical: Optional[SegmentedIndex], dense: Any) -> int:
+        return lexical.version if lexical is not None else dense.version
+
+    def refresh(self) -> bool:
+        """
+        Re-index changed files and publish a new snapshot.
+
+        Returns:
+            True if a new version was published
+        """
+        with self._refresh_lock:
+            manifest = kb_manifest(Path(self.kb_root))
+            if manifest == self._manifest:
+                return False
+            snapshot = self.current
+            try:
+                lexical = (
+                    refresh_index(snapshot.lexical, self.kb_root, max_segments=self.max_segments)
+                    if snapshot.lexical is not None else None
+                )
+                # A fresh instance is synced so the published one is never mutated
+                dense = self._open_dense() if snapshot.dense is not None else None
+            except Exception:
+                logger.exception(f"KB reload failed; keeping index v{snapshot.version}")
+                return False
+            self._manifest = manifest
+            self.current = IndexSnapshot(self._version(lexical, dense), lexical, dense)
+            self.reloads += 1
+        logger.info(f"KB index v{self.current.version} is live (was v{snapshot.version})")
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='kb-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("KB watcher poll failed")
@@ -0,0 +1,379 @@
+"""LLM client - pooled keep-alive HTTP, concurrency cap, retries and hedged requests."""
+
+import http.client
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LLMError(Exception):
+    """A model call failed after all retries (or could not get a concurrency slot)."""
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, retry_after_s: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of keep-alive HTTP connections to one host."""
+
+    def __init__(self, base_url: str, size: int = 8, timeout_s: float = 30.0):
+        parts = urlsplit(base_url)
+        self._cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip('/')
+        self.size = int(size)
+        self.timeout_s = float(timeout_s)
+        self._idle: 'queue.LifoQueue[http.client.HTTPConnection]' = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.connections_opened = 0
+
+    def acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                self.connections_opened += 1
+                return self._cls(self.host, self.port, timeout=self.timeout_s)
+        try:
+            return self._idle.get(timeout=self.timeout_s)
+        except queue.Empty:
+            raise _RetryableError("timed out waiting for a pooled connection")
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool = True) -> None:
+        if reusable:
+            self._idle.put(conn)
+            return
+        conn.close()
+        with self._lock:
+            self._created -= 1
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class LLMClient:
+    """
+    Client for an OpenAI-compatible completions endpoint (vLLM, TGI, ...).
+
+    - Connections are kept alive and reused from a bounded pool.
+    - At most max_in_flight requests (hedges included) are outstanding; callers
+      wait up to timeout_s for a slot.
+    - Connection errors, timeouts, 429 and 5xx are retried with full-jitter
+      exponential backoff (Retry-After is honoured).
+    - Once hedge_min_samples latencies are known, a call still running after
+      the hedge_percentile latency gets a second, identical request if a slot
+      is free; the first answer wins.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        max_connections: int = 8,
+        max_in_flight: int = 4,
+        timeout_s: float = 30.0,
+        max_retries: int = 2,
+        backoff_s: float = 0.2,
+        max_backoff_s: float = 2.0,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        latency_window: int = 500,
+        hedge_after_s: Optional[float] = None
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            base_url: Server URL, e.g. http://llm:8000 (requests go to /v1/completions)
+            api_key: Optional bearer token
+            model: Model name sent with each request
+            max_connections: Keep-alive connections kept per client
+            max_in_flight: Concurrency cap on outstanding requests
+            timeout_s: Socket timeout per attempt, and the longest wait for a slot
+            max_retries: Retries after the first attempt
+            backoff_s: Base backoff; attempt n sleeps uniform(0, backoff_s * 2**n)
+            max_backoff_s: Backoff ceiling
+            hedge_percentile: Latency percentile after which a hedge is sent (0 disables)
+            hedge_min_samples: Latencies needed before hedging starts
+            latency_window: Recent latencies kept for percentiles
+            hedge_after_s: Fixed hedge delay used instead of the percentile
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout_s = float(timeout_s)
+        self.max_retries = int(max_retries)
+        self.backoff_s = float(backoff_s)
+        self.max_backoff_s = float(max_backoff_s)
+        self.hedge_percentile = float(hedge_percentile)
+        self.hedge_min_samples = int(hedge_min_samples)
+        self.hedge_after_s = float(hedge_after_s) if hedge_after_s is not None else None
+        self.max_in_flight = int(max_in_flight)
+
+        self.pool = ConnectionPool(base_url, size=max_connections, timeout_s=timeout_s)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='llm-client')
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=int(latency_window))
+        self.counters = {
+            'calls': 0,
+            'failures': 0,
+            'attempts': 0,
+            'retries': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+        }
+
+    @classmethod
+    def from_env(cls, prefix: str = 'LLM') -> Optional['LLMClient']:
+        """
+        Shared client configured by <prefix>_* environment variables.
+
+        Returns None when <prefix>_BASE_URL is not set. Clients are shared
+        per configuration, so handlers in a process that use the same server
+        with the same settings share one pool; a judge on the generator's
+        server but with its own model or limits gets its own client.
+        """
+        base_url = os.getenv(f'{prefix}_BASE_URL')
+        if not base_url:
+            return None
+        hedge_after_s = os.getenv(f'{prefix}_HEDGE_AFTER_S')
+        config = {
+            'api_key': os.getenv(f'{prefix}_API_KEY'),
+            'model': os.getenv(f'{prefix}_MODEL'),
+            'max_connections': int(os.getenv(f'{prefix}_MAX_CONNECTIONS', '8')),
+            'max_in_flight': int(os.getenv(f'{prefix}_MAX_IN_FLIGHT', '4')),
+            'timeout_s': float(os.getenv(f'{prefix}_TIMEOUT_S', '30')),
+            'max_retries': int(os.getenv(f'{prefix}_MAX_RETRIES', '2')),
+            'hedge_percentile': float(os.getenv(f'{prefix}_HEDGE_PERCENTILE', '0.95')),
+            'hedge_after_s': float(hedge_after_s) if hedge_after_s else None,
+        }
+        key = (base_url, tuple(sorted(config.items())))
+        with _SHARED_LOCK:
+            client = _SHARED_CLIENTS.get(key)
+            if client is None:
+                client = cls(base_url, **config)
+                _SHARED_CLIENTS[key] = client
+            return client
+
+    # --- calls ---
+    def complete(self, prompt: str, max_tokens: int = 256, **params) -> Dict[str, Any]:
+        """
+        Run one completion.
+
+        Args:
+            prompt: Prompt text
+            max_tokens: Completion token limit
+            **params: Extra request fields (temperature, stop, ...)
+
+        Returns:
+            {'text', 'prompt_tokens', 'completion_tokens', 'latency_s',
+             'attempts', 'hedged'}
+
+        Raises:
+            LLMError: when every attempt failed or no slot freed up in time
+        """
+        result = self._complete({'prompt': prompt, 'max_tokens': max_tokens, **params})
+        result['text'] = result.pop('texts')[0]
+        return result
+
+    def complete_batch(self, prompts: List[str], max_tokens: int = 256, **params) -> Dict[str, Any]:
+        """
+        Run several completions in one request (the prompt field carries a list).
+
+        Batches are never hedged and their latencies stay out of the window
+        that sets the hedge delay: a batch takes longer than a single prompt,
+        so mixing the two would hedge every batch and delay single-call hedges.
+
+        Args:
+            prompts: Prompt texts
+            max_tokens: Completion token limit per prompt
+            **params: Extra request fields (temperature, stop, ...)
+
+        Returns:
+            {'texts' (in prompt order), 'prompt_tokens', 'completion_tokens',
+             'latency_s', 'attempts', 'hedged'}; token counts cover the batch
+
+        Raises:
+            LLMError: when every attempt failed or the server answered a
+                different number of prompts
+        """
+        result = self._complete({'prompt': list(prompts), 'max_tokens': max_tokens, **params}, hedge=False)
+        if len(result['texts']) != len(prompts):
+            raise LLMError(f"Expected {len(prompts)} completions, got {len(result['texts'])}")
+        return result
+
+    def _complete(self, body: Dict[str, Any], hedge: bool = True) -> Dict[str, Any]:
+        if self.model:
+            body['model'] = self.model
+        started = time.monotonic()
+        with self._lock:
+            self.counters['calls'] += 1
+
+        primary = self._submit(body, blocking=True)
+        futures = [primary]
+        if hedge and not wait(futures, timeout=self._hedge_delay()).done:
+            backup = self._submit(body, blocking=False)
+            if backup is not None:
+                futures.append(backup)
+                with self._lock:
+                    self.counters['hedges'] += 1
+        result, winner = self._first_success(futures)
+        if result is None:
+            with self._lock:
+                self.counters['failures'] += 1
+            raise LLMError(f"LLM call to {self.base_url} failed: {winner}")
+
+        latency = time.monotonic() - started
+        with self._lock:
+            # Batches are excluded: their latency grows with the batch, not with server health
+            if hedge:
+                self._latencies.append(latency)
+            self.counters['prompt_tokens'] += result['prompt_tokens']
+            self.counters['completion_tokens'] += result['completion_tokens']
+            if winner is not primary:
+                self.counters['hedge_wins'] += 1
+        result['latency_s'] = round(latency, 4)
+        result['hedged'] = len(futures) > 1
+        return result
+
+    def _submit(self, body: Dict[str, Any], blocking: bool):
+        if not self._slots.acquire(blocking=blocking, timeout=self.timeout_s if blocking else None):
+            if blocking:
+                raise LLMError(f"No free LLM slot within {self.timeout_s}s ({self.max_in_flight} in flight)")
+            return None
+        future = self._executor.submit(self._call_with_retries, body)
+        # The slot is held until the request finishes, even if its caller has moved on
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    @staticmethod
+    def _first_success(futures):
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), future
+                error = future.exception()
+        return None, error
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_after_s is not None:
+            return self.hedge_after_s
+        if self.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_percentile * len(ordered)))]
+
+    def _call_with_retries(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        payload = json.dumps(body).encode('utf-8')
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.counters['attempts'] += 1
+                if attempt:
+                    self.counters['retries'] += 1
+            try:
+                result = self._post(payload)
+                result['attempts'] = attempt + 1
+                return result
+            except _RetryableError as exc:
+                if attempt == self.max_retries:
+                    raise LLMError(str(exc)) from exc
+                delay = random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+                if exc.retry_after_s is not None:
+                    delay = max(delay, min(exc.retry_after_s, self.max_backoff_s))
+                logger.warning(f"LLM attempt {attempt + 1} failed ({exc}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+        raise LLMError("unreachable")
+
+    def _post(self, payload: bytes) -> Dict[str, Any]:
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        conn = self.pool.acquire()
+        reusable = False
+        try:
+            conn.request('POST', f"{self.pool.path_prefix}/v1/completions", body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            reusable = not response.will_close
+        except (OSError, http.client.HTTPException) as exc:
+            raise _RetryableError(f"{type(exc).__name__}: {exc}")
+        finally:
+            self.pool.release(conn, reusable=reusable)
+
+        if response.status in RETRYABLE_STATUSES:
+            retry_after = response.getheader('Retry-After')
+            raise _RetryableError(
+                f"HTTP {response.status}",
+                float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else None,
+            )
+        if response.status >= 400:
+            raise LLMError(f"HTTP {response.status}: {data[:200]!r}")
+        document = json.loads(data)
+        usage = document.get('usage', {})
+        choices = sorted(document['choices'], key=lambda choice: choice.get('index', 0))
+        return {
+            'texts': [choice['text'] for choice in choices],
+            'prompt_tokens': int(usage.get('prompt_tokens', 0)),
+            'completion_tokens': int(usage.get('completion_tokens', 0)),
+        }
+
+    # --- metrics ---
+    def metrics(self) -> Dict[str, Any]:
+        """Counters, token totals and latency percentiles over the recent window."""
+        with self._lock:
+            ordered = sorted(self._latencies)
+            counters = dict(self.counters)
+
+        def pct(p: float) -> Optional[float]:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4) if ordered else None
+
+        return {
+            **counters,
+            'connections_opened': self.pool.connections_opened,
+            'latency_p50_s': pct(0.50),
+            'latency_p95_s': pct(0.95),
+            'latency_p99_s': pct(0.99),
+            'hedge_after_s': self._hedge_delay(),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.pool.close()
+
+
+_SHARED_CLIENTS: Dict[Tuple[str, Tuple], LLMClient] = {}
+_SHARED_LOCK = threading.Lock()
@@ -0,0 +1,132 @@
+"""Local queue stand-in - in-process replacement for the Asya SQS/RabbitMQ queues.
+
+Used by tests and local runs to exercise routing and consumer behaviour without
+a cluster. Queue names follow the Asya convention ``asya-<actor>``.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when sending to a bounded queue that stays full."""
+
+
+class LocalQueue:
+    """Bounded, thread-safe FIFO queue."""
+
+    def __init__(self, name: str, maxsize: int = 0):
+        """
+        Initialize the queue.
+
+        Args:
+            name: Queue name (e.g. 'asya-knowledge-retriever')
+            maxsize: Maximum number of messages; 0 means unbounded
+        """
+        self.name = name
+        self.maxsize = int(maxsize)
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.sent = 0
+        self.received = 0
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def send(self, message: Any, timeout: Optional[float] = None) -> None:
+        """
+        Append a message, waiting up to timeout seconds for space.
+
+        Args:
+            message: Message to enqueue
+            timeout: Seconds to wait when full (None waits forever, 0 does not wait)
+
+        Raises:
+            QueueFull: If the queue is still full after the timeout
+        """
+        with self._cond:
+            if self.maxsize and len(self._items) >= self.maxsize:
+                if not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout):
+                    raise QueueFull(f"Queue {self.name} is full ({self.maxsize} messages)")
+            self._items.append((time.monotonic(), message))
+            self.sent += 1
+            self._cond.notify_all()
+
+    def receive(self, timeout: float = 0.0) -> Optional[Any]:
+        """
+        Pop the oldest message.
+
+        Args:
+            timeout: Seconds to wait for a message (0 does not wait)
+
+        Returns:
+            The message, or None if the queue stayed empty
+        """
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            _, message = self._items.popleft()
+            self.received += 1
+            self._cond.notify_all()
+            return message
+
+    def oldest_age(self) -> float:
+        """Seconds the head-of-line message has been waiting (0 when empty)."""
+        with self._cond:
+            return time.monotonic() - self._items[0][0] if self._items else 0.0
+
+
+class LocalBroker:
+    """Named collection of local queues that delivers envelopes like the Asya sidecar."""
+
+    def __init__(self, maxsize: int = 0):
+        """
+        Initialize the broker.
+
+        Args:
+            maxsize: Bound applied to every queue created by the broker
+        """
+        self.maxsize = maxsize
+        self._queues: Dict[str, LocalQueue] = {}
+        self._lock = threading.Lock()
+
+    def queue(self, name: str) -> LocalQueue:
+        """Return the queue with this name, creating it on first use."""
+        with self._lock:
+            if name not in self._queues:
+                self._queues[name] = LocalQueue(name, self.maxsize)
+            return self._queues[name]
+
+    def queue_for_actor(self, actor: str) -> LocalQueue:
+        return self.queue(f"asya-{actor}")
+
+    def dispatch(self, envelope: Dict[str, Any], timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Send an envelope to the queue of its current route actor.
+
+        Args:
+            envelope: Asya envelope
+            timeout: Seconds to wait if the target queue is full
+
+        Returns:
+            Name of the target queue, or None when the route is finished
+        """
+        route = envelope.get('route', {})
+        actors = route.get('actors', [])
+        current = route.get('current', 0)
+        if current >= len(actors):
+            return None
+        target = self.queue_for_actor(actors[current])
+        target.send(envelope, timeout=timeout)
+        return target.name
+
+    def depths(self) -> Dict[str, int]:
+        with self._lock:
+            queues = list(self._queues.values())
+        return {q.name: len(q) for q in queues}
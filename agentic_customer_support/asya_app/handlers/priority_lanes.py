@@ -0,0 +1,206 @@
+"""Priority lanes - urgency-based queue variants and weighted fair consumption.
+
+Each laned actor gets one queue per urgency lane: the base actor name serves the
+'low' lane (existing deployments keep working), '<actor>-medium' and
+'<actor>-high' serve the others. The lane router runs after intent
+classification and rewrites the remaining route to the lane variants matching
+the ticket's urgency.
+
+Under Asya each lane variant is a separate AsyncActor: the sidecar consumes one
+queue per actor, so it cannot weight lanes against each other. Priority comes
+from dedicated capacity instead (warm replicas and a lower queue-length target
+for the high lane). Only lanes that are actually deployed may be routed to
+(PRIORITY_LANES); tickets of other lanes stay on the base actor.
+
+WeightedFairPoller is for consumers that drain several lane queues themselves,
+such as local runs on LocalBroker. It serves lanes in proportion to their
+weights while skipping empty ones, so high-urgency tickets jump the backlog
+without starving low-urgency ones.
+"""
+
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LANES = ('high', 'medium', 'low')
+DEFAULT_LANE = 'low'
+DEFAULT_WEIGHTS = {'high': 6, 'medium': 3, 'low': 1}
+DEFAULT_LANED_ACTORS = ('knowledge-retriever', 'response-generator', 'response-validator', 'response-formatter')
+
+# Urgency levels outside LANES (e.g. the actor mesh 'critical') map onto a lane
+URGENCY_TO_LANE = {'critical': 'high', 'high': 'high', 'medium': 'medium', 'low': 'low'}
+
+
+def lane_for(payload: Dict[str, Any]) -> str:
+    """
+    Pick the lane for a ticket from its urgency.
+
+    Accepts the classifier's string urgency or the sentiment analyzer's
+    {'level': ...} form; anything unknown goes to the default lane.
+    """
+    urgency = payload.get('urgency')
+    if isinstance(urgency, dict):
+        urgency = urgency.get('level')
+    return URGENCY_TO_LANE.get(str(urgency).lower(), DEFAULT_LANE) if urgency else DEFAULT_LANE
+
+
+def base_actor(actor: str) -> str:
+    """Strip a lane suffix: 'response-generator-high' -> 'response-generator'."""
+    for lane in LANES:
+        if lane != DEFAULT_LANE and actor.endswith(f"-{lane}"):
+            return actor[: -len(lane) - 1]
+    return actor
+
+
+def lane_actor(actor: str, lane: str) -> str:
+    """Name of the lane variant of an actor."""
+    actor = base_actor(actor)
+    return actor if lane == DEFAULT_LANE else f"{actor}-{lane}"
+
+
+def route_to_lane(actors: List[str], current: int, lane: str, laned_actors=DEFAULT_LANED_ACTORS) -> List[str]:
+    """
+    Rewrite the future part of a route to the lane variants.
+
+    Args:
+        actors: Route actor list
+        current: Index of the actor currently processing
+        lane: Target lane
+        laned_actors: Base names of actors that have lane variants
+
+    Returns:
+        New actor list; already-processed actors are unchanged
+    """
+    laned = set(laned_actors)
+    future = [
+        lane_actor(actor, lane) if base_actor(actor) in laned else actor
+        for actor in actors[current + 1:]
+    ]
+    return list(actors[: current + 1]) + future
+
+
+class LaneRouter:
+    """Envelope-mode router that sends tickets to their urgency lane."""
+
+    def __init__(self, laned_actors: str = None, lanes: str = None):
+        """
+        Initialize the lane router.
+
+        Args:
+            laned_actors: Comma-separated actor names with lane variants
+                (defaults to PRIORITY_LANE_ACTORS or DEFAULT_LANED_ACTORS)
+            lanes: Comma-separated lanes deployed for those actors (defaults to
+                PRIORITY_LANES or all of LANES); tickets of other lanes go to the
+                default lane, so no ticket is routed to a queue without consumers
+        """
+        laned_actors = laned_actors or os.getenv('PRIORITY_LANE_ACTORS')
+        self.laned_actors = (
+            tuple(a.strip() for a in laned_actors.split(',') if a.strip())
+            if laned_actors else DEFAULT_LANED_ACTORS
+        )
+        lanes = lanes or os.getenv('PRIORITY_LANES')
+        self.lanes = tuple(lane.strip() for lane in lanes.split(',') if lane.strip()) if lanes else LANES
+        unknown = set(self.lanes) - set(LANES)
+        if unknown:
+            raise ValueError(f"Unknown priority lanes {sorted(unknown)}; expected some of {list(LANES)}")
+        logger.info(f"LaneRouter initialized (laned_actors={list(self.laned_actors)}, lanes={list(self.lanes)})")
+
+    def process(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Route the envelope to the lane matching its urgency.
+
+        Args:
+            envelope: Asya envelope containing payload and route
+
+        Returns:
+            Envelope with the lane recorded and the remaining route rewritten
+        """
+        payload = envelope.get('payload', {})
+        route = envelope.get('route', {})
+        current = route.get('current', 0)
+
+        if payload.get('validation_status') == 'valid':
+            lane = lane_for(payload)
+            if lane not in self.lanes:
+                lane = DEFAULT_LANE
+            route['actors'] = route_to_lane(route.get('actors', []), current, lane, self.laned_actors)
+            payload['priority_lane'] = lane
+            logger.info(f"Ticket {payload.get('ticket_id')} routed to {lane} lane")
+
+        route['current'] = current + 1
+        return envelope
+
+
+class WeightedFairPoller:
+    """Smooth weighted round-robin over per-lane queues.
+
+    Among lanes that have messages waiting, each poll credits every lane with
+    its weight and serves the one with the most credit, which then pays back the
+    total. Under full backlog lanes are served in weight proportion (6:3:1 by
+    default); an empty lane is skipped, so capacity is never idle while work is
+    waiting and every non-empty lane is eventually served.
+    """
+
+    def __init__(self, queues: Dict[str, Any], weights: Optional[Dict[str, int]] = None, idle_sleep_s: float = 0.005):
+        """
+        Initialize the poller.
+
+        Args:
+            queues: Lane name -> queue with receive(timeout) and __len__
+            weights: Lane name -> positive weight (defaults to DEFAULT_WEIGHTS)
+            idle_sleep_s: Sleep between checks while every lane is empty
+        """
+        weights = weights or DEFAULT_WEIGHTS
+        self.queues = dict(queues)
+        self.weights = {lane: int(weights.get(lane, 1)) for lane in self.queues}
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise ValueError(f"Lane weights must be positive: {self.weights}")
+        self.idle_sleep_s = idle_sleep_s
+        self._credit = {lane: 0 for lane in self.queues}
+        self.served = {lane: 0 for lane in self.queues}
+
+    @classmethod
+    def for_actor(cls, broker: Any, actor: str, weights: Optional[Dict[str, int]] = None) -> 'WeightedFairPoller':
+        """Poller over every lane queue of an actor on a LocalBroker."""
+        return cls({lane: broker.queue_for_actor(lane_actor(actor, lane)) for lane in LANES}, weights)
+
+    def _pick(self) -> Optional[str]:
+        ready = [lane for lane, queue in self.queues.items() if len(queue)]
+        if not ready:
+            return None
+        total = 0
+        for lane in ready:
+            self._credit[lane] += self.weights[lane]
+            total += self.weights[lane]
+        lane = max(ready, key=lambda name: self._credit[name])
+        self._credit[lane] -= total
+        return lane
+
+    def poll(self, timeout: float = 0.0) -> Optional[Tuple[str, Any]]:
+        """
+        Receive the next message according to lane weights.
+
+        Args:
+            timeout: Seconds to wait while all lanes are empty
+
+        Returns:
+            (lane, message), or None if nothing arrived before the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            lane = self._pick()
+            if lane is not None:
+                message = self.queues[lane].receive()
+                if message is not None:
+                    self.served[lane] += 1
+                    return lane, message
+                continue  # another consumer took it; pick again
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.idle_sleep_s)
+
+    def depths(self) -> Dict[str, int]:
+        return {lane: len(queue) for lane, queue in self.queues.items()}
@@ -0,0 +1,96 @@
+"""Refinement loop - bounded regeneration of low-scoring responses within the deadline."""
+
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('MAX_REFINEMENTS', '2'))
+# Time one more generate + validate round needs; with less left the ticket is escalated
+DEFAULT_MIN_BUDGET_S = float(os.getenv('REFINEMENT_MIN_BUDGET_S', '1.5'))
+
+GOOD_PHRASES = ('thank you', 'help', 'assist', 'understand', 'provide')
+
+
+def response_issues(response: str) -> List[str]:
+    """Concrete problems with a response, phrased as instructions for the next attempt."""
+    text = (response or '').strip()
+    if len(text) < 10:
+        return ["The response is empty or nearly empty; write a complete answer."]
+    issues = []
+    if len(text) < 100:
+        issues.append("The response is too short; answer the customer's question fully.")
+    if not any(phrase in text.lower() for phrase in GOOD_PHRASES):
+        issues.append("Acknowledge the customer and say how you will help.")
+    return issues or ["The reviewer rated the response low; make it more specific to the customer's message."]
+
+
+def build_feedback(response: str, score: float, threshold: float, judge_tier: str) -> Dict[str, Any]:
+    """Validator feedback carried to the generator for the next attempt."""
+    return {
+        'score': score,
+        'threshold': threshold,
+        'judge_tier': judge_tier,
+        'previous_response': response,
+        'issues': response_issues(response),
+    }
+
+
+def next_step(attempts: int, remaining_s: Optional[float], max_attempts: int, min_budget_s: float) -> str:
+    """
+    Decide what happens to a response that failed validation.
+
+    Args:
+        attempts: Refinements already made
+        remaining_s: Seconds left before the deadline (None without a deadline)
+        max_attempts: Refinement limit
+        min_budget_s: Time one more round needs
+
+    Returns:
+        'refine', or why refinement stopped: 'max_attempts' / 'deadline'
+    """
+    if attempts >= max_attempts:
+        return 'max_attempts'
+    if remaining_s is not None and remaining_s < min_budget_s:
+        return 'deadline'
+    return 'refine'
+
+
+def start_attempt(payload: Dict[str, Any], feedback: Dict[str, Any]) -> int:
+    """Record a new refinement attempt on the payload; returns its number."""
+    payload.setdefault('refinement_started_at', time.time())
+    payload['refinement_attempts'] = payload.get('refinement_attempts', 0) + 1
+    payload['refinement_feedback'] = feedback
+    return payload['refinement_attempts']
+
+
+def finish(payload: Dict[str, Any], outcome: str) -> None:
+    """
+    Record how the refinement loop ended and the latency it added.
+
+    Outcomes: 'passed' (a refined response passed), 'max_attempts' or
+    'deadline' (gave up and escalated). Tickets that never entered the loop
+    are left untouched.
+    """
+    started = payload.get('refinement_started_at')
+    if started is None and outcome == 'passed':
+        return
+    payload['refinement_attempts'] = payload.get('refinement_attempts', 0)
+    payload['refinement_outcome'] = outcome
+    payload['refinement_latency_s'] = round(time.time() - started, 4) if started is not None else 0.0
+    logger.info(
+        f"Refinement of ticket {payload.get('ticket_id')} ended: {outcome} after "
+        f"{payload['refinement_attempts']} attempt(s), +{payload['refinement_latency_s']:.3f}s"
+    )
+
+
+def feedback_prompt(feedback: Dict[str, Any]) -> str:
+    """Prompt section asking the model to fix the previous attempt."""
+    issues = '\n'.join(f"- {issue}" for issue in feedback.get('issues', []))
+    return (
+        f"A previous answer scored {feedback.get('score', 0):.2f} (needs {feedback.get('threshold', 0):.2f}):\n"
+        f"{feedback.get('previous_response', '')}\n"
+        f"Fix these problems:\n{issues}\n\n"
+    )
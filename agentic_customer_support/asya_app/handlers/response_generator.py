@@ -1,25 +1,47 @@
 """Response generation handler - generates response using LLM."""
 
 import logging
+import os
 from typing import Dict, Any
 
+from . import refinement
+from .context_packer import pack_context
+from .deadline import shed_if_expired
+from .llm_client import LLMClient
+from .response_cache import SemanticResponseCache
+
 logger = logging.getLogger(__name__)
 
 
 class ResponseGenerator:
     """Generates customer support responses using LLM."""
     
-    def __init__(self, model_path: str = None, api_key: str = None):
+    def __init__(
+        self,
+        model_path: str = None,
+        api_key: str = None,
+        response_cache: SemanticResponseCache = None,
+        context_token_budget: int = None,
+        llm_client: LLMClient = None
+    ):
         """
         Initialize the response generator.
         
         Args:
             model_path: Optional path to local LLM model
             api_key: Optional API key for LLM service
+            response_cache: Near-duplicate response cache (default: from RESPONSE_CACHE_* env)
+            context_token_budget: Prompt tokens for knowledge context (default CONTEXT_TOKEN_BUDGET or 1024)
+            llm_client: Model server client (default: shared client from LLM_* env);
+                without one, template responses are used
         """
         # In a real implementation, you would initialize LLM client here
         self.model_path = model_path
         self.api_key = api_key
+        self.response_cache = response_cache if response_cache is not None else SemanticResponseCache.from_env()
+        self.context_token_budget = int(context_token_budget or os.getenv('CONTEXT_TOKEN_BUDGET', '1024'))
+        self.llm_client = llm_client if llm_client is not None else LLMClient.from_env('LLM')
+        self.max_response_tokens = int(os.getenv('LLM_MAX_RESPONSE_TOKENS', '512'))
         logger.info(f"ResponseGenerator initialized (model_path={model_path})")
     
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -32,6 +54,7 @@ class ResponseGenerator:
         Returns:
             Payload enriched with generated response
         """
+        shed_if_expired(payload, 'response-generator')
         if payload.get('validation_status') != 'valid':
             return payload
         
@@ -42,11 +65,46 @@ class ResponseGenerator:
         
         logger.info(f"Generating response for ticket: {ticket_id}")
         
-        # Build context for LLM
-        context_text = '\n'.join([ctx.get('content', '') for ctx in knowledge_context])
+        # Build context for LLM: best passages first, duplicates dropped, within the token budget
+        packed = pack_context(knowledge_context, self.context_token_budget)
+        context_text = packed['text']
+        payload['context_tokens'] = packed['tokens']
+        payload['context_packing'] = {
+            'passages_used': len(packed['passages']),
+            'dropped_duplicates': packed['dropped_duplicates'],
+            'dropped_over_budget': packed['dropped_over_budget'],
+            'truncated': packed['truncated'],
+        }
         
-        # Generate response (mock implementation)
-        response = self._generate_response(message, intent, context_text)
+        # Reuse a near-duplicate ticket's response, else generate (mock implementation)
+        # A refinement attempt must not get the rejected answer back from the cache
+        feedback = payload.get('refinement_feedback')
+        cached = (
+            self.response_cache.lookup(payload, intent, context_text)
+            if self.response_cache and feedback is None else None
+        )
+        if cached is not None:
+            response = cached['response']
+            payload['response_provenance'] = cached['provenance']
+            logger.info(f"Reused cached response of ticket {cached['provenance']['source_ticket_id']} for ticket {ticket_id}")
+        else:
+            if self.llm_client is not None:
+                completion = self.llm_client.complete(
+                    self._build_prompt(message, intent, context_text, feedback), max_tokens=self.max_response_tokens
+                )
+                response = completion['text'].strip()
+                payload['llm_usage'] = {
+                    key: completion[key]
+                    for key in ('prompt_tokens', 'completion_tokens', 'latency_s', 'attempts', 'hedged')
+                }
+            else:
+                response = self._generate_response(message, intent, context_text)
+                if feedback is not None:
+                    response = self._revise_response(response, feedback)
+            payload['response_provenance'] = {'source': 'llm'}
+            # Cached by the validator once the response passes (see SemanticResponseCache.promote)
+            if self.response_cache:
+                payload['response_cache_scope'] = self.response_cache.scope(intent, context_text)
         
         payload['generated_response'] = response
         payload['response_generated_at'] = __import__('datetime').datetime.utcnow().isoformat()
@@ -54,6 +112,25 @@ class ResponseGenerator:
         logger.info(f"Response generated for ticket {ticket_id}")
         return payload
     
+    def _build_prompt(self, message: str, intent: str, context: str, feedback: Dict[str, Any] = None) -> str:
+        """Prompt for the model server."""
+        return (
+            "You are a customer support agent. Answer the customer using only the knowledge below.\n\n"
+            f"Knowledge:\n{context or '(none)'}\n\n"
+            f"Ticket intent: {intent}\n"
+            f"Customer message: {message}\n\n"
+            f"{refinement.feedback_prompt(feedback) if feedback else ''}"
+            "Response:"
+        )
+    
+    def _revise_response(self, response: str, feedback: Dict[str, Any]) -> str:
+        """Address the validator's feedback on a template response (no model to re-prompt)."""
+        if not any(phrase in response.lower() for phrase in refinement.GOOD_PHRASES):
+            response = f"Thank you for contacting us. {response}"
+        if len(response) < 100:
+            response += " If anything is still unclear, reply to this message and we will help you further."
+        return response
+    
     def _generate_response(self, message: str, intent: str, context: str) -> str:
         """
         Generate response using LLM.
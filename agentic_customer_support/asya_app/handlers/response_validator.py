@@ -1,25 +1,172 @@
-"""Response validation handler - validates response quality using LLM judge."""
+"""Response validation handler - validates response quality with a cascaded judge."""
 
 import logging
-from typing import Dict, Any
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from . import refinement
+from .deadline import remaining_budget, shed_if_expired
+from .llm_client import LLMClient, LLMError
+from .priority_lanes import base_actor
+from .response_cache import SemanticResponseCache
 
 logger = logging.getLogger(__name__)
 
+_SCORE_RE = re.compile(r'\d+(?:\.\d+)?')
+
+JUDGE_PROMPT = (
+    "Rate how well the support response answers the customer, from 0 (useless) to 1 (perfect). "
+    "Reply with the number only.\n\n"
+    "Customer message: {message}\n"
+    "Support response: {response}\n\n"
+    "Score:"
+)
+
+
+class JudgeBatcher:
+    """
+    Micro-batch buffer that merges the judge requests of concurrent handler calls.
+    
+    The Asya runtime hands the validator one envelope per call, so on its own
+    each call is a batch of one. When calls run concurrently (several handler
+    threads per replica), the first caller to need the judge waits up to
+    window_s for the others to add their items, then sends everything
+    collected as one request; the other callers block until their scores are
+    back. Sequential calls gain nothing and pay the window, so it is off by
+    default.
+    """
+    
+    def __init__(self, judge: Callable[[List[Tuple[str, str]]], List[Optional[float]]], window_s: float, max_batch: int = 16):
+        """
+        Args:
+            judge: Scores a list of (message, response) pairs in one request
+            window_s: Seconds the first caller waits for others to join its batch
+            max_batch: Pairs after which the batch is sent without waiting further
+        """
+        self.judge = judge
+        self.window_s = float(window_s)
+        self.max_batch = int(max_batch)
+        self._cond = threading.Condition()
+        self._pending: List[Dict[str, Any]] = []
+        self._leading = False
+    
+    def score(self, items: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """Scores for items, sent together with those of concurrent callers."""
+        request = {'items': list(items), 'scores': None}
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify_all()
+            while request['scores'] is None and self._leading:
+                self._cond.wait()
+            if request['scores'] is not None:
+                return request['scores']
+            
+            # Lead the next batch: collect until the window closes or the batch is full
+            self._leading = True
+            deadline = time.monotonic() + self.window_s
+            while sum(len(pending['items']) for pending in self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending, []
+        
+        scores: List[Optional[float]] = []
+        try:
+            scores = self.judge([item for pending in batch for item in pending['items']])
+        finally:
+            # Waiters are released even if the judge raised; they fall back to the heuristic
+            with self._cond:
+                offset = 0
+                for pending in batch:
+                    size = len(pending['items'])
+                    pending['scores'] = scores[offset:offset + size] if scores else [None] * size
+                    offset += size
+                self._leading = False
+                self._cond.notify_all()
+        return request['scores']
+
 
 class ResponseValidator:
-    """Validates generated responses using LLM judge."""
+    """
+    Validates generated responses with a two-tier judge.
+    
+    The heuristic scores every response. Scores outside the uncertainty band
+    settle the ticket (clear pass or clear fail); only scores inside it are
+    escalated to the LLM judge, and the escalations of a batch of envelopes go
+    to the judge as one request. With a batch window, the escalations of
+    concurrent process() calls are merged as well (see JudgeBatcher).
+    
+    A failed response is sent back through the generator with the validator's
+    feedback, at most max_refinements times and only while the deadline leaves
+    room for another round; after that the ticket is escalated to a human.
+    """
     
-    def __init__(self, judge_model_path: str = None, threshold: float = 0.7):
+    def __init__(
+        self,
+        judge_model_path: str = None,
+        threshold: float = 0.7,
+        judge_min_budget_s: float = 1.0,
+        judge_client: LLMClient = None,
+        uncertainty_band: Tuple[float, float] = None,
+        max_refinements: int = None,
+        refinement_min_budget_s: float = None,
+        response_cache: SemanticResponseCache = None,
+        judge_batch_window_s: float = None,
+        judge_max_batch: int = None
+    ):
         """
         Initialize the response validator.
         
         Args:
             judge_model_path: Optional path to judge LLM model
             threshold: Minimum quality score threshold (0-1)
+            judge_min_budget_s: Skip the LLM judge when less time than this is left
+            judge_client: Judge model client (default: shared client from JUDGE_* env);
+                without one, the heuristic decides every ticket
+            uncertainty_band: Heuristic scores (low, high), inclusive, that escalate to the
+                LLM judge (default JUDGE_UNCERTAINTY_LOW/HIGH or 0.55/0.8)
+            max_refinements: Regenerations allowed per ticket (default MAX_REFINEMENTS or 2)
+            refinement_min_budget_s: Escalate instead of regenerating when less time than
+                this is left (default REFINEMENT_MIN_BUDGET_S or 1.5)
+            response_cache: Response cache that passed responses are promoted into
+                (default: the generator's shared cache from RESPONSE_CACHE_* env)
+            judge_batch_window_s: Seconds a judge request waits for concurrent calls to join it
+                (default JUDGE_BATCH_WINDOW_S or 0, which sends each call's escalations alone)
+            judge_max_batch: Judge prompts per merged request (default JUDGE_MAX_BATCH or 16)
         """
         self.judge_model_path = judge_model_path
         self.threshold = float(threshold)
-        logger.info(f"ResponseValidator initialized (threshold={threshold})")
+        self.judge_min_budget_s = float(judge_min_budget_s)
+        self.judge_client = judge_client if judge_client is not None else LLMClient.from_env('JUDGE')
+        self.uncertainty_band = uncertainty_band or (
+            float(os.getenv('JUDGE_UNCERTAINTY_LOW', '0.55')),
+            float(os.getenv('JUDGE_UNCERTAINTY_HIGH', '0.8')),
+        )
+        self.max_refinements = refinement.DEFAULT_MAX_ATTEMPTS if max_refinements is None else int(max_refinements)
+        self.refinement_min_budget_s = float(
+            refinement.DEFAULT_MIN_BUDGET_S if refinement_min_budget_s is None else refinement_min_budget_s
+        )
+        self.response_cache = response_cache if response_cache is not None else SemanticResponseCache.from_env()
+        window_s = float(
+            os.getenv('JUDGE_BATCH_WINDOW_S', '0') if judge_batch_window_s is None else judge_batch_window_s
+        )
+        max_batch = int(os.getenv('JUDGE_MAX_BATCH', '16') if judge_max_batch is None else judge_max_batch)
+        self.judge_batcher = JudgeBatcher(self._judge_request, window_s, max_batch) if window_s > 0 else None
+        self._lock = threading.Lock()
+        self.stats = {
+            'judged': 0,
+            'escalated': 0,
+            'judge_batches': 0,
+            'judge_failures': 0,
+            'forced_heuristic': 0,
+            'refinements': 0,
+            'refinement_escalations': 0,
+        }
+        logger.info(f"ResponseValidator initialized (threshold={threshold}, uncertainty_band={self.uncertainty_band})")
     
     def process(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -33,47 +180,194 @@ class ResponseValidator:
         Returns:
             Envelope with validation results and potentially modified route
         """
-        payload = envelope.get('payload', {})
-        route = envelope.get('route', {})
+        return self.process_batch([envelope])[0]
+    
+    def process_batch(self, envelopes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate several envelopes, sending all their escalations to the judge at once.
+        
+        Args:
+            envelopes: Asya envelopes containing payload and route
         
-        if payload.get('validation_status') != 'valid':
-            return envelope
+        Returns:
+            The envelopes, in order, with validation results and advanced routes
+        """
+        escalated = []
+        for envelope in envelopes:
+            payload = envelope.get('payload', {})
+            headers = envelope.get('headers')
+            
+            shed_if_expired(payload, 'response-validator', headers)
+            if payload.get('validation_status') != 'valid':
+                continue
+            
+            ticket_id = payload.get('ticket_id')
+            logger.info(f"Validating response for ticket: {ticket_id}")
+            
+            score = self._heuristic_score(payload.get('generated_response', ''))
+            payload['judge_tier'] = 'heuristic'
+            self._count('judged')
+            if self._should_escalate(payload, headers, score):
+                escalated.append(envelope)
+            else:
+                self._record_score(envelope, score)
         
+        if escalated:
+            scores = self._judge_batch([
+                (envelope['payload'].get('message', ''), envelope['payload'].get('generated_response', ''))
+                for envelope in escalated
+            ])
+            for envelope, score in zip(escalated, scores):
+                payload = envelope['payload']
+                if score is None:
+                    score = self._heuristic_score(payload.get('generated_response', ''))
+                else:
+                    payload['judge_tier'] = 'llm'
+                self._record_score(envelope, score)
+        
+        return envelopes
+    
+    def _should_escalate(self, payload: Dict[str, Any], headers: Optional[Dict[str, Any]], score: float) -> bool:
+        """Whether a heuristic score is too uncertain to settle the ticket on its own."""
         ticket_id = payload.get('ticket_id')
-        generated_response = payload.get('generated_response', '')
-        original_message = payload.get('message', '')
+        low, high = self.uncertainty_band
+        if self.judge_client is None or not low <= score <= high:
+            return False
         
-        logger.info(f"Validating response for ticket: {ticket_id}")
+        # Escalation needs time and a full service level; otherwise the heuristic decides
+        remaining = remaining_budget(payload, headers)
+        if payload.get('service_level') == 'reduced':
+            logger.info(f"Skipping LLM judge for ticket {ticket_id}: reduced service level")
+            self._count('forced_heuristic')
+            return False
+        if remaining is not None and remaining < self.judge_min_budget_s:
+            logger.info(f"Skipping LLM judge for ticket {ticket_id}: {remaining:.2f}s left")
+            self._count('forced_heuristic')
+            return False
         
-        # Judge response quality
-        score = self._judge_response(original_message, generated_response)
+        self._count('escalated')
+        return True
+    
+    def _record_score(self, envelope: Dict[str, Any], score: float) -> None:
+        payload = envelope.get('payload', {})
+        route = envelope.get('route', {})
+        ticket_id = payload.get('ticket_id')
         
         payload['judge_score'] = score
         payload['validation_passed'] = score >= self.threshold
         
         if score < self.threshold:
             logger.warning(
-                "Response for ticket %s scored %.2f < %.2f; mark for refinement",
+                "Response for ticket %s scored %.2f < %.2f (%s); mark for refinement",
                 ticket_id,
                 score,
                 self.threshold,
+                payload['judge_tier'],
             )
             payload['needs_refinement'] = True
+            self._refine_or_escalate(envelope, score)
         else:
             logger.info(f"Response for ticket {ticket_id} passed validation with score {score:.2f}")
+            payload.pop('needs_refinement', None)
+            refinement.finish(payload, 'passed')
+            if self.response_cache:
+                self.response_cache.promote(payload)
         
         # Advance route
         route['current'] = route.get('current', 0) + 1
+    
+    def _refine_or_escalate(self, envelope: Dict[str, Any], score: float) -> None:
+        """Route a failed response back through the generator, or escalate it."""
+        payload = envelope.get('payload', {})
+        route = envelope.get('route', {})
+        actors = route.get('actors', [])
+        current = route.get('current', 0)
         
-        return envelope
+        step = refinement.next_step(
+            payload.get('refinement_attempts', 0),
+            remaining_budget(payload, envelope.get('headers')),
+            self.max_refinements,
+            self.refinement_min_budget_s,
+        )
+        if step == 'refine':
+            feedback = refinement.build_feedback(
+                payload.get('generated_response', ''), score, self.threshold, payload['judge_tier']
+            )
+            attempt = refinement.start_attempt(payload, feedback)
+            # Same (possibly lane-specific) generator and validator as this pass
+            generator = next(
+                (actor for actor in reversed(actors[:current]) if base_actor(actor) == 'response-generator'),
+                'response-generator',
+            )
+            validator = actors[current] if current < len(actors) else 'response-validator'
+            route['actors'] = list(actors[: current + 1]) + [generator, validator] + list(actors[current + 1:])
+            self._count('refinements')
+            logger.info(f"Regenerating response for ticket {payload.get('ticket_id')} (attempt {attempt})")
+            return
+        
+        refinement.finish(payload, step)
+        payload['escalate'] = True
+        self._count('refinement_escalations')
+        if not any(base_actor(actor) == 'escalation-handler' for actor in actors[current + 1:]):
+            route['actors'] = list(actors) + ['escalation-handler']
+    
+    def _judge_batch(self, items: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """
+        Score (original message, response) pairs with the LLM judge, merged with
+        concurrent calls' pairs when a batch window is set.
+        
+        Returns a score between 0 and 1 per pair, or None where the judge
+        failed or its answer has no usable score.
+        """
+        if self.judge_batcher is not None:
+            return self.judge_batcher.score(items)
+        return self._judge_request(items)
+    
+    def _judge_request(self, items: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """Score (original message, response) pairs with one LLM judge request."""
+        self._count('judge_batches')
+        try:
+            completion = self.judge_client.complete_batch(
+                [JUDGE_PROMPT.format(message=message, response=response) for message, response in items],
+                max_tokens=8,
+                temperature=0,
+            )
+        except LLMError as exc:
+            logger.warning(f"LLM judge failed for {len(items)} responses ({exc}); using heuristic scores")
+            self._count('judge_failures', len(items))
+            return [None] * len(items)
+        
+        scores = []
+        for text in completion['texts']:
+            match = _SCORE_RE.search(text)
+            if match is None:
+                logger.warning(f"Unparseable judge output {text!r}; using heuristic score")
+                self._count('judge_failures')
+                scores.append(None)
+            else:
+                scores.append(min(1.0, max(0.0, float(match.group()))))
+        return scores
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Tickets judged, escalations to the LLM judge, the escalation rate and refinements."""
+        with self._lock:
+            stats = dict(self.stats)
+        judged = stats['judged']
+        return {
+            **stats,
+            'escalation_rate': round(stats['escalated'] / judged, 4) if judged else 0.0,
+        }
     
-    def _judge_response(self, original_message: str, response: str) -> float:
+    def _heuristic_score(self, response: str) -> float:
         """
-        Judge response quality using LLM.
+        Cheap rule-based quality score, the first tier of the judge.
         
         Returns a score between 0 and 1.
         """
-        # Mock implementation - in production, use actual LLM judge
         # Simple heuristic: check if response is not empty and has reasonable length
         if not response or len(response.strip()) < 10:
             return 0.3
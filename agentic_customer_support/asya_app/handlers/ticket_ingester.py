@@ -1,11 +1,47 @@
 """Ticket ingestion handler - receives and validates incoming tickets."""
 
 import logging
-from typing import Dict, Any
+import os
+from typing import Callable, Dict, Any, Optional
+
+from .admission import AdmissionController, estimate_urgency
+from .bulk_ingester import DEFAULT_ROUTE, SqsPublisher
+from .deadline import stamp_deadline
+from .dedup import DuplicateSuppressor
 
 logger = logging.getLogger(__name__)
 
 
+def backlog_probe_from_env() -> Optional[Callable[[], int]]:
+    """
+    Summed depth of the downstream actors' queues, when ADMISSION_QUEUE_URL_TEMPLATE
+    is set (ADMISSION_BACKLOG_ACTORS lists the actors, default: the stages after
+    the ingester).
+    """
+    template = os.getenv('ADMISSION_QUEUE_URL_TEMPLATE')
+    if not template:
+        return None
+    actors = [
+        actor.strip()
+        for actor in os.getenv('ADMISSION_BACKLOG_ACTORS', ','.join(DEFAULT_ROUTE[1:])).split(',')
+        if actor.strip()
+    ]
+    publisher = SqsPublisher(template, endpoint_url=os.getenv('ADMISSION_SQS_ENDPOINT_URL'))
+    return lambda: sum(publisher.queue_depth(actor) for actor in actors)
+
+
+# One controller per ingester replica. Completions are not seen here, so load is
+# the downstream queue backlog when a probe is configured; otherwise admissions
+# age out after ADMISSION_INFLIGHT_TTL_S (a rate limit, see AdmissionController)
+admission = AdmissionController.from_env(backlog_probe=backlog_probe_from_env())
+dedup = DuplicateSuppressor.from_env()
+
+
+def metrics() -> Dict[str, Any]:
+    """Admission state and duplicate counts of this replica."""
+    return {'admission': admission.snapshot(), 'dedup': dict(dedup.stats)}
+
+
 def process(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Process incoming ticket.
@@ -17,9 +53,17 @@ def process(payload: Dict[str, Any]) -> Dict[str, Any]:
             - message: Customer message/text
             - source: Source of ticket (email, chat, etc.)
             - timestamp: Timestamp of ticket creation
+            - deadline_at: Optional absolute deadline (epoch seconds)
+            - ingest_mode: 'backfill' for tickets from bulk_ingester, which
+              skip admission control and get no deadline
     
     Returns:
-        Enriched payload with validation status and metadata
+        Enriched payload with validation status and metadata. Re-submitted
+        tickets come back with validation_status 'duplicate' and
+        duplicate_of set to the original ticket id. Under load,
+        low-priority tickets may come back with validation_status 'deferred'
+        or 'rejected' (see payload['admission']) or be admitted with
+        service_level 'reduced'.
     """
     logger.info(f"Processing ticket: {payload.get('ticket_id')}")
     
@@ -39,10 +83,39 @@ def process(payload: Dict[str, Any]) -> Dict[str, Any]:
         payload['error'] = "Message cannot be empty"
         return payload
     
+    # Duplicate suppression (before admission, so copies do not take capacity);
+    # the ticket is only remembered once admitted, so a deferred ticket can be retried
+    dedup_result = dedup.check(payload, remember=False)
+    if dedup_result['status'] == 'duplicate':
+        logger.info(f"Ticket {payload['ticket_id']} is a duplicate of {dedup_result['duplicate_of']}")
+        payload['validation_status'] = 'duplicate'
+        payload['duplicate_of'] = dedup_result['duplicate_of']
+        return payload
+    if dedup_result['status'] == 'possible_duplicate':
+        payload['possible_duplicate'] = True
+    
+    # Admission control (backfills are paced by bulk_ingester's queue-depth backpressure instead)
+    backfill = payload.get('ingest_mode') == 'backfill'
+    if not backfill:
+        decision = admission.admit(payload['ticket_id'], estimate_urgency(payload))
+        payload['admission'] = decision
+        if decision['decision'] in ('defer', 'reject'):
+            payload['validation_status'] = 'deferred' if decision['decision'] == 'defer' else 'rejected'
+            payload['error'] = f"Ticket not admitted ({decision['reason']}); retry after {decision['retry_after_s']}s"
+            return payload
+        if decision['decision'] == 'downgrade':
+            payload['service_level'] = 'reduced'
+    dedup.remember(payload)
+    
     # Enrich with metadata
     payload['validation_status'] = 'valid'
     payload['message_length'] = len(payload['message'])
     payload['processed_at'] = __import__('datetime').datetime.utcnow().isoformat()
+    if backfill:
+        # A historical ticket's deadline has long passed; no stage should shed it
+        payload.pop('deadline_at', None)
+    else:
+        stamp_deadline(payload)
     
     logger.info(f"Ticket {payload['ticket_id']} validated successfully")
     return payload
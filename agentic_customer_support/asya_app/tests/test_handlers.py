@@ -1,11 +1,28 @@
 """Unit tests for Asya handlers."""
 
+import json
+import os
+import threading
+import time
+
 import pytest
+import handlers.ticket_ingester
+from handlers.admission import AdmissionController
+from handlers.bulk_ingester import BulkIngester, LocalQueuePublisher
+from handlers.dedup import DuplicateSuppressor, RecentKeyStore
 from handlers.ticket_ingester import process as ingest_ticket
+from handlers.escalation_handler import process as escalate_ticket
+from handlers.context_packer import pack_context
 from handlers.intent_classifier import IntentClassifier
+from handlers.kb_index import default_index_dir, open_index
 from handlers.knowledge_retriever import KnowledgeRetriever
+from handlers.llm_client import LLMClient
 from handlers.response_generator import ResponseGenerator
 from handlers.response_validator import ResponseValidator
+from handlers.response_cache import SemanticResponseCache, ticket_fields, to_template
+from handlers.local_queue import LocalBroker
+from handlers.priority_lanes import LaneRouter, WeightedFairPoller
+from tests.fake_model_server import FakeModelServer
 
 
 def test_ticket_ingester_valid():
@@ -65,6 +82,157 @@ def test_knowledge_retriever():
     assert 'context_sources' in result
 
 
+def test_knowledge_retriever_bm25_index(tmp_path):
+    """Test BM25 retrieval over a markdown KB and reuse of the persisted index."""
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n\n# Gift cards\n\nGift cards cannot be refunded.\n")
+    (kb / 'login.md').write_text("# Login\n\nReset your password from the sign-in page.\n")
+
+    retriever = KnowledgeRetriever(knowledge_base_path=str(kb), reload_interval_s=0)
+    result = retriever.process({'ticket_id': 'T1', 'message': 'When will my refund be processed?', 'validation_status': 'valid', 'intent': 'refund'})
+    assert result['context_sources'][0] == 'refunds.md'
+    assert result['knowledge_context'][0]['title'] == 'Refunds'
+    assert 0 < result['knowledge_context'][0]['relevance_score'] <= 1
+
+    reopened = open_index(str(kb))
+    assert reopened.version == 1
+    assert reopened.search('password reset', top_k=1)[0]['source'] == 'login.md'
+
+
+def test_knowledge_base_hot_reload(tmp_path):
+    """Test that KB edits are re-indexed incrementally and swapped in as a new version."""
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    (tmp_path / 'login.md').write_text("# Login\n\nReset your password from the sign-in page.\n")
+    retriever = KnowledgeRetriever(knowledge_base_path=str(tmp_path), reload_interval_s=0)
+    ticket = {'ticket_id': 'T1', 'message': 'How long does a refund take?', 'validation_status': 'valid', 'intent': 'refund'}
+    before = retriever.watcher.current
+    assert retriever.process(dict(ticket))['knowledge_context'][0]['index_version'] == 1
+
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds now take 2 business days.\n")
+    (tmp_path / 'login.md').unlink()
+    (tmp_path / 'warranty.md').write_text("# Warranty\n\nDevices carry a two year warranty.\n")
+    assert retriever.watcher.refresh()
+    assert not retriever.watcher.refresh()
+
+    context = retriever.process(dict(ticket))['knowledge_context']
+    assert context[0]['index_version'] == 2
+    assert '2 business days' in context[0]['content']
+    assert all(p['source'] != 'login.md' for p in retriever.watcher.current.lexical.search('password', top_k=5))
+    assert [name for name, _ in retriever.watcher.current.lexical.segments] == ['base-000001', 'seg-000002']
+    # A request still holding the previous snapshot keeps a consistent view
+    assert '5-7 business days' in before.lexical.search('refund', top_k=1)[0]['content']
+
+
+def test_kb_index_merge_and_default_location(tmp_path):
+    """Test that a merge on refresh keeps the new content and the index stays outside the KB."""
+    from handlers.kb_index import refresh_index
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    index = open_index(str(tmp_path))
+    assert index.index_dir == default_index_dir(str(tmp_path))
+    assert not index.index_dir.startswith(str(tmp_path)) and os.listdir(tmp_path) == ['refunds.md']
+    
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds now take 2 business days.\n")
+    merged = refresh_index(index, str(tmp_path), max_segments=1)
+    assert [name for name, _ in merged.segments] == ['base-000002']
+    assert '2 business days' in merged.search('refund', top_k=1)[0]['content']
+    assert open_index(str(tmp_path)).search('refund', top_k=1)[0]['content'] == merged.search('refund', top_k=1)[0]['content']
+
+
+def test_kb_index_default_location_survives_restarts(tmp_path, monkeypatch):
+    """Test that the default index dir is reused after a restart and not shared by live processes."""
+    from handlers import kb_index
+    monkeypatch.setattr(kb_index.tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    first = kb_index.open_index(str(kb))
+    assert kb_index.default_index_dir(str(kb)) == first.index_dir
+
+    # Another live process on the host gets its own slot
+    held = kb_index._claimed_slots.copy()
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    assert kb_index.default_index_dir(str(kb)) != first.index_dir
+
+    # After both exit, a restarted process loads the first slot's index without rebuilding
+    for _, lock_file in list(held.values()) + list(kb_index._claimed_slots.values()):
+        lock_file.close()
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    monkeypatch.setattr(kb_index, '_full_rebuild', lambda *args, **kwargs: pytest.fail('index rebuilt'))
+    reopened = kb_index.open_index(str(kb))
+    assert reopened.index_dir == first.index_dir and reopened.version == first.version
+    assert '5-7 business days' in reopened.search('refund', top_k=1)[0]['content']
+
+
+def test_retrieval_cache_hits_and_invalidation(tmp_path):
+    """Test that equivalent queries share a cache entry and a KB reload invalidates it."""
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    retriever = KnowledgeRetriever(knowledge_base_path=str(tmp_path), reload_interval_s=0)
+    ticket = {'ticket_id': 'T1', 'validation_status': 'valid', 'intent': 'refund'}
+
+    first = retriever.process({**ticket, 'message': 'Where is my refund?'})
+    first['knowledge_context'][0]['content'] = 'mutated downstream'
+    second = retriever.process({**ticket, 'message': 'my REFUND, where is it'})
+    assert second['knowledge_context'][0]['content'].startswith('Refunds are processed')
+    assert retriever.cache_metrics()['per_intent']['refund'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds now take 2 business days.\n")
+    retriever.watcher.refresh()
+    third = retriever.process({**ticket, 'message': 'Where is my refund?'})
+    assert '2 business days' in third['knowledge_context'][0]['content']
+    assert retriever.cache_metrics()['invalidations'] == 1
+
+
+
+def test_vector_index_incremental_and_hybrid(tmp_path):
+    """Test dense search, incremental re-indexing of changed files and hybrid retrieval."""
+    pytest.importorskip('numpy')
+    from handlers.vector_index import VectorIndex, open_vector_index
+
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    (kb / 'login.md').write_text("# Login\n\nReset your password from the sign-in page.\n")
+    index = open_vector_index(str(kb))
+    assert index.search('refunding my order', top_k=1)[0]['source'] == 'refunds.md'
+
+    (kb / 'warranty.md').write_text("# Warranty\n\nDevices carry a two year warranty.\n")
+    (kb / 'login.md').unlink()
+    reopened = VectorIndex(os.path.join(default_index_dir(str(kb)), 'vectors'))
+    assert reopened.sync_directory(str(kb)) == {'added': 1, 'updated': 0, 'removed': 1}
+    assert reopened.count == 3 and reopened.live_count == 2
+    assert 'login.md' not in [p['source'] for p in reopened.search('password', top_k=5)]
+    assert reopened.search('warranty for devices', top_k=1)[0]['source'] == 'warranty.md'
+
+    retriever = KnowledgeRetriever(knowledge_base_path=str(kb), retrieval_mode='hybrid', reload_interval_s=0)
+    result = retriever.process({'ticket_id': 'T1', 'message': 'How long do refunds take?', 'validation_status': 'valid', 'intent': 'refund'})
+    assert result['context_sources'][0] == 'refunds.md'
+    assert result['knowledge_context'][0]['retrieval'] == 'hybrid'
+
+
+def test_vector_index_recovers_from_interrupted_add(tmp_path):
+    """Test that rows written past meta.json by an interrupted add are truncated on open."""
+    pytest.importorskip('numpy')
+    from handlers.vector_index import VectorIndex
+
+    index = VectorIndex(str(tmp_path / 'vectors'))
+    index.add([{'source': 'refunds.md', 'title': 'Refunds', 'content': 'Refunds are processed within 5-7 business days.'}])
+    # Crash after the data files were appended, before meta.json was replaced
+    data = tmp_path / 'vectors' / f"gen-{index.generation}"
+    with open(data / 'vectors.f32', 'ab') as fh:
+        fh.write(b'\0' * index.embedder.dim * 4)
+    with open(data / 'passages.jsonl', 'ab') as fh:
+        fh.write(b'{"source": "partial')
+
+    reopened = VectorIndex(str(tmp_path / 'vectors'))
+    assert (data / 'vectors.f32').stat().st_size == reopened.embedder.dim * 4
+    reopened.add([{'source': 'login.md', 'title': 'Login', 'content': 'Reset your password from the sign-in page.'}])
+    top = reopened.search('Login Reset your password from the sign-in page.', top_k=1)[0]
+    assert top['source'] == 'login.md'
+    assert top['dense_score'] > 0.99
+
+
 def test_response_generator():
     """Test response generation."""
     generator = ResponseGenerator()
@@ -83,6 +251,140 @@ def test_response_generator():
     assert len(result['generated_response']) > 0
 
 
+
+def test_response_generator_reuses_near_duplicate_response():
+    """Test the semantic response cache: re-templating, provenance, scoping and caching only validated responses."""
+    cache = SemanticResponseCache()
+    generator = ResponseGenerator(response_cache=cache)
+    context = [{'content': 'Refunds are processed within 5-7 business days.', 'source': 'refund_policy.md'}]
+    ticket = {'customer_id': 'CUST-1', 'validation_status': 'valid', 'intent': 'refund', 'knowledge_context': context}
+
+    def validate(payload, threshold):
+        validator = ResponseValidator(threshold=threshold, max_refinements=0, response_cache=cache)
+        return validator.process({'payload': payload, 'route': {'actors': ['response-validator'], 'current': 0}})['payload']
+
+    rejected = validate(generator.process({**ticket, 'ticket_id': 'T0', 'message': 'I want a refund for order 11111'}), 1.01)
+    assert not rejected['validation_passed'] and cache.metrics()['entries'] == 0
+
+    first = validate(generator.process({**ticket, 'ticket_id': 'T1', 'message': 'I want a refund for order 12345'}), 0.5)
+    second = generator.process({**ticket, 'ticket_id': 'T2', 'message': 'i want a refund for order #98765'})
+    assert first['validation_passed'] and first['response_provenance'] == {'source': 'llm'}
+    assert second['response_provenance']['source'] == 'semantic_cache'
+    assert second['response_provenance']['source_ticket_id'] == 'T1'
+    assert 'order #98765' in second['generated_response'] and '12345' not in second['generated_response']
+
+    other_intent = generator.process({**ticket, 'ticket_id': 'T3', 'intent': 'question', 'message': 'I want a refund for order 555'})
+    unrelated = generator.process({**ticket, 'ticket_id': 'T4', 'message': 'My package arrived damaged and the box was open'})
+    assert other_intent['response_provenance'] == {'source': 'llm'}
+    assert unrelated['response_provenance'] == {'source': 'llm'}
+
+
+
+def test_response_cache_templates_whole_values_only():
+    """Test that a short id occurring inside the response text is not turned into a placeholder."""
+    cache = SemanticResponseCache()
+    ticket = {'ticket_id': 'T1', 'customer_id': '5', 'message': 'How long does a refund for order 12345 take?'}
+    response = 'Refunds for order 12345 take 5-7 business days; order 123456 is unaffected.'
+    cache.store(ticket, 'refund', '', response)
+    assert to_template(response, ticket_fields(ticket)) == (
+        'Refunds for order {{ref_0}} take 5-7 business days; order 123456 is unaffected.'
+    )
+
+    reused = cache.lookup({'ticket_id': 'T2', 'customer_id': '9', 'message': 'How long does a refund for order 67890 take?'}, 'refund', '')
+    assert reused['response'] == 'Refunds for order 67890 take 5-7 business days; order 123456 is unaffected.'
+
+
+def test_context_packer_ranks_dedups_and_truncates():
+    """Test packing passages by relevance into a token budget."""
+    passages = [
+        {'content': 'Gift cards cannot be refunded.', 'relevance_score': 0.2},
+        {'content': 'Refunds are processed within 5-7 business days. Contact support with your order ID.', 'relevance_score': 0.9},
+        {'content': 'Refunds are processed within 5-7 business days.  Contact support with your order ID!', 'relevance_score': 0.8},
+        {'content': 'Items can be returned within 30 days. They must be unused. Defective items are refunded in full.', 'relevance_score': 0.5},
+    ]
+    packed = pack_context(passages, budget_tokens=35, min_tokens=5)
+    assert packed['passages'][0]['relevance_score'] == 0.9
+    assert packed['dropped_duplicates'] == 1
+    assert packed['truncated'] and packed['passages'][-1]['content'] == 'Items can be returned within 30 days.'
+    assert packed['dropped_over_budget'] == 1
+    assert packed['tokens'] <= 35
+
+    generator = ResponseGenerator(context_token_budget=20)
+    result = generator.process({'ticket_id': 'T1', 'message': 'refund?', 'validation_status': 'valid', 'intent': 'refund', 'knowledge_context': passages})
+    assert result['context_tokens'] <= 20
+    assert 'Gift cards' not in result['generated_response']
+
+
+
+def test_llm_client_pools_retries_and_hedges():
+    """Test keep-alive reuse, retry of injected 503s and hedging of a slow call."""
+    slow_call = 25  # request number that stalls; its hedge answers at once
+    with FakeModelServer(latency_s=lambda n: 1.0 if n == slow_call else 0.0, fail_first=2) as server:
+        # A fixed hedge delay keeps the test independent of how fast the pings were
+        client = LLMClient(server.url, max_in_flight=2, max_connections=2, backoff_s=0.01, hedge_after_s=0.5)
+        first = client.complete('hello there', max_tokens=5)
+        assert first['attempts'] == 3 and first['text'].startswith('echo')
+        for _ in range(22):
+            client.complete('ping')
+        hedged = client.complete('slow one')
+
+        metrics = client.metrics()
+        assert hedged['hedged'] and hedged['latency_s'] < 1.0
+        assert metrics['hedges'] == 1 and metrics['hedge_wins'] == 1
+        assert metrics['retries'] == 2 and metrics['calls'] == 24
+        assert metrics['connections_opened'] <= 2
+        assert metrics['prompt_tokens'] > 0 and metrics['latency_p50_s'] is not None
+
+        generator = ResponseGenerator(llm_client=client)
+        result = generator.process({'ticket_id': 'T1', 'message': 'refund please', 'validation_status': 'valid', 'intent': 'refund', 'knowledge_context': []})
+        assert result['generated_response'].startswith('echo: You are a customer support agent')
+        assert result['llm_usage']['completion_tokens'] > 0
+        client.close()
+
+
+def test_llm_client_does_not_hedge_batches():
+    """Test that a slow batch is not hedged and does not move the single-call hedge delay."""
+    with FakeModelServer(latency_s=0.3) as server:
+        client = LLMClient(server.url, hedge_min_samples=1)
+        result = client.complete_batch(['one', 'two', 'three'])
+        assert len(result['texts']) == 3 and not result['hedged']
+        assert len(server.requests) == 1
+        
+        metrics = client.metrics()
+        assert metrics['hedges'] == 0 and metrics['calls'] == 1
+        assert metrics['hedge_after_s'] is None
+        client.close()
+
+
+def test_llm_client_records_latency_when_no_slot_is_free_to_hedge():
+    """Test that a call whose hedge could not be sent (pool saturated) still counts towards the hedge percentile."""
+    with FakeModelServer(latency_s=0.2) as server:
+        client = LLMClient(server.url, max_in_flight=1, hedge_after_s=0.05)
+        result = client.complete('slow under saturation')
+        metrics = client.metrics()
+        assert not result['hedged'] and metrics['hedges'] == 0
+        assert metrics['latency_p50_s'] is not None and metrics['latency_p50_s'] >= 0.2
+        client.close()
+
+
+def test_llm_client_shared_per_configuration(monkeypatch):
+    """Test that a judge on the generator's server keeps its own model and limits."""
+    monkeypatch.setenv('LLM_BASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('LLM_MODEL', 'big-gen')
+    monkeypatch.setenv('JUDGE_BASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('JUDGE_MODEL', 'small-judge')
+    monkeypatch.setenv('JUDGE_MAX_IN_FLIGHT', '16')
+    generator, judge = LLMClient.from_env('LLM'), LLMClient.from_env('JUDGE')
+    assert generator is LLMClient.from_env('LLM')
+    assert judge is not generator
+    assert (judge.model, judge.max_in_flight) == ('small-judge', 16)
+    assert (generator.model, generator.max_in_flight) == ('big-gen', 4)
+    
+    monkeypatch.setenv('JUDGE_MODEL', 'big-gen')
+    monkeypatch.delenv('JUDGE_MAX_IN_FLIGHT')
+    assert LLMClient.from_env('JUDGE') is generator
+
+
 def test_response_validator():
     """Test response validation."""
     validator = ResponseValidator(threshold=0.7)
@@ -104,3 +406,358 @@ def test_response_validator():
     assert result['payload']['judge_score'] >= 0.0
     assert result['payload']['judge_score'] <= 1.0
 
+
+
+def test_ticket_ingester_stamps_deadline():
+    """Test that ingestion stamps an end-to-end deadline."""
+    ticket = {
+        'ticket_id': 'TICKET-003',
+        'customer_id': 'CUST-123',
+        'message': 'Where is my order?'
+    }
+    result = ingest_ticket(ticket)
+    assert result['deadline_at'] > time.time()
+
+
+def test_expired_ticket_is_shed():
+    """Test that an expired ticket skips classification and is escalated."""
+    classifier = IntentClassifier()
+    ticket = {
+        'ticket_id': 'TICKET-004',
+        'customer_id': 'CUST-123',
+        'message': 'I need a refund',
+        'validation_status': 'valid',
+        'deadline_at': time.time() - 1
+    }
+    result = classifier.process(ticket)
+    assert result['validation_status'] == 'expired'
+    assert 'intent' not in result
+    assert escalate_ticket(result)['escalation_reason'] == 'deadline_expired'
+
+
+def test_response_validator_skips_judge_when_short_on_time():
+    """Test that the validator uses the heuristic score near the deadline."""
+    validator = ResponseValidator(threshold=0.7, judge_min_budget_s=1.0)
+    envelope = {
+        'payload': {
+            'ticket_id': 'TICKET-005',
+            'message': 'I need a refund',
+            'validation_status': 'valid',
+            'generated_response': 'Thank you for contacting us. We will process your refund within 5-7 business days.'
+        },
+        'route': {'actors': ['response-validator', 'response-formatter'], 'current': 0},
+        'headers': {'deadline_at': time.time() + 0.5}
+    }
+    result = validator.process(envelope)
+    assert result['payload']['judge_tier'] == 'heuristic'
+    assert result['route']['current'] == 1
+
+
+def test_response_validator_cascade_escalates_only_uncertain_scores():
+    """Test that only uncertain heuristic scores reach the judge, in one batched request."""
+    responses = [
+        'Thank you for contacting us. We will process your refund within 5-7 business days and email you a confirmation.',
+        'No.',
+        'Thank you, we can help with that refund request today.',
+        'Your refund request was received and is now being processed.',
+    ]
+    envelopes = [
+        {
+            'payload': {'ticket_id': f'T-{i}', 'message': 'I need a refund', 'validation_status': 'valid',
+                        'generated_response': response},
+            'route': {'actors': ['response-validator', 'response-formatter'], 'current': 0}
+        }
+        for i, response in enumerate(responses)
+    ]
+    with FakeModelServer(reply=lambda prompt: '0.2') as server:
+        client = LLMClient(server.url, max_retries=0)
+        validator = ResponseValidator(threshold=0.7, judge_client=client, uncertainty_band=(0.55, 0.8))
+        results = validator.process_batch(envelopes)
+        assert len(server.requests) == 1
+        assert len(server.requests[0]['prompt']) == 2
+        client.close()
+    
+    payloads = [result['payload'] for result in results]
+    assert [p['judge_tier'] for p in payloads] == ['heuristic', 'heuristic', 'llm', 'llm']
+    assert [p['validation_passed'] for p in payloads] == [True, False, False, False]
+    assert all(result['route']['current'] == 1 for result in results)
+    assert validator.metrics()['escalation_rate'] == 0.5
+
+
+def test_response_validator_merges_judge_requests_of_concurrent_calls():
+    """Test that one-envelope process() calls share a judge request only when a batch window is set."""
+    def envelope(i):
+        return {
+            'payload': {'ticket_id': f'T-{i}', 'message': 'I need a refund', 'validation_status': 'valid',
+                        'generated_response': 'Thank you, we can help with that refund request today.'},
+            'route': {'actors': ['response-validator', 'response-formatter'], 'current': 0}
+        }
+
+    with FakeModelServer(reply=lambda prompt: '0.9') as server:
+        client = LLMClient(server.url, max_retries=0)
+        # Without a window, each Asya call (one envelope) is its own judge request
+        sequential = ResponseValidator(max_refinements=0, judge_client=client, uncertainty_band=(0.55, 0.8))
+        for i in range(2):
+            sequential.process(envelope(i))
+        assert len(server.requests) == 2
+
+        batched = ResponseValidator(
+            max_refinements=0, judge_client=client, uncertainty_band=(0.55, 0.8),
+            judge_batch_window_s=0.5, judge_max_batch=4
+        )
+        results = [None] * 4
+
+        def validate(i):
+            results[i] = batched.process(envelope(i))
+
+        threads = [threading.Thread(target=validate, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+
+    assert [len(request['prompt']) for request in server.requests[2:]] == [4]
+    assert all(result['payload']['judge_tier'] == 'llm' and result['payload']['validation_passed'] for result in results)
+    assert batched.metrics()['judged'] == 4 and batched.metrics()['judge_batches'] == 1
+
+
+def test_response_validator_refinement_loop():
+    """Test that a failed response is regenerated with feedback, then escalated when out of time."""
+    validator = ResponseValidator(threshold=0.7, max_refinements=2, refinement_min_budget_s=1.0)
+    generator = ResponseGenerator()
+    envelope = {
+        'payload': {'ticket_id': 'TICKET-007', 'message': 'Where is my order?', 'intent': 'general',
+                    'validation_status': 'valid', 'generated_response': 'No.'},
+        'route': {'actors': ['response-generator', 'response-validator', 'response-formatter',
+                             'escalation-handler'], 'current': 1}
+    }
+    result = validator.process(envelope)
+    payload = result['payload']
+    assert result['route']['actors'][2:4] == ['response-generator', 'response-validator']
+    assert result['route']['current'] == 2
+    assert payload['refinement_attempts'] == 1
+    assert payload['refinement_feedback']['issues']
+    
+    generator.process(payload)
+    result = validator.process(result)
+    assert result['payload']['validation_passed']
+    assert result['payload']['refinement_outcome'] == 'passed'
+    assert result['payload']['refinement_latency_s'] >= 0
+    assert 'needs_refinement' not in result['payload']
+    
+    short_on_time = {
+        'payload': {'ticket_id': 'TICKET-008', 'message': 'Where is my order?', 'validation_status': 'valid',
+                    'generated_response': 'No.', 'deadline_at': time.time() + 0.5},
+        'route': {'actors': ['response-generator', 'response-validator', 'response-formatter'], 'current': 1}
+    }
+    result = validator.process(short_on_time)
+    assert result['route']['actors'] == ['response-generator', 'response-validator', 'response-formatter',
+                                         'escalation-handler']
+    assert result['payload']['refinement_outcome'] == 'deadline'
+    assert escalate_ticket(result['payload'])['escalation_reason'] == 'refinement_exhausted'
+
+
+def test_lane_router_rewrites_route_by_urgency():
+    """Test that high-urgency tickets are sent to the high lane variants."""
+    router = LaneRouter()
+    envelope = {
+        'payload': {'ticket_id': 'TICKET-006', 'validation_status': 'valid', 'urgency': 'high'},
+        'route': {
+            'actors': ['ticket-ingester', 'intent-classifier', 'lane-router', 'knowledge-retriever', 'escalation-handler'],
+            'current': 2
+        }
+    }
+    result = router.process(envelope)
+    assert result['route']['actors'][3:] == ['knowledge-retriever-high', 'escalation-handler']
+    assert result['route']['current'] == 3
+    assert result['payload']['priority_lane'] == 'high'
+
+
+def test_lane_router_only_routes_to_deployed_lanes():
+    """Test that tickets of lanes without deployed variants stay on the base actors."""
+    router = LaneRouter(laned_actors='knowledge-retriever', lanes='high')
+    route = ['ticket-ingester', 'intent-classifier', 'lane-router', 'knowledge-retriever', 'response-generator']
+    results = {
+        urgency: router.process({
+            'payload': {'ticket_id': f'TICKET-{urgency}', 'validation_status': 'valid', 'urgency': urgency},
+            'route': {'actors': list(route), 'current': 2}
+        })
+        for urgency in ('high', 'medium')
+    }
+    assert results['high']['route']['actors'][3:] == ['knowledge-retriever-high', 'response-generator']
+    assert results['medium']['route']['actors'] == route
+    assert results['medium']['payload']['priority_lane'] == 'low'
+    with pytest.raises(ValueError):
+        LaneRouter(lanes='urgent')
+
+
+def test_weighted_fair_poller_prioritises_without_starving():
+    """Test that high-urgency work is served first but low urgency still progresses."""
+    broker = LocalBroker()
+    poller = WeightedFairPoller.for_actor(broker, 'knowledge-retriever')
+    for i in range(50):
+        broker.queue('asya-knowledge-retriever').send({'id': f'low-{i}'})
+    for i in range(10):
+        broker.queue('asya-knowledge-retriever-high').send({'id': f'high-{i}'})
+
+    lanes = [poller.poll()[0] for _ in range(14)]
+    # All high tickets are served within the first 14 polls, low is not starved
+    assert lanes.count('high') == 10
+    assert 'low' in lanes[:7]
+    assert poller.poll(timeout=0) == ('low', {'id': 'low-4'})
+
+
+def test_ticket_ingester_admission_control(monkeypatch):
+    """Test that low-priority tickets are deferred or rejected under load."""
+    monkeypatch.setattr(handlers.ticket_ingester, 'admission', AdmissionController(soft_watermark=1, hard_watermark=2))
+    tickets = [
+        {'ticket_id': 'T-1', 'customer_id': 'C', 'message': 'Question about my plan'},
+        {'ticket_id': 'T-2', 'customer_id': 'C', 'message': 'Please reply soon about my plan'},
+        {'ticket_id': 'T-3', 'customer_id': 'C', 'message': 'Another question about my plan'},
+        {'ticket_id': 'T-4', 'customer_id': 'C', 'message': 'URGENT: account locked'},
+    ]
+    results = [ingest_ticket(ticket) for ticket in tickets]
+    assert [r['admission']['decision'] for r in results] == ['admit', 'downgrade', 'reject', 'admit']
+    assert results[1]['service_level'] == 'reduced'
+    assert results[2]['validation_status'] == 'rejected'
+    assert results[2]['admission']['retry_after_s'] > 0
+
+
+def test_ticket_ingester_admission_follows_queue_backlog(monkeypatch):
+    """Test that a backlog probe, not recent admissions, sets the load, and that it is exported as metrics."""
+    backlog = {'depth': 0}
+    controller = AdmissionController(soft_watermark=2, hard_watermark=10, probe_interval_s=0, backlog_probe=lambda: backlog['depth'])
+    monkeypatch.setattr(handlers.ticket_ingester, 'admission', controller)
+    monkeypatch.setattr(handlers.ticket_ingester, 'dedup', DuplicateSuppressor())
+    tickets = [{'ticket_id': f'T-4{i}', 'customer_id': f'C-4{i}', 'message': f'Question {i} about my plan'} for i in range(5)]
+    assert all(ingest_ticket(dict(ticket))['admission']['decision'] == 'admit' for ticket in tickets[:4])
+
+    backlog['depth'] = 3
+    deferred = ingest_ticket(dict(tickets[4]))
+    assert deferred['validation_status'] == 'deferred' and deferred['admission']['load'] == 3
+
+    def unreachable():
+        raise ConnectionError('queue unreachable')
+
+    controller.backlog_probe = unreachable
+    metrics = handlers.ticket_ingester.metrics()['admission']
+    assert metrics['load_source'] == 'in_flight' and metrics['in_flight'] == 4
+    assert metrics['deferred_total'] == 1 and metrics['max_admission_rate_per_s'] == round(2 / 30, 3)
+
+
+def test_ticket_ingester_suppresses_duplicates(monkeypatch):
+    """Test that re-submitted tickets are short-circuited to the original."""
+    monkeypatch.setattr(handlers.ticket_ingester, 'dedup', DuplicateSuppressor())
+    original = ingest_ticket({'ticket_id': 'T-10', 'customer_id': 'C-1', 'message': 'My order never arrived!'})
+    resent_chat = ingest_ticket({'ticket_id': 'T-11', 'customer_id': 'C-1', 'message': 'my order  never arrived'})
+    retried = ingest_ticket({'ticket_id': 'T-10', 'customer_id': 'C-1', 'message': 'My order never arrived!'})
+    other_customer = ingest_ticket({'ticket_id': 'T-12', 'customer_id': 'C-2', 'message': 'My order never arrived!'})
+    assert original['validation_status'] == 'valid'
+    assert resent_chat['validation_status'] == 'duplicate'
+    assert resent_chat['duplicate_of'] == 'T-10'
+    assert retried['duplicate_of'] == 'T-10'
+    assert other_customer['validation_status'] == 'valid'
+
+
+def test_ticket_ingester_retry_after_deferral_is_admitted(monkeypatch):
+    """Test that a deferred ticket is not remembered, so its retry is admitted rather than taken for a copy."""
+    controller = AdmissionController(soft_watermark=1, hard_watermark=5)
+    monkeypatch.setattr(handlers.ticket_ingester, 'admission', controller)
+    monkeypatch.setattr(handlers.ticket_ingester, 'dedup', DuplicateSuppressor())
+    busy = ingest_ticket({'ticket_id': 'T-20', 'customer_id': 'C-1', 'message': 'URGENT: account locked'})
+    ticket = {'ticket_id': 'T-21', 'customer_id': 'C-2', 'message': 'Question about my plan'}
+    deferred = ingest_ticket(dict(ticket))
+    assert deferred['validation_status'] == 'deferred'
+    
+    controller.complete(busy['ticket_id'])
+    retried = ingest_ticket(dict(ticket))
+    assert retried['validation_status'] == 'valid'
+    assert retried['admission']['decision'] == 'admit'
+    assert ingest_ticket(dict(ticket))['validation_status'] == 'duplicate'
+
+
+def test_ticket_ingester_backfill_skips_admission_and_deadline(monkeypatch):
+    """Test that bulk-ingested tickets are neither turned away under load nor given a deadline."""
+    monkeypatch.setattr(handlers.ticket_ingester, 'admission', AdmissionController(soft_watermark=0, hard_watermark=0))
+    live = ingest_ticket({'ticket_id': 'T-30', 'customer_id': 'C-30', 'message': 'Question about my plan'})
+    backfill = ingest_ticket({
+        'ticket_id': 'T-31', 'customer_id': 'C-31', 'message': 'Question about my old plan',
+        'deadline_at': 1_600_000_000, 'ingest_mode': 'backfill',
+    })
+    assert live['validation_status'] == 'rejected'
+    assert backfill['validation_status'] == 'valid'
+    assert 'admission' not in backfill
+    assert 'deadline_at' not in backfill
+
+
+def test_dedup_falls_back_when_exact_store_evicted():
+    """Test that a filter-only hit is flagged, not dropped."""
+    dedup = DuplicateSuppressor(store=RecentKeyStore(max_entries=2))
+    assert dedup.check({'ticket_id': 'A', 'customer_id': 'C', 'message': 'first'})['status'] == 'new'
+    assert dedup.check({'ticket_id': 'B', 'customer_id': 'C', 'message': 'second'})['status'] == 'new'
+    assert dedup.check({'ticket_id': 'A', 'customer_id': 'C', 'message': 'first'})['status'] == 'possible_duplicate'
+
+
+def _write_jsonl(path, tickets):
+    with open(path, 'w') as fh:
+        for ticket in tickets:
+            fh.write((ticket if isinstance(ticket, str) else json.dumps(ticket)) + '\n')
+
+
+def test_bulk_ingester_backpressure_and_validation(tmp_path):
+    """Test bulk ingestion into a bounded local queue drained by a consumer."""
+    (tmp_path / 'day2').mkdir()
+    _write_jsonl(tmp_path / 'day1.jsonl', [{'ticket_id': f'A{i}', 'customer_id': 'C', 'message': 'hi'} for i in range(300)])
+    _write_jsonl(tmp_path / 'day2' / 'part.jsonl', ['{broken', {'ticket_id': 'B1', 'customer_id': 'C', 'message': ' '}])
+
+    broker = LocalBroker()
+    queue = broker.queue_for_actor('ticket-ingester')
+    consumed = []
+
+    def consume():
+        while len(consumed) < 300:
+            envelope = queue.receive(timeout=1.0)
+            if envelope is None:
+                return
+            consumed.append(envelope)
+            time.sleep(0.0005)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    report = BulkIngester(LocalQueuePublisher(broker), chunk_size=64, batch_size=16, max_queue_depth=32, backoff_s=0.001).run([str(tmp_path)])
+    consumer.join()
+
+    assert report['published'] == 300
+    assert report['invalid'] == 2
+    assert len(consumed) == 300
+    assert consumed[0]['route']['actors'][0] == 'ticket-ingester'
+    assert consumed[0]['payload']['ingest_mode'] == 'backfill'
+    assert report['backpressure_waits'] > 0
+
+
+def test_bulk_ingester_resumes_from_checkpoint(tmp_path):
+    """Test that a second run continues after the last published ticket."""
+    _write_jsonl(tmp_path / 'tickets.jsonl', [{'ticket_id': f'T{i}', 'customer_id': 'C', 'message': 'hi'} for i in range(250)])
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    broker = LocalBroker()
+
+    first = BulkIngester(LocalQueuePublisher(broker), batch_size=50, checkpoint_path=checkpoint).run([str(tmp_path / 'tickets.jsonl')], limit=100)
+    second = BulkIngester(LocalQueuePublisher(broker), batch_size=50, checkpoint_path=checkpoint).run([str(tmp_path / 'tickets.jsonl')])
+
+    assert (first['published'], second['published']) == (100, 150)
+    ids = [queue_item['payload']['ticket_id'] for queue_item in iter(lambda: broker.queue_for_actor('ticket-ingester').receive(), None)]
+    assert ids == [f'T{i}' for i in range(250)]
+
+
+def test_bulk_ingester_dry_run_does_not_move_the_checkpoint(tmp_path):
+    """Test that a run with update_checkpoint=False starts from the checkpoint but leaves it as it was."""
+    _write_jsonl(tmp_path / 'tickets.jsonl', [{'ticket_id': f'T{i}', 'customer_id': 'C', 'message': 'hi'} for i in range(250)])
+    checkpoint = tmp_path / 'checkpoint.json'
+    BulkIngester(LocalQueuePublisher(LocalBroker()), batch_size=50, checkpoint_path=str(checkpoint)).run([str(tmp_path)], limit=100)
+    saved = checkpoint.read_text()
+
+    dry = BulkIngester(LocalQueuePublisher(LocalBroker()), checkpoint_path=str(checkpoint), update_checkpoint=False).run([str(tmp_path)])
+    assert dry['published'] == 150 and checkpoint.read_text() == saved
+    real = BulkIngester(LocalQueuePublisher(LocalBroker()), checkpoint_path=str(checkpoint)).run([str(tmp_path)])
+    assert real['published'] == 150
@@ -0,0 +1,129 @@
+"""
+Measure Ray Serve dynamic batching on a local single-node Ray instance.
+
+Usage (from agentic_customer_support/):
+    python -m ray_app.benchmarks.bench_serve_batching [--requests 2000] [--concurrency 64]
+        [--batch-sizes 1,8,16] [--wait-ms 10] [--llm-latency-ms 50]
+
+For each max batch size, the full pipeline application is deployed with
+``build_app``. ``--requests`` tickets are sent through its handle with
+``--concurrency`` in flight, and throughput plus end-to-end latency
+percentiles are reported. A batch size of 1 is the unbatched baseline. With
+``--llm-latency-ms``, generation and judging go to the fake model server in
+``ray_app/tests``, which answers a batched request as fast as a single one,
+like a GPU-backed server.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+import ray
+from ray import serve
+
+from ray_app.serve.pipeline import build_app
+from ray_app.tests.fake_model_server import FakeModelServer
+
+MESSAGES = [
+    "I need a refund for order 1234, it arrived broken",
+    "The app is not working after the update, error on login",
+    "How do I change my shipping address?",
+    "Please cancel my subscription immediately",
+    "Where is my package? It was due yesterday",
+]
+
+
+def fake_reply(prompt: str) -> str:
+    if prompt.endswith("Score:"):
+        return " 0.9"
+    return " Thank you for contacting us. I understand the problem and will help you resolve it today."
+
+
+def make_ticket(i: int) -> Dict[str, Any]:
+    return {'ticket_id': f"BENCH-{i}", 'customer_id': f"CUST-{i % 97}", 'message': f"{MESSAGES[i % len(MESSAGES)]} #{i}"}
+
+
+async def drive(handle, total: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            result = await handle.remote(make_ticket(i))
+            if result.get('status') not in ('completed', 'escalated'):
+                raise RuntimeError(f"Ticket {i} failed: {result}")
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+def run(batch_size: int, wait_s: float, requests: int, concurrency: int) -> Dict[str, float]:
+    handle = serve.run(
+        build_app({'max_batch_size': batch_size, 'batch_wait_timeout_s': wait_s}),
+        name=f"bench-batch-{batch_size}",
+        route_prefix=None,
+    )
+
+    async def measure():
+        await drive(handle, min(200, requests), concurrency)  # warm-up
+        started = time.perf_counter()
+        latencies = await drive(handle, requests, concurrency)
+        return sorted(latencies), time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(measure())
+    serve.delete(f"bench-batch-{batch_size}")
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        'throughput': requests / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-sizes", default="1,8,16", help="Comma-separated max batch sizes to compare")
+    parser.add_argument("--wait-ms", type=float, default=10.0, help="batch_wait_timeout_s, in milliseconds")
+    parser.add_argument("--llm-latency-ms", type=float, help="Serve generation and judging from a fake model server")
+    args = parser.parse_args()
+
+    env_vars = {
+        # Keep admission control out of the measurement
+        'ADMISSION_SOFT_WATERMARK': str(args.concurrency * 4),
+        'ADMISSION_HARD_WATERMARK': str(args.concurrency * 8),
+        'RESPONSE_CACHE_SIZE': '0',
+    }
+    server = None
+    if args.llm_latency_ms is not None:
+        server = FakeModelServer(reply=fake_reply, latency_s=args.llm_latency_ms / 1000).__enter__()
+        env_vars.update({'LLM_BASE_URL': server.url, 'JUDGE_BASE_URL': server.url})
+    ray.init(runtime_env={'env_vars': env_vars})
+
+    try:
+        print(f"{'max_batch':>9} {'req/s':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+        for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+            stats = run(batch_size, args.wait_ms / 1000, args.requests, args.concurrency)
+            print(
+                f"{batch_size:>9} {stats['throughput']:>9.1f} {stats['mean_ms']:>9.1f} "
+                f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+            )
+    finally:
+        serve.shutdown()
+        ray.shutdown()
+        if server is not None:
+            server.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    main()
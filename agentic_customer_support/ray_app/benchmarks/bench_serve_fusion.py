@@ -0,0 +1,84 @@
+"""
+Compare end-to-end latency of stage fusion plans on a local single-node Ray instance.
+
+Usage (from agentic_customer_support/):
+    python -m ray_app.benchmarks.bench_serve_fusion [--plan classify,retrieve,generate,validate,format]
+        [--plan classify+retrieve,generate,validate+format] [--concurrency 1,16] [--requests 500]
+        [--llm-latency-ms 50]
+
+Each ``--plan`` (see ``parse_fusion_plan``) is deployed in turn with
+``build_app``. Tickets are sent through its handle at each concurrency level,
+and latency percentiles and throughput are reported with the number of
+deployment hops per ticket. At concurrency 1, the difference between plans is
+the cost of the hops they remove. Generation and judging go to the fake model
+server in ``ray_app/tests``.
+"""
+
+import argparse
+import asyncio
+import time
+
+import ray
+from ray import serve
+
+from ray_app.benchmarks.bench_serve_batching import drive, fake_reply
+from ray_app.serve.pipeline import build_app, parse_fusion_plan
+from ray_app.tests.fake_model_server import FakeModelServer
+
+DEFAULT_PLANS = [
+    'classify,retrieve,generate,validate,format',
+    'classify,retrieve,generate,validate+format',
+    'classify+retrieve,generate,validate+format',
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plan", action="append", help="Fusion plan to compare (repeatable)")
+    parser.add_argument("--concurrency", default="1,16", help="Comma-separated in-flight request levels")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    plans = args.plan or DEFAULT_PLANS
+    for plan in plans:
+        parse_fusion_plan(plan)
+
+    with FakeModelServer(reply=fake_reply, latency_s=args.llm_latency_ms / 1000) as server:
+        ray.init(runtime_env={'env_vars': {
+            'LLM_BASE_URL': server.url,
+            'JUDGE_BASE_URL': server.url,
+            'RESPONSE_CACHE_SIZE': '0',
+            # Keep admission control out of the measurement
+            'ADMISSION_SOFT_WATERMARK': '1000',
+            'ADMISSION_HARD_WATERMARK': '2000',
+        }})
+        try:
+            print(f"{'plan':<45} {'hops':>4} {'conc':>5} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+            for n, plan in enumerate(plans):
+                handle = serve.run(build_app({'fusion_plan': plan}), name=f"bench-fusion-{n}", route_prefix=None)
+                for concurrency in (int(level) for level in args.concurrency.split(',')):
+
+                    async def measure():
+                        await drive(handle, min(50, args.requests), concurrency)  # warm-up
+                        started = time.perf_counter()
+                        latencies = await drive(handle, args.requests, concurrency)
+                        return sorted(latencies), time.perf_counter() - started
+
+                    latencies, elapsed = asyncio.run(measure())
+
+                    def pct(p: float) -> float:
+                        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+                    print(
+                        f"{plan:<45} {len(parse_fusion_plan(plan)):>4} {concurrency:>5} "
+                        f"{args.requests / elapsed:>8.1f} {pct(0.50):>8.1f} "
+                        f"{pct(0.95):>8.1f} {pct(0.99):>8.1f}"
+                    )
+                serve.delete(f"bench-fusion-{n}")
+        finally:
+            serve.shutdown()
+            ray.shutdown()
+
+
+if __name__ == "__main__":
+    main()
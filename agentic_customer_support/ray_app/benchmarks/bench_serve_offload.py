@@ -0,0 +1,99 @@
+"""
+Measure one stage replica's throughput with handler work on and off its event loop.
+
+Usage (from agentic_customer_support/):
+    python -m ray_app.benchmarks.bench_serve_offload [--stage generate] [--concurrency 1,4,16,64]
+        [--threads 0,4] [--requests 500] [--llm-latency-ms 50] [--max-batch-size 1]
+
+A single replica of the chosen stage deployment is started on a local Ray
+instance for each ``--threads`` value. 0 runs the handler inline on the
+replica's event loop, which was the behaviour before the thread pool. The
+replica is then driven at each concurrency level, and requests/s plus p95
+latency are reported. The generate and validate stages call the fake model server
+from ``ray_app/tests``. Batching is off by default (``--max-batch-size 1``),
+so only the offload is measured.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import ray
+from ray import serve
+
+from ray_app.benchmarks.bench_serve_batching import fake_reply, make_ticket
+from ray_app.serve.pipeline import stage_deployment
+from ray_app.tests.fake_model_server import FakeModelServer
+
+STAGES = ('classify', 'retrieve', 'generate', 'validate')
+
+
+def stage_input(stage: str, i: int) -> Dict[str, Any]:
+    ticket = make_ticket(i)
+    if stage in ('generate', 'validate'):
+        ticket.update(intent='refund', knowledge_context=[], generated_response=f"Thanks, we can help with #{i}.")
+    return ticket
+
+
+async def drive(handle, stage: str, total: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await handle.remote(stage_input(stage, i))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stage", choices=STAGES, default="generate")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated in-flight request levels")
+    parser.add_argument("--threads", default="0,4", help="Comma-separated handler thread pool sizes (0 = inline)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--max-batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    with FakeModelServer(reply=fake_reply, latency_s=args.llm_latency_ms / 1000) as server:
+        ray.init(runtime_env={'env_vars': {
+            'LLM_BASE_URL': server.url,
+            'JUDGE_BASE_URL': server.url,
+            'LLM_MAX_IN_FLIGHT': '64',
+            'JUDGE_MAX_IN_FLIGHT': '64',
+            'RESPONSE_CACHE_SIZE': '0',
+            # Every validated response goes to the judge
+            'JUDGE_UNCERTAINTY_LOW': '0',
+            'JUDGE_UNCERTAINTY_HIGH': '1',
+        }})
+        try:
+            print(f"{'stage':<10} {'threads':>7} {'concurrency':>11} {'req/s':>9} {'p95_ms':>9}")
+            for threads in (int(n) for n in args.threads.split(',')):
+                app = stage_deployment((args.stage,)).options(num_replicas=1, autoscaling_config=None).bind(
+                    (args.stage,), max_batch_size=args.max_batch_size, handler_threads=threads
+                )
+                handle = serve.run(app, name=f"bench-offload-{threads}", route_prefix=None)
+                for concurrency in (int(n) for n in args.concurrency.split(',')):
+
+                    async def measure():
+                        await drive(handle, args.stage, min(50, args.requests), concurrency)  # warm-up
+                        started = time.perf_counter()
+                        latencies = await drive(handle, args.stage, args.requests, concurrency)
+                        return latencies, time.perf_counter() - started
+
+                    latencies, elapsed = asyncio.run(measure())
+                    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000
+                    print(f"{args.stage:<10} {threads:>7} {concurrency:>11} {args.requests / elapsed:>9.1f} {p95:>9.1f}")
+                serve.delete(f"bench-offload-{threads}")
+        finally:
+            serve.shutdown()
+            ray.shutdown()
+
+
+if __name__ == "__main__":
+    main()
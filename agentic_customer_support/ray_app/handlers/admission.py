@@ -0,0 +1,236 @@
+"""Admission control for Ray Serve - adaptive load shedding at pipeline entry."""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+from .intent_classifier import classify_urgency
+
+logger = logging.getLogger(__name__)
+
+ADMIT = 'admit'
+DOWNGRADE = 'downgrade'
+DEFER = 'defer'
+REJECT = 'reject'
+
+
+class AdmissionController:
+    """
+    Decides whether to admit a ticket from current load.
+
+    Load is the number of in-flight tickets and an EWMA of observed end-to-end
+    latency. Admissions that are never completed (e.g. the ticket finished in
+    another pod) age out after inflight_ttl_s, so the in-flight count degrades to
+    "admitted within the last TTL": a rate limit of soft_watermark /
+    inflight_ttl_s tickets per second before low urgency is deferred. Where
+    completions are not seen, a backlog probe (e.g. the summed depth of the
+    downstream queues) replaces the in-flight count as the load.
+
+    Pressure levels and their effect on tickets (high urgency is always admitted):
+        normal   - below the soft watermark and latency within the SLO: admit
+        elevated - soft watermark reached or latency over the SLO:
+                   medium urgency is downgraded, low urgency is deferred
+        critical - hard watermark reached: medium is deferred, low is rejected
+    """
+
+    def __init__(
+        self,
+        soft_watermark: int = 50,
+        hard_watermark: int = 200,
+        latency_slo_s: float = 5.0,
+        inflight_ttl_s: float = 30.0,
+        ewma_alpha: float = 0.2,
+        retry_after_s: float = 10.0,
+        backlog_probe: Optional[Callable[[], int]] = None,
+        probe_interval_s: float = 5.0
+    ):
+        """
+        Initialize the admission controller.
+
+        Args:
+            soft_watermark: In-flight count at which low-priority tickets are degraded
+            hard_watermark: In-flight count at which low-priority tickets are turned away
+            latency_slo_s: Latency EWMA above which pressure is at least elevated
+            inflight_ttl_s: Seconds after which an uncompleted admission is dropped
+            ewma_alpha: Weight of the newest latency sample
+            retry_after_s: Suggested client back-off for deferred/rejected tickets
+            backlog_probe: Optional callable returning the queued work downstream;
+                when set, it is compared with the watermarks instead of the in-flight count
+            probe_interval_s: Seconds a backlog reading is reused
+        """
+        if hard_watermark < soft_watermark:
+            raise ValueError("hard_watermark must be >= soft_watermark")
+        self.soft_watermark = int(soft_watermark)
+        self.hard_watermark = int(hard_watermark)
+        self.latency_slo_s = float(latency_slo_s)
+        self.inflight_ttl_s = float(inflight_ttl_s)
+        self.ewma_alpha = float(ewma_alpha)
+        self.retry_after_s = float(retry_after_s)
+        self.backlog_probe = backlog_probe
+        self.probe_interval_s = float(probe_interval_s)
+
+        self._lock = threading.Lock()
+        self._in_flight: 'OrderedDict[str, float]' = OrderedDict()
+        self.latency_ewma_s: Optional[float] = None
+        self.backlog: Optional[int] = None
+        self._probed_at: Optional[float] = None
+        self.counts = {ADMIT: 0, DOWNGRADE: 0, DEFER: 0, REJECT: 0}
+
+    @classmethod
+    def from_env(cls, backlog_probe: Optional[Callable[[], int]] = None) -> 'AdmissionController':
+        """Build a controller from ADMISSION_* environment variables."""
+        return cls(
+            backlog_probe=backlog_probe,
+            probe_interval_s=float(os.getenv('ADMISSION_PROBE_INTERVAL_S', '5.0')),
+            soft_watermark=int(os.getenv('ADMISSION_SOFT_WATERMARK', '50')),
+            hard_watermark=int(os.getenv('ADMISSION_HARD_WATERMARK', '200')),
+            latency_slo_s=float(os.getenv('ADMISSION_LATENCY_SLO_S', '5.0')),
+            inflight_ttl_s=float(os.getenv('ADMISSION_INFLIGHT_TTL_S', '30.0')),
+            retry_after_s=float(os.getenv('ADMISSION_RETRY_AFTER_S', '10.0')),
+        )
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in admission order, so expired ones are at the front
+        cutoff = now - self.inflight_ttl_s
+        while self._in_flight and next(iter(self._in_flight.values())) < cutoff:
+            self._in_flight.popitem(last=False)
+
+    def _refresh_backlog(self, now: float) -> None:
+        if self.backlog_probe is None:
+            return
+        with self._lock:
+            if self._probed_at is not None and now - self._probed_at < self.probe_interval_s:
+                return
+            self._probed_at = now
+        # Probed outside the lock: it may be a network call
+        try:
+            backlog = int(self.backlog_probe())
+        except Exception as exc:
+            logger.warning(f"Backlog probe failed, falling back to recent admissions: {exc}")
+            backlog = None
+        with self._lock:
+            self.backlog = backlog
+
+    def _load(self) -> int:
+        return self.backlog if self.backlog is not None else len(self._in_flight)
+
+    def _pressure(self) -> str:
+        load = self._load()
+        if load >= self.hard_watermark:
+            return 'critical'
+        if load >= self.soft_watermark or (
+            self.latency_ewma_s is not None and self.latency_ewma_s > self.latency_slo_s
+        ):
+            return 'elevated'
+        return 'normal'
+
+    def admit(self, ticket_id: str, urgency: str) -> Dict[str, Any]:
+        """
+        Decide on a ticket and, unless it is turned away, count it as in flight.
+
+        Args:
+            ticket_id: Ticket identifier
+            urgency: 'high', 'medium' or 'low'
+
+        Returns:
+            Structured decision: decision, reason, pressure, in_flight and,
+            for deferred/rejected tickets, retry_after_s
+        """
+        now = time.monotonic()
+        self._refresh_backlog(now)
+        with self._lock:
+            self._expire(now)
+            pressure = self._pressure()
+
+            if urgency == 'high' or pressure == 'normal':
+                decision = ADMIT
+            elif pressure == 'elevated':
+                decision = DOWNGRADE if urgency == 'medium' else DEFER
+            else:
+                decision = DEFER if urgency == 'medium' else REJECT
+
+            if decision in (ADMIT, DOWNGRADE):
+                self._in_flight[ticket_id] = now
+                self._in_flight.move_to_end(ticket_id)
+            self.counts[decision] += 1
+            in_flight = len(self._in_flight)
+            load = self._load()
+
+        result = {
+            'decision': decision,
+            'reason': 'ok' if pressure == 'normal' else f"{pressure}_load",
+            'pressure': pressure,
+            'urgency': urgency,
+            'in_flight': in_flight,
+            'load': load,
+        }
+        if decision in (DEFER, REJECT):
+            result['retry_after_s'] = self.retry_after_s
+            logger.warning(f"Admission {decision} for ticket {ticket_id} (urgency={urgency}, pressure={pressure})")
+        return result
+
+    def complete(self, ticket_id: str, latency_s: Optional[float] = None) -> None:
+        """
+        Mark a ticket as finished and record its latency.
+
+        Args:
+            ticket_id: Ticket identifier passed to admit()
+            latency_s: Observed end-to-end (or stage) latency in seconds
+        """
+        with self._lock:
+            self._in_flight.pop(ticket_id, None)
+            if latency_s is not None:
+                self._observe(latency_s)
+
+    def observe_latency(self, latency_s: float) -> None:
+        """Feed a latency sample without completing a ticket."""
+        with self._lock:
+            self._observe(latency_s)
+
+    def _observe(self, latency_s: float) -> None:
+        if self.latency_ewma_s is None:
+            self.latency_ewma_s = float(latency_s)
+        else:
+            self.latency_ewma_s += self.ewma_alpha * (float(latency_s) - self.latency_ewma_s)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current state as metrics.
+
+        load_source is 'backlog' while the backlog probe answers, else
+        'in_flight'; max_admission_rate_per_s is the arrival rate at which
+        the in-flight count reaches the soft watermark when completions are
+        not reported.
+        """
+        now = time.monotonic()
+        self._refresh_backlog(now)
+        with self._lock:
+            self._expire(now)
+            return {
+                'pressure': self._pressure(),
+                'load': self._load(),
+                'load_source': 'backlog' if self.backlog is not None else 'in_flight',
+                'in_flight': len(self._in_flight),
+                'backlog': self.backlog,
+                'latency_ewma_s': self.latency_ewma_s,
+                'soft_watermark': self.soft_watermark,
+                'hard_watermark': self.hard_watermark,
+                'latency_slo_s': self.latency_slo_s,
+                'inflight_ttl_s': self.inflight_ttl_s,
+                'max_admission_rate_per_s': round(self.soft_watermark / self.inflight_ttl_s, 3),
+                'admitted_total': self.counts[ADMIT],
+                'downgraded_total': self.counts[DOWNGRADE],
+                'deferred_total': self.counts[DEFER],
+                'rejected_total': self.counts[REJECT],
+            }
+
+
+def estimate_urgency(payload: Dict[str, Any]) -> str:
+    """Urgency at ingestion: an explicit field if present, else keyword rules."""
+    urgency = payload.get('urgency')
+    if urgency in ('high', 'medium', 'low'):
+        return urgency
+    return classify_urgency(str(payload.get('message', '')).lower())
@@ -0,0 +1,122 @@
+"""Context packing for Ray Serve - fits retrieved passages into the LLM prompt's token budget."""
+
+import math
+import re
+from typing import Callable, Dict, Any, List, Optional, Set
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+SEPARATOR = '\n'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about 4 characters per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _truncate(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    """Longest prefix of whole sentences within budget (or of words, for a single long sentence)."""
+    kept = ''
+    for sentence in _SENTENCE_END_RE.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if count_tokens(candidate) > budget:
+            break
+        kept = candidate
+    if kept:
+        return kept
+    for word in text.split():
+        candidate = f"{kept} {word}".strip()
+        if count_tokens(candidate) > budget:
+            break
+        kept = candidate
+    return kept
+
+
+def pack_context(
+    passages: List[Dict[str, Any]],
+    budget_tokens: int,
+    dedup_threshold: float = 0.8,
+    min_tokens: int = 16,
+    count_tokens: Optional[Callable[[str], int]] = None
+) -> Dict[str, Any]:
+    """
+    Select, order and trim passages for the prompt.
+
+    Passages are taken by descending relevance_score. A passage whose word
+    3-shingles overlap an already selected one by dedup_threshold (Jaccard), or
+    that is contained in one, is dropped. The first passage that does not fit
+    is cut at a sentence boundary if at least min_tokens of budget remain;
+    packing stops there.
+
+    Args:
+        passages: Retrieved passages with 'content' and optional 'relevance_score'
+        budget_tokens: Maximum tokens of the packed text
+        dedup_threshold: Jaccard similarity at which a passage counts as a duplicate
+        min_tokens: Smallest remaining budget worth filling with a truncated passage
+        count_tokens: Token counter (default: estimate_tokens)
+
+    Returns:
+        {'text', 'passages' (selected, in prompt order), 'tokens',
+         'dropped_duplicates', 'dropped_over_budget', 'truncated'}
+    """
+    count_tokens = count_tokens or estimate_tokens
+    ranked = sorted(
+        (p for p in passages if p.get('content')),
+        key=lambda p: p.get('relevance_score', 0.0),
+        reverse=True,
+    )
+
+    selected: List[Dict[str, Any]] = []
+    seen: List[Set[str]] = []
+    parts: List[str] = []
+    used = 0
+    duplicates = over_budget = 0
+    truncated = False
+
+    for position, passage in enumerate(ranked):
+        content = ' '.join(passage['content'].split())
+        shingles = _shingles(content)
+        if any(
+            content in part or (shingles and len(shingles & other) / len(shingles | other) >= dedup_threshold)
+            for part, other in zip(parts, seen)
+        ):
+            duplicates += 1
+            continue
+
+        cost = count_tokens(content) + (count_tokens(SEPARATOR) if parts else 0)
+        if used + cost > budget_tokens:
+            remaining = budget_tokens - used - (count_tokens(SEPARATOR) if parts else 0)
+            if remaining >= min_tokens:
+                content = _truncate(content, remaining, count_tokens)
+            else:
+                content = ''
+            if content:
+                truncated = True
+                selected.append({**passage, 'content': content, 'truncated': True})
+                parts.append(content)
+                used += count_tokens(content) + (count_tokens(SEPARATOR) if len(parts) > 1 else 0)
+            over_budget = len(ranked) - position - (1 if content else 0)
+            break
+
+        selected.append(passage)
+        parts.append(content)
+        seen.append(shingles)
+        used += cost
+
+    text = SEPARATOR.join(parts)
+    return {
+        'text': text,
+        'passages': selected,
+        'tokens': count_tokens(text),
+        'dropped_duplicates': duplicates,
+        'dropped_over_budget': over_budget,
+        'truncated': truncated,
+    }
@@ -1,14 +1,40 @@
 """Intent classification handler for Ray Serve."""
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+URGENT_KEYWORDS = ['urgent', 'asap', 'immediately', 'critical', 'emergency']
+MEDIUM_URGENCY_KEYWORDS = ['soon', 'quickly', 'fast']
+
+
+def classify_urgency(message: str) -> str:
+    """
+    Classify urgency level from keywords.
+    
+    Cheap enough to run at ingestion, before full classification.
+    
+    Args:
+        message: Lower-cased customer message
+    
+    Returns:
+        'high', 'medium' or 'low'
+    """
+    if any(word in message for word in URGENT_KEYWORDS):
+        return 'high'
+    elif any(word in message for word in MEDIUM_URGENCY_KEYWORDS):
+        return 'medium'
+    else:
+        return 'low'
+
 
 class IntentClassifier:
     """Classifies customer support ticket intent and urgency."""
     
+    INPUT_FIELDS = ('ticket_id', 'message')
+    OUTPUT_FIELDS = ('intent', 'urgency', 'classification_confidence')
+    
     def __init__(self):
         """Initialize the intent classifier."""
         logger.info("IntentClassifier initialized")
@@ -38,6 +64,18 @@ class IntentClassifier:
         
         return ticket_data
     
+    def classify_batch(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Classify several tickets (batched deployment path).
+        
+        Args:
+            tickets: Ticket data dictionaries
+        
+        Returns:
+            The tickets, in order, enriched with intent and urgency
+        """
+        return [self.classify(ticket_data) for ticket_data in tickets]
+    
     def _classify_intent(self, message: str) -> str:
         """Classify intent using simple keyword matching."""
         if any(word in message for word in ['refund', 'return', 'money back']):
@@ -53,11 +91,5 @@ class IntentClassifier:
     
     def _classify_urgency(self, message: str) -> str:
         """Classify urgency level."""
-        urgent_keywords = ['urgent', 'asap', 'immediately', 'critical', 'emergency']
-        if any(word in message for word in urgent_keywords):
-            return 'high'
-        elif any(word in message for word in ['soon', 'quickly', 'fast']):
-            return 'medium'
-        else:
-            return 'low'
+        return classify_urgency(message)
 
@@ -1,18 +1,113 @@
 """Knowledge base retrieval handler for Ray Serve."""
 
 import logging
-from typing import Dict, Any, List
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+from .kb_index import fuse
+from .kb_watcher import KnowledgeBaseWatcher
+from .retrieval_cache import RetrievalCache
 
 logger = logging.getLogger(__name__)
 
+MOCK_CONTEXT = {
+    'refund': [
+        {
+            'content': 'Refunds are processed within 5-7 business days. Contact support with order ID.',
+            'source': 'refund_policy.md',
+            'relevance_score': 0.9
+        }
+    ],
+    'technical_issue': [
+        {
+            'content': 'For technical issues, try clearing cache and cookies. If problem persists, contact support.',
+            'source': 'troubleshooting.md',
+            'relevance_score': 0.85
+        }
+    ],
+    'cancellation': [
+        {
+            'content': 'You can cancel your subscription from account settings. Cancellations take effect at end of billing period.',
+            'source': 'cancellation_policy.md',
+            'relevance_score': 0.9
+        }
+    ],
+    'question': [
+        {
+            'content': 'For general questions, check our FAQ section or contact support.',
+            'source': 'faq.md',
+            'relevance_score': 0.7
+        }
+    ]
+}
+
+MOCK_FALLBACK_CONTEXT = [
+    {
+        'content': 'For assistance, please contact our support team.',
+        'source': 'general_support.md',
+        'relevance_score': 0.5
+    }
+]
+
 
 class KnowledgeRetriever:
     """Retrieves relevant information from knowledge base."""
     
-    def __init__(self):
-        """Initialize the knowledge retriever."""
-        self._mock_kb = self._init_mock_kb()
-        logger.info("KnowledgeRetriever initialized")
+    INPUT_FIELDS = ('ticket_id', 'message', 'intent')
+    OUTPUT_FIELDS = ('knowledge_context', 'context_sources')
+    
+    def __init__(
+        self,
+        knowledge_base_path: str = None,
+        index_path: str = None,
+        top_k: int = 3,
+        retrieval_mode: str = None,
+        hybrid_alpha: float = None,
+        reload_interval_s: float = None,
+        cache_size: int = None,
+        cache_ttl_s: float = None
+    ):
+        """
+        Initialize the knowledge retriever.
+        
+        Args:
+            knowledge_base_path: Directory of markdown KB files (default: KNOWLEDGE_BASE_PATH);
+                without one, canned per-intent snippets are returned
+            index_path: Where the indexes are persisted (default: KB_INDEX_PATH, else a
+                per-process directory under the system temp dir)
+            top_k: Number of passages to retrieve
+            retrieval_mode: 'lexical' (BM25), 'dense' (vector index) or 'hybrid'
+                (fused scores); default RETRIEVAL_MODE or 'lexical'
+            hybrid_alpha: Weight of the dense score in hybrid mode (default HYBRID_ALPHA or 0.5)
+            reload_interval_s: Seconds between KB change scans (default KB_RELOAD_INTERVAL_S
+                or 5); 0 disables hot reload
+            cache_size: Cached (intent, query) results (default RETRIEVAL_CACHE_SIZE
+                or 10000); 0 disables the cache
+            cache_ttl_s: Seconds a cached result is served (default RETRIEVAL_CACHE_TTL_S or 300)
+        """
+        self.knowledge_base_path = knowledge_base_path or os.getenv('KNOWLEDGE_BASE_PATH')
+        self.top_k = int(top_k)
+        self.retrieval_mode = retrieval_mode or os.getenv('RETRIEVAL_MODE', 'lexical')
+        if self.retrieval_mode not in ('lexical', 'dense', 'hybrid'):
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode}")
+        self.hybrid_alpha = float(hybrid_alpha if hybrid_alpha is not None else os.getenv('HYBRID_ALPHA', '0.5'))
+        if reload_interval_s is None:
+            reload_interval_s = float(os.getenv('KB_RELOAD_INTERVAL_S', '5'))
+        self.watcher = None
+        if self.knowledge_base_path:
+            self.watcher = KnowledgeBaseWatcher(
+                self.knowledge_base_path,
+                index_dir=index_path or os.getenv('KB_INDEX_PATH'),
+                lexical=self.retrieval_mode != 'dense',
+                dense=self.retrieval_mode != 'lexical',
+                poll_interval_s=reload_interval_s,
+            )
+        if cache_size is None:
+            cache_size = int(os.getenv('RETRIEVAL_CACHE_SIZE', '10000'))
+        if cache_ttl_s is None:
+            cache_ttl_s = float(os.getenv('RETRIEVAL_CACHE_TTL_S', '300'))
+        self.cache = RetrievalCache(cache_size, cache_ttl_s) if self.watcher is not None and cache_size > 0 else None
+        logger.info(f"KnowledgeRetriever initialized (kb_path={self.knowledge_base_path}, mode={self.retrieval_mode})")
     
     def retrieve(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -24,66 +119,67 @@ class KnowledgeRetriever:
         Returns:
             Ticket data enriched with knowledge base context
         """
-        intent = ticket_data.get('intent', 'general')
-        message = ticket_data.get('message', '')
-        ticket_id = ticket_data.get('ticket_id')
+        return self.retrieve_batch([ticket_data])[0]
+    
+    def retrieve_batch(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Retrieve knowledge for several tickets against one index snapshot.
         
-        logger.info(f"Retrieving knowledge for ticket: {ticket_id}, intent: {intent}")
+        Args:
+            tickets: Ticket data with intent classification
         
-        relevant_context = self._retrieve_context(message, intent)
+        Returns:
+            The tickets, in order, enriched with knowledge base context
+        """
+        queries = []
+        for ticket_data in tickets:
+            intent = ticket_data.get('intent', 'general')
+            logger.info(f"Retrieving knowledge for ticket: {ticket_data.get('ticket_id')}, intent: {intent}")
+            queries.append((ticket_data.get('message', ''), intent))
         
-        ticket_data['knowledge_context'] = relevant_context
-        ticket_data['context_sources'] = [ctx.get('source') for ctx in relevant_context]
+        for ticket_data, relevant_context in zip(tickets, self._retrieve_contexts(queries)):
+            ticket_data['knowledge_context'] = relevant_context
+            ticket_data['context_sources'] = [ctx.get('source') for ctx in relevant_context]
         
-        return ticket_data
+        return tickets
     
-    def _retrieve_context(self, message: str, intent: str) -> List[Dict[str, Any]]:
-        """Retrieve relevant context from knowledge base."""
-        context_map = {
-            'refund': [
-                {
-                    'content': 'Refunds are processed within 5-7 business days. Contact support with order ID.',
-                    'source': 'refund_policy.md',
-                    'relevance_score': 0.9
-                }
-            ],
-            'technical_issue': [
-                {
-                    'content': 'For technical issues, try clearing cache and cookies. If problem persists, contact support.',
-                    'source': 'troubleshooting.md',
-                    'relevance_score': 0.85
-                }
-            ],
-            'cancellation': [
-                {
-                    'content': 'You can cancel your subscription from account settings. Cancellations take effect at end of billing period.',
-                    'source': 'cancellation_policy.md',
-                    'relevance_score': 0.9
-                }
-            ],
-            'question': [
-                {
-                    'content': 'For general questions, check our FAQ section or contact support.',
-                    'source': 'faq.md',
-                    'relevance_score': 0.7
-                }
-            ]
-        }
+    def _retrieve_contexts(self, queries: List[Tuple[str, str]]) -> List[List[Dict[str, Any]]]:
+        """Retrieve relevant context for (message, intent) queries; dense lookups run as one batch."""
+        if self.watcher is None:
+            # No knowledge base configured: canned snippet per intent
+            return [[dict(ctx) for ctx in MOCK_CONTEXT.get(intent, MOCK_FALLBACK_CONTEXT)] for _, intent in queries]
+        
+        # One snapshot per batch: a concurrent reload cannot mix index versions
+        snapshot = self.watcher.current
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        if self.cache is not None:
+            results = [self.cache.get(intent, message, snapshot.version) for message, intent in queries]
+        misses = [i for i, cached in enumerate(results) if cached is None]
+        if not misses:
+            return results
         
-        return context_map.get(intent, [
-            {
-                'content': 'For assistance, please contact our support team.',
-                'source': 'general_support.md',
-                'relevance_score': 0.5
-            }
-        ])
+        dense = []
+        if snapshot.dense is not None:
+            dense = snapshot.dense.search_batch(
+                [f"{queries[i][0]} {queries[i][1].replace('_', ' ')}" for i in misses], top_k=self.top_k
+            )
+        for n, i in enumerate(misses):
+            message, intent = queries[i]
+            query_terms = [intent.replace('_', ' ')]
+            if snapshot.dense is None:
+                found = snapshot.lexical.search(message, top_k=self.top_k, extra_terms=query_terms)
+            else:
+                found = dense[n]
+                if snapshot.lexical is not None:
+                    lexical = snapshot.lexical.search(message, top_k=self.top_k, extra_terms=query_terms)
+                    found = fuse(lexical, found, alpha=self.hybrid_alpha, top_k=self.top_k)
+            for passage in found:
+                passage['index_version'] = snapshot.version
+            if self.cache is not None:
+                self.cache.put(intent, message, found, snapshot.version)
+            results[i] = found
+        return results
     
-    def _init_mock_kb(self) -> Dict[str, Any]:
-        """Initialize mock knowledge base."""
-        return {
-            'refund_policy.md': 'Refund policy content...',
-            'troubleshooting.md': 'Troubleshooting guide...',
-            'cancellation_policy.md': 'Cancellation policy...',
-            'faq.md': 'Frequently asked questions...',
-        }
-
+    def cache_metrics(self) -> Dict[str, Any]:
+        """Retrieval cache size, evictions and per-intent hit rates (empty when disabled)."""
+        return self.cache.metrics() if self.cache is not None else {}
@@ -0,0 +1,291 @@
+"""Semantic response cache for Ray Serve - reuses generated responses for near-duplicate tickets."""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from .kb_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_BITS = 64
+
+# Per-ticket values that vary between otherwise identical tickets
+FIELD_PATTERNS = [
+    ('email', re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')),
+    ('amount', re.compile(r'[$€£]\s?\d+(?:[.,]\d+)?')),
+    ('ref', re.compile(r'#?\b(?:[A-Za-z]+-)?\d{3,}\b')),
+]
+_PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+# Shorter values (a customer id of "5") also occur as ordinary text ("5-7 days")
+MIN_TEMPLATE_CHARS = 3
+MIN_TEMPLATE_DIGITS = 4
+
+_SHARED_CACHES: Dict[Tuple, 'SemanticResponseCache'] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def ticket_fields(payload: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Per-ticket values a response may quote: the message, ids and the
+    emails, amounts and reference numbers found in the message (numbered
+    in order of appearance, e.g. ref_0, ref_1).
+    """
+    message = str(payload.get('message', ''))
+    fields = {'message': message}
+    for name in ('ticket_id', 'customer_id', 'customer_name'):
+        if payload.get(name):
+            fields[name] = str(payload[name])
+    masked = message
+    for kind, pattern in FIELD_PATTERNS:
+        for i, value in enumerate(pattern.findall(masked)):
+            fields[f"{kind}_{i}"] = value
+        masked = pattern.sub(' ', masked)
+    return fields
+
+
+def masked_terms(message: str) -> List[str]:
+    """Content terms with per-ticket values replaced by their kind (refund order 123 == refund order 456)."""
+    for kind, pattern in FIELD_PATTERNS:
+        message = pattern.sub(f" {kind}placeholder ", message)
+    return tokenize(message)
+
+
+def simhash(terms: List[str]) -> int:
+    """64-bit SimHash of unigram and bigram features (bigrams weighted half)."""
+    features = [(term, 1.0) for term in terms] + [(f"{a} {b}", 0.5) for a, b in zip(terms, terms[1:])]
+    weights = [0.0] * SIGNATURE_BITS
+    for feature, weight in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+        for bit in range(SIGNATURE_BITS):
+            weights[bit] += weight if (h >> bit) & 1 else -weight
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def templatable(value: str) -> bool:
+    """Whether a per-ticket value is distinctive enough to be recognised in a response."""
+    value = value.strip()
+    if value.isdigit():
+        return len(value) >= MIN_TEMPLATE_DIGITS
+    return len(value) >= MIN_TEMPLATE_CHARS
+
+
+def to_template(response: str, fields: Dict[str, str]) -> str:
+    """
+    Replace per-ticket values in a response with {{field}} placeholders.
+
+    Only whole tokens are replaced (a value is never matched inside a longer
+    word or number), longest values first, and values too short to be
+    unambiguous are left as they are.
+    """
+    template = response.replace('{{', '{ {')
+    names = {}
+    for name, value in sorted(fields.items(), key=lambda item: len(item[1]), reverse=True):
+        if templatable(value):
+            names.setdefault(value, name)
+    if not names:
+        return template
+    pattern = re.compile(
+        r'(?<![A-Za-z0-9])(?:' + '|'.join(re.escape(value) for value in names) + r')(?![A-Za-z0-9])'
+    )
+    return pattern.sub(lambda m: f"{{{{{names[m.group(0)]}}}}}", template)
+
+
+def fill_template(template: str, fields: Dict[str, str]) -> Optional[str]:
+    """Fill placeholders from another ticket's fields; None if one of them is missing."""
+    needed = set(_PLACEHOLDER_RE.findall(template))
+    if not needed.issubset(fields):
+        return None
+    return _PLACEHOLDER_RE.sub(lambda m: fields[m.group(1)], template)
+
+
+class SemanticResponseCache:
+    """
+    Near-duplicate lookup of generated responses.
+
+    Each entry is a response template (per-ticket values turned into
+    placeholders) with the SimHash of its masked message. Entries are scoped
+    by intent and by a digest of the knowledge context the response was
+    generated from, so a reused answer never rests on different passages.
+    Lookups use banded LSH: the signature is cut into `bands` bands, and only
+    entries that match a new signature exactly on at least one band are
+    compared. With 8 bands of 8 bits, every entry within 7 differing bits
+    (similarity >= 0.89) is guaranteed to be found.
+
+    Only responses that passed validation are stored (see promote), so a
+    rejected draft is never handed to the next near-duplicate ticket.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.9,
+        max_entries: int = 5000,
+        ttl_s: float = 3600.0,
+        bands: int = 8
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            similarity_threshold: Minimum signature similarity (1 - hamming / 64) to reuse
+            max_entries: Templates kept before the least recently used is evicted
+            ttl_s: Seconds a template may be reused
+            bands: LSH bands the 64-bit signature is split into
+        """
+        if SIGNATURE_BITS % bands:
+            raise ValueError(f"bands must divide {SIGNATURE_BITS}")
+        self.similarity_threshold = float(similarity_threshold)
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self.bands = int(bands)
+        self._band_bits = SIGNATURE_BITS // self.bands
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, int], List[int]] = {}
+        self._next_id = 0
+        self.stats = {'lookups': 0, 'hits': 0, 'stores': 0, 'evictions': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['SemanticResponseCache']:
+        """
+        Build a cache from RESPONSE_CACHE_* environment variables (None when
+        RESPONSE_CACHE_SIZE is 0).
+
+        Caches are shared per configuration, so the generator that looks
+        responses up and the validator that promotes them use one cache when
+        they run in the same process.
+        """
+        max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', '5000'))
+        if max_entries <= 0:
+            return None
+        config = {
+            'similarity_threshold': float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.9')),
+            'max_entries': max_entries,
+            'ttl_s': float(os.getenv('RESPONSE_CACHE_TTL_S', '3600')),
+        }
+        key = tuple(sorted(config.items()))
+        with _SHARED_LOCK:
+            cache = _SHARED_CACHES.get(key)
+            if cache is None:
+                cache = _SHARED_CACHES[key] = cls(**config)
+            return cache
+
+    @staticmethod
+    def scope(intent: str, context_text: str) -> str:
+        """Cache scope of a response: its intent and a digest of its knowledge context."""
+        return f"{intent}:{hashlib.blake2b(context_text.encode('utf-8'), digest_size=8).hexdigest()}"
+
+    def _band_keys(self, scope: str, signature: int) -> List[Tuple[str, int, int]]:
+        mask = (1 << self._band_bits) - 1
+        return [(scope, band, (signature >> (band * self._band_bits)) & mask) for band in range(self.bands)]
+
+    def lookup(self, payload: Dict[str, Any], intent: str, context_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a reusable response for a ticket.
+
+        Returns:
+            {'response', 'provenance'} with the response re-templated for this
+            ticket, or None
+        """
+        fields = ticket_fields(payload)
+        signature = simhash(masked_terms(fields['message']))
+        scope = self.scope(intent, context_text)
+        now = time.monotonic()
+        with self._lock:
+            self.stats['lookups'] += 1
+            best: Optional[Tuple[float, int]] = None
+            for key in self._band_keys(scope, signature):
+                for entry_id in self._buckets.get(key, ()):
+                    entry = self._entries.get(entry_id)
+                    if entry is None or now - entry['stored_at'] > self.ttl_s:
+                        continue
+                    similarity = 1 - bin(signature ^ entry['signature']).count('1') / SIGNATURE_BITS
+                    if similarity >= self.similarity_threshold and (best is None or similarity > best[0]):
+                        best = (similarity, entry_id)
+            if best is None:
+                return None
+            entry = self._entries[best[1]]
+            response = fill_template(entry['template'], fields)
+            if response is None:
+                return None
+            entry['reuse_count'] += 1
+            self._entries.move_to_end(best[1])
+            self.stats['hits'] += 1
+            provenance = {
+                'source': 'semantic_cache',
+                'source_ticket_id': entry['ticket_id'],
+                'similarity': round(best[0], 4),
+                'generated_at': entry['generated_at'],
+                'reuse_count': entry['reuse_count'],
+            }
+        return {'response': response, 'provenance': provenance}
+
+    def promote(self, payload: Dict[str, Any]) -> bool:
+        """
+        Store a ticket's response once it has passed validation.
+
+        Only fresh responses are stored: the generator marks them with
+        `response_cache_scope`, and cache hits are already in the cache.
+
+        Returns:
+            Whether the response was stored
+        """
+        scope = payload.get('response_cache_scope')
+        if (
+            scope is None
+            or not payload.get('validation_passed')
+            or payload.get('response_provenance', {}).get('source') != 'llm'
+            or not payload.get('generated_response')
+        ):
+            return False
+        self._insert(payload, scope, payload['generated_response'])
+        return True
+
+    def store(self, payload: Dict[str, Any], intent: str, context_text: str, response: str) -> None:
+        """Remember a response as a template (callers must only store validated responses)."""
+        self._insert(payload, self.scope(intent, context_text), response)
+
+    def _insert(self, payload: Dict[str, Any], scope: str, response: str) -> None:
+        fields = ticket_fields(payload)
+        entry = {
+            'signature': simhash(masked_terms(fields['message'])),
+            'template': to_template(response, fields),
+            'ticket_id': payload.get('ticket_id'),
+            'generated_at': datetime.utcnow().isoformat(),
+            'stored_at': time.monotonic(),
+            'reuse_count': 0,
+        }
+        keys = self._band_keys(scope, entry['signature'])
+        entry['band_keys'] = keys
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for key in keys:
+                self._buckets.setdefault(key, []).append(entry_id)
+            self.stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+                for key in old['band_keys']:
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.remove(old_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['lookups']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            }
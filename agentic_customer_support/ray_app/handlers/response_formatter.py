@@ -0,0 +1,49 @@
+"""Response formatting handler for Ray Serve."""
+
+import logging
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseFormatter:
+    """Formats and finalizes the customer-facing response."""
+    
+    INPUT_FIELDS = (
+        'ticket_id', 'customer_id', 'validation_status', 'intent', 'urgency', 'generated_response', 'judge_score',
+        'context_sources', 'escalate'
+    )
+    OUTPUT_FIELDS = ('formatted_response', 'status')
+    
+    def format(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format and finalize the response.
+        
+        Args:
+            ticket_data: Ticket data with generated (and usually validated) response
+        
+        Returns:
+            Ticket data with formatted final response and status
+        """
+        if ticket_data.get('validation_status') != 'valid':
+            return ticket_data
+        
+        ticket_id = ticket_data.get('ticket_id')
+        logger.info(f"Formatting response for ticket: {ticket_id}")
+        
+        ticket_data['formatted_response'] = {
+            'ticket_id': ticket_id,
+            'customer_id': ticket_data.get('customer_id'),
+            'response_text': ticket_data.get('generated_response'),
+            'intent': ticket_data.get('intent'),
+            'urgency': ticket_data.get('urgency'),
+            'quality_score': ticket_data.get('judge_score'),
+            'formatted_at': __import__('datetime').datetime.utcnow().isoformat(),
+            'sources': ticket_data.get('context_sources', [])
+        }
+        ticket_data['status'] = 'escalated' if ticket_data.get('escalate') else 'completed'
+        return ticket_data
+    
+    def format_batch(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Format several tickets (batched deployment path)."""
+        return [self.format(ticket_data) for ticket_data in tickets]
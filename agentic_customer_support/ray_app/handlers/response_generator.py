@@ -1,7 +1,14 @@
 """Response generation handler for Ray Serve."""
 
 import logging
-from typing import Dict, Any
+import os
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from . import refinement
+from .context_packer import pack_context
+from .llm_client import LLMClient
+from .response_cache import SemanticResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -9,8 +16,38 @@ logger = logging.getLogger(__name__)
 class ResponseGenerator:
     """Generates customer support responses using LLM."""
     
-    def __init__(self):
-        """Initialize the response generator."""
+    INPUT_FIELDS = (
+        'ticket_id', 'customer_id', 'customer_name', 'message', 'intent', 'knowledge_context', 'refinement_feedback'
+    )
+    OUTPUT_FIELDS = (
+        'generated_response', 'response_generated_at', 'response_provenance', 'response_cache_scope', 'llm_usage',
+        'context_tokens', 'context_packing'
+    )
+    # What remember_response needs to cache a validated response
+    REMEMBER_FIELDS = (
+        'ticket_id', 'customer_id', 'customer_name', 'message', 'generated_response', 'response_provenance',
+        'response_cache_scope', 'validation_passed'
+    )
+    
+    def __init__(
+        self,
+        response_cache: SemanticResponseCache = None,
+        context_token_budget: int = None,
+        llm_client: LLMClient = None
+    ):
+        """
+        Initialize the response generator.
+        
+        Args:
+            response_cache: Near-duplicate response cache (default: from RESPONSE_CACHE_* env)
+            context_token_budget: Prompt tokens for knowledge context (default CONTEXT_TOKEN_BUDGET or 1024)
+            llm_client: Model server client (default: shared client from LLM_* env);
+                without one, template responses are used
+        """
+        self.response_cache = response_cache if response_cache is not None else SemanticResponseCache.from_env()
+        self.context_token_budget = int(context_token_budget or os.getenv('CONTEXT_TOKEN_BUDGET', '1024'))
+        self.llm_client = llm_client if llm_client is not None else LLMClient.from_env('LLM')
+        self.max_response_tokens = int(os.getenv('LLM_MAX_RESPONSE_TOKENS', '512'))
         logger.info("ResponseGenerator initialized")
     
     def generate(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -23,20 +60,196 @@ class ResponseGenerator:
         Returns:
             Ticket data enriched with generated response
         """
-        message = ticket_data.get('message', '')
+        return self.generate_batch([ticket_data])[0]
+    
+    def generate_batch(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Generate responses for several tickets; the ones not served from the
+        response cache go to the model server as one batched request.
+        
+        Args:
+            tickets: Ticket data with knowledge context
+        
+        Returns:
+            The tickets, in order, enriched with generated responses
+        """
+        pending = []
+        for ticket_data in tickets:
+            context_text, feedback, cached = self._prepare(ticket_data)
+            if cached is None:
+                pending.append((ticket_data, context_text, feedback))
+        
+        if pending and self.llm_client is not None:
+            prompts = [
+                self._build_prompt(t.get('message', ''), t.get('intent', 'general'), context_text, feedback)
+                for t, context_text, feedback in pending
+            ]
+            if len(prompts) == 1:
+                completion = self.llm_client.complete(prompts[0], max_tokens=self.max_response_tokens)
+                texts = [completion['text']]
+            else:
+                completion = self.llm_client.complete_batch(prompts, max_tokens=self.max_response_tokens)
+                texts = completion['texts']
+            usage = {key: completion[key] for key in ('prompt_tokens', 'completion_tokens', 'latency_s', 'attempts', 'hedged')}
+            # Token counts cover the whole request
+            usage['batch_size'] = len(prompts)
+            responses = [text.strip() for text in texts]
+        else:
+            usage = None
+            responses = [
+                self._template_response(ticket_data, context_text, feedback)
+                for ticket_data, context_text, feedback in pending
+            ]
+        
+        for (ticket_data, context_text, _), response in zip(pending, responses):
+            self._finish(ticket_data, context_text, response, usage)
+        
+        return tickets
+    
+    def generate_stream(self, ticket_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Generate one ticket's response, yielding text as the model produces it.
+        
+        Cache hits and template responses are yielded in one piece. Once the
+        iterator is exhausted, ticket_data holds the same fields generate() sets.
+        
+        Args:
+            ticket_data: Ticket data with knowledge context
+        
+        Yields:
+            Pieces of the response text, in order
+        """
+        context_text, feedback, cached = self._prepare(ticket_data)
+        if cached is not None:
+            yield cached['response']
+            return
+        
+        if self.llm_client is None:
+            response = self._template_response(ticket_data, context_text, feedback)
+            yield response
+            self._finish(ticket_data, context_text, response, None)
+            return
+        
+        prompt = self._build_prompt(
+            ticket_data.get('message', ''), ticket_data.get('intent', 'general'), context_text, feedback
+        )
+        started = time.monotonic()
+        first_text_s = None
+        parts = []
+        for text in self.llm_client.stream(prompt, max_tokens=self.max_response_tokens):
+            # Leading whitespace is dropped, as in the non-streamed response
+            text = text if parts else text.lstrip()
+            if not text:
+                continue
+            if first_text_s is None:
+                first_text_s = round(time.monotonic() - started, 4)
+            parts.append(text)
+            yield text
+        usage = {
+            'latency_s': round(time.monotonic() - started, 4),
+            'first_text_s': first_text_s,
+            'streamed': True,
+            'batch_size': 1,
+        }
+        self._finish(ticket_data, context_text, ''.join(parts).strip(), usage)
+    
+    def remember_response(self, ticket_data: Dict[str, Any]) -> bool:
+        """
+        Cache a response that passed validation for near-duplicate tickets.
+        
+        Args:
+            ticket_data: The ticket's REMEMBER_FIELDS after validation
+        
+        Returns:
+            Whether the response was cached
+        """
+        return bool(self.response_cache) and self.response_cache.promote(ticket_data)
+    
+    def _prepare(self, ticket_data: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Pack the ticket's context and look it up in the response cache.
+        
+        Returns:
+            (context_text, refinement feedback, cache hit); on a hit the
+            ticket's response is already set
+        """
         intent = ticket_data.get('intent', 'general')
-        knowledge_context = ticket_data.get('knowledge_context', [])
         ticket_id = ticket_data.get('ticket_id')
         
         logger.info(f"Generating response for ticket: {ticket_id}")
         
-        context_text = '\n'.join([ctx.get('content', '') for ctx in knowledge_context])
-        response = self._generate_response(message, intent, context_text)
-        
+        packed = pack_context(ticket_data.get('knowledge_context', []), self.context_token_budget)
+        context_text = packed['text']
+        ticket_data['context_tokens'] = packed['tokens']
+        ticket_data['context_packing'] = {
+            'passages_used': len(packed['passages']),
+            'dropped_duplicates': packed['dropped_duplicates'],
+            'dropped_over_budget': packed['dropped_over_budget'],
+            'truncated': packed['truncated'],
+        }
+        # A refinement attempt must not get the rejected answer back from the cache
+        feedback = ticket_data.get('refinement_feedback')
+        cached = (
+            self.response_cache.lookup(ticket_data, intent, context_text)
+            if self.response_cache and feedback is None else None
+        )
+        if cached is not None:
+            ticket_data['response_provenance'] = cached['provenance']
+            logger.info(f"Reused cached response of ticket {cached['provenance']['source_ticket_id']} for ticket {ticket_id}")
+            self._set_response(ticket_data, cached['response'])
+        return context_text, feedback, cached
+    
+    def _finish(
+        self,
+        ticket_data: Dict[str, Any],
+        context_text: str,
+        response: str,
+        usage: Optional[Dict[str, Any]]
+    ) -> None:
+        """Set a freshly generated response and its provenance."""
+        if usage is not None:
+            ticket_data['llm_usage'] = dict(usage)
+        ticket_data['response_provenance'] = {'source': 'llm'}
+        # Cached once the response passes validation (see remember_response)
+        if self.response_cache:
+            ticket_data['response_cache_scope'] = self.response_cache.scope(
+                ticket_data.get('intent', 'general'), context_text
+            )
+        self._set_response(ticket_data, response)
+    
+    def _template_response(
+        self,
+        ticket_data: Dict[str, Any],
+        context_text: str,
+        feedback: Optional[Dict[str, Any]]
+    ) -> str:
+        """Template response when no model server is configured."""
+        response = self._generate_response(ticket_data.get('message', ''), ticket_data.get('intent', 'general'), context_text)
+        return self._revise_response(response, feedback) if feedback is not None else response
+    
+    @staticmethod
+    def _set_response(ticket_data: Dict[str, Any], response: str) -> None:
         ticket_data['generated_response'] = response
         ticket_data['response_generated_at'] = __import__('datetime').datetime.utcnow().isoformat()
-        
-        return ticket_data
+    
+    def _build_prompt(self, message: str, intent: str, context: str, feedback: Dict[str, Any] = None) -> str:
+        """Prompt for the model server."""
+        return (
+            "You are a customer support agent. Answer the customer using only the knowledge below.\n\n"
+            f"Knowledge:\n{context or '(none)'}\n\n"
+            f"Ticket intent: {intent}\n"
+            f"Customer message: {message}\n\n"
+            f"{refinement.feedback_prompt(feedback) if feedback else ''}"
+            "Response:"
+        )
+    
+    def _revise_response(self, response: str, feedback: Dict[str, Any]) -> str:
+        """Address the validator's feedback on a template response (no model to re-prompt)."""
+        if not any(phrase in response.lower() for phrase in refinement.GOOD_PHRASES):
+            response = f"Thank you for contacting us. {response}"
+        if len(response) < 100:
+            response += " If anything is still unclear, reply to this message and we will help you further."
+        return response
     
     def _generate_response(self, message: str, intent: str, context: str) -> str:
         """Generate response using LLM (mock implementation)."""
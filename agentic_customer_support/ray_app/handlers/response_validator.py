@@ -1,23 +1,64 @@
-"""Response validation handler for Ray Serve."""
+"""Response validation handler for Ray Serve - cascaded heuristic and LLM judge."""
 
 import logging
-from typing import Dict, Any
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from . import refinement
+from .llm_client import LLMClient, LLMError
 
 logger = logging.getLogger(__name__)
 
+_SCORE_RE = re.compile(r'\d+(?:\.\d+)?')
+
+JUDGE_PROMPT = (
+    "Rate how well the support response answers the customer, from 0 (useless) to 1 (perfect). "
+    "Reply with the number only.\n\n"
+    "Customer message: {message}\n"
+    "Support response: {response}\n\n"
+    "Score:"
+)
+
 
 class ResponseValidator:
-    """Validates generated responses using LLM judge."""
+    """
+    Validates generated responses with a two-tier judge.
+    
+    The heuristic settles clear passes and clear fails; scores inside the
+    uncertainty band go to the LLM judge, one request per batch of tickets.
+    """
+    
+    INPUT_FIELDS = ('ticket_id', 'message', 'generated_response')
+    OUTPUT_FIELDS = ('judge_score', 'judge_tier', 'validation_passed', 'needs_refinement', 'refinement_feedback')
     
-    def __init__(self, threshold: float = 0.7):
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        judge_client: LLMClient = None,
+        uncertainty_band: Tuple[float, float] = None
+    ):
         """
         Initialize the response validator.
         
         Args:
             threshold: Minimum quality score threshold (0-1)
+            judge_client: Judge model client (default: shared client from JUDGE_* env);
+                without one, the heuristic decides every ticket
+            uncertainty_band: Heuristic scores (low, high), inclusive, that escalate to the
+                LLM judge (default JUDGE_UNCERTAINTY_LOW/HIGH or 0.55/0.8)
         """
         self.threshold = float(threshold)
-        logger.info(f"ResponseValidator initialized (threshold={threshold})")
+        self.judge_client = judge_client if judge_client is not None else LLMClient.from_env('JUDGE')
+        self.uncertainty_band = uncertainty_band or (
+            float(os.getenv('JUDGE_UNCERTAINTY_LOW', '0.55')),
+            float(os.getenv('JUDGE_UNCERTAINTY_HIGH', '0.8')),
+        )
+        # Counters are shared by the handler threads of a Serve replica
+        self._lock = threading.Lock()
+        self.stats = {'judged': 0, 'escalated': 0, 'judge_batches': 0, 'judge_failures': 0}
+        logger.info(f"ResponseValidator initialized (threshold={threshold}, uncertainty_band={self.uncertainty_band})")
     
     def validate(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -29,27 +70,103 @@ class ResponseValidator:
         Returns:
             Ticket data enriched with validation results
         """
-        ticket_id = ticket_data.get('ticket_id')
-        generated_response = ticket_data.get('generated_response', '')
-        original_message = ticket_data.get('message', '')
+        return self.validate_batch([ticket_data])[0]
+    
+    def validate_batch(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate several tickets, sending all their escalations to the judge at once.
         
-        logger.info(f"Validating response for ticket: {ticket_id}")
+        Args:
+            tickets: Ticket data with generated responses
         
-        score = self._judge_response(original_message, generated_response)
+        Returns:
+            The tickets, in order, enriched with validation results
+        """
+        low, high = self.uncertainty_band
+        escalated = []
+        for ticket_data in tickets:
+            logger.info(f"Validating response for ticket: {ticket_data.get('ticket_id')}")
+            score = self._heuristic_score(ticket_data.get('generated_response', ''))
+            ticket_data['judge_tier'] = 'heuristic'
+            self._count('judged')
+            if self.judge_client is not None and low <= score <= high:
+                self._count('escalated')
+                escalated.append(ticket_data)
+            else:
+                self._record_score(ticket_data, score)
         
+        if escalated:
+            scores = self._judge_batch([
+                (ticket_data.get('message', ''), ticket_data.get('generated_response', ''))
+                for ticket_data in escalated
+            ])
+            for ticket_data, score in zip(escalated, scores):
+                if score is None:
+                    score = self._heuristic_score(ticket_data.get('generated_response', ''))
+                else:
+                    ticket_data['judge_tier'] = 'llm'
+                self._record_score(ticket_data, score)
+        
+        return tickets
+    
+    def _record_score(self, ticket_data: Dict[str, Any], score: float) -> None:
+        ticket_id = ticket_data.get('ticket_id')
         ticket_data['judge_score'] = score
         ticket_data['validation_passed'] = score >= self.threshold
         ticket_data['needs_refinement'] = score < self.threshold
         
         if score < self.threshold:
-            logger.warning(f"Response for ticket {ticket_id} scored {score:.2f} < {self.threshold}")
+            logger.warning(
+                f"Response for ticket {ticket_id} scored {score:.2f} < {self.threshold} ({ticket_data['judge_tier']})"
+            )
+            # Feedback for a regeneration, should the pipeline attempt one
+            ticket_data['refinement_feedback'] = refinement.build_feedback(
+                ticket_data.get('generated_response', ''), score, self.threshold, ticket_data['judge_tier']
+            )
         else:
             logger.info(f"Response for ticket {ticket_id} passed validation with score {score:.2f}")
+    
+    def _judge_batch(self, items: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """Judge scores (0-1) for (message, response) pairs in one request; None where the judge gave none."""
+        self._count('judge_batches')
+        try:
+            completion = self.judge_client.complete_batch(
+                [JUDGE_PROMPT.format(message=message, response=response) for message, response in items],
+                max_tokens=8,
+                temperature=0,
+            )
+        except LLMError as exc:
+            logger.warning(f"LLM judge failed for {len(items)} responses ({exc}); using heuristic scores")
+            self._count('judge_failures', len(items))
+            return [None] * len(items)
         
-        return ticket_data
+        scores = []
+        for text in completion['texts']:
+            match = _SCORE_RE.search(text)
+            if match is None:
+                logger.warning(f"Unparseable judge output {text!r}; using heuristic score")
+                self._count('judge_failures')
+                scores.append(None)
+            else:
+                scores.append(min(1.0, max(0.0, float(match.group()))))
+        return scores
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Tickets judged, escalations to the LLM judge and the escalation rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        judged = stats['judged']
+        return {
+            **stats,
+            'escalation_rate': round(stats['escalated'] / judged, 4) if judged else 0.0,
+        }
     
-    def _judge_response(self, original_message: str, response: str) -> float:
-        """Judge response quality (mock implementation)."""
+    def _heuristic_score(self, response: str) -> float:
+        """Rule-based quality score (0-1), the first tier of the judge."""
         if not response or len(response.strip()) < 10:
             return 0.3
         
@@ -0,0 +1,110 @@
+"""Retrieval cache for Ray Serve - LRU of top-k KB results keyed by intent and normalized query."""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Any, Hashable, List, Optional, Tuple
+
+from .kb_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def query_signature(message: str) -> str:
+    """Sorted distinct content terms: word order, case, stopwords and repeats do not matter."""
+    return ' '.join(sorted(set(tokenize(message))))
+
+
+class RetrievalCache:
+    """
+    Bounded LRU cache of retrieval results with a TTL.
+
+    Entries belong to one KB index version; the first lookup with a different
+    version drops the whole cache, so a reload never serves stale passages.
+    Hits and misses are counted per intent.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_s: float = 300.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_s: Seconds an entry stays valid
+        """
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]]' = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logger.info(f"Retrieval cache invalidated: index version {self._version} -> {version}")
+            self._entries.clear()
+            self._version = version
+
+    def get(self, intent: str, message: str, version: Hashable = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Cached results for (intent, query signature) at an index version.
+
+        Returns:
+            A copy of the cached passages, or None on a miss
+        """
+        key = (intent, query_signature(message))
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses[intent] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits[intent] += 1
+        # Callers enrich passages in place; hand out copies
+        return copy.deepcopy(entry[1])
+
+    def put(self, intent: str, message: str, results: List[Dict[str, Any]], version: Hashable = None) -> None:
+        key = (intent, query_signature(message))
+        entry = (time.monotonic(), copy.deepcopy(results))
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Size, evictions and hit rate overall and per intent."""
+        with self._lock:
+            intents = sorted(set(self._hits) | set(self._misses))
+            per_intent = {}
+            for intent in intents:
+                hits, misses = self._hits[intent], self._misses[intent]
+                per_intent[intent] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 4)}
+            hits, misses = sum(self._hits.values()), sum(self._misses.values())
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'index_version': self._version,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'per_intent': per_intent,
+            }
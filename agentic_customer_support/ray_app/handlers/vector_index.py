@@ -0,0 +1,465 @@
+"""Dense vector index for Ray Serve - embeddings in a memory-mapped matrix, flat or IVF (inverted file) search."""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+from array import array
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .kb_index import default_index_dir, iter_kb_files, kb_manifest, split_markdown, tokenize
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FORMAT_VERSION = 1
+
+
+class Embedder:
+    """
+    Embedding interface.
+
+    Implementations set `name` (stored in the index so vectors from different
+    embedders are never mixed) and `dim`, and return L2-normalized float32 rows.
+    """
+
+    name = 'embedder'
+    dim = 0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic feature-hashing embedder (no model, runs offline on CPU).
+
+    Word unigrams, word bigrams and character trigrams of each word are hashed
+    into `dim` signed buckets. Character trigrams give partial credit to
+    morphological variants ("refunded"/"refunding") that exact terms miss.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = int(dim)
+        self.name = f"hashing-{self.dim}"
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest % self.dim, (1.0 if digest >> 63 else -1.0)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            features = [(w, 1.0) for w in words]
+            features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+            for word in words:
+                padded = f"<{word}>"
+                features += [(f"#{padded[i:i + 3]}", 0.25) for i in range(len(padded) - 2)]
+            for feature, weight in features:
+                bucket, sign = self._bucket(feature)
+                matrix[row, bucket] += sign * weight
+        return _normalize(matrix)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest scores of each row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class VectorIndex:
+    """
+    Append-only dense index over KB passages.
+
+    Vectors live in a float32 matrix file that is memory-mapped and grown in
+    place, so adding documents appends rows instead of rebuilding. Passages of
+    a changed or removed file are tombstoned rather than rewritten; compact()
+    drops them. Below ivf_min_vectors the search is an exact blocked matrix
+    product; above it, an IVF (inverted file) partition is trained with
+    k-means and queries only scan the nprobe nearest lists.
+
+    On disk (index_dir):
+        meta.json            version, generation, count, dim, embedder, manifest,
+                             source row ranges, tombstones
+        gen-<generation>/    data files, rewritten into a new generation by compact():
+        vectors.f32          count x dim float32 rows
+        passages.jsonl       one JSON passage per row
+        passage_offsets.u64  byte offset of each passage line
+        centroids.f32        IVF centroids (once trained)
+        assignments.i32      IVF list of each row (once trained)
+    Data files are appended first and meta.json is replaced last; on open,
+    anything past the lengths recorded in meta.json (an interrupted add) is
+    truncated away.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        embedder: Optional[Embedder] = None,
+        ivf_min_vectors: int = 50_000,
+        nprobe: int = 8,
+        block_rows: int = 65_536
+    ):
+        """
+        Open (or create) a vector index.
+
+        Args:
+            index_dir: Directory holding the index files
+            embedder: Embedder for passages and queries (default HashingEmbedder)
+            ivf_min_vectors: Row count at which an IVF partition is trained
+            nprobe: IVF lists scanned per query
+            block_rows: Rows scored per matrix product in exact search
+        """
+        self.dir = Path(index_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashingEmbedder()
+        self.ivf_min_vectors = int(ivf_min_vectors)
+        self.nprobe = int(nprobe)
+        self.block_rows = int(block_rows)
+
+        meta_path = self.dir / 'meta.json'
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if meta and (meta.get('format_version') != VECTOR_FORMAT_VERSION or meta.get('embedder') != self.embedder.name):
+            logger.info(f"Vector index at {self.dir} was built with another format/embedder; starting over")
+            meta = {}
+        self.version = meta.get('version', 0)
+        self.generation = meta.get('generation', 0)
+        self._data = self.dir / f"gen-{self.generation}"
+        self._data.mkdir(exist_ok=True)
+        self.count = meta.get('count', 0)
+        self._truncate_to(self.count, meta.get('passages_bytes', 0))
+        self.manifest: Dict[str, List[int]] = meta.get('manifest', {})
+        # Passages of a file are appended together, so each source is one [start, end) row range
+        self.sources: Dict[str, List[int]] = meta.get('sources', {})
+        self.deleted: List[List[int]] = meta.get('deleted', [])
+        self._offsets = array('Q')
+        if self.count:
+            with open(self._data / 'passage_offsets.u64', 'rb') as fh:
+                self._offsets.fromfile(fh, self.count)
+
+        self._vectors = self._map_vectors()
+        self._passages = self._map_passages()
+        self._live = self._live_mask()
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        if meta.get('ivf_lists'):
+            self._centroids = np.fromfile(self._data / 'centroids.f32', dtype=np.float32).reshape(-1, self.embedder.dim)
+            self._assignments = np.fromfile(self._data / 'assignments.i32', dtype=np.int32)[: self.count]
+
+    # --- storage ---
+    def _truncate_to(self, count: int, passages_bytes: int) -> None:
+        lengths = {
+            'vectors.f32': count * self.embedder.dim * 4,
+            'passage_offsets.u64': count * 8,
+            'passages.jsonl': passages_bytes,
+            'assignments.i32': count * 4,
+        }
+        for name, length in lengths.items():
+            path = self._data / name
+            if path.exists() and path.stat().st_size > length:
+                os.truncate(path, length)
+
+    def _map_vectors(self) -> np.ndarray:
+        if self.count == 0:
+            return np.empty((0, self.embedder.dim), dtype=np.float32)
+        return np.memmap(self._data / 'vectors.f32', dtype=np.float32, mode='r', shape=(self.count, self.embedder.dim))
+
+    def _map_passages(self) -> Any:
+        path = self._data / 'passages.jsonl'
+        if self.count == 0:
+            return b''
+        with open(path, 'rb') as fh:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _passage(self, row: int) -> Dict[str, Any]:
+        start = self._offsets[row]
+        return json.loads(self._passages[start:self._passages.find(b'\n', start)])
+
+    def _save_meta(self) -> None:
+        meta = {
+            'format_version': VECTOR_FORMAT_VERSION,
+            'version': self.version,
+            'generation': self.generation,
+            'embedder': self.embedder.name,
+            'dim': self.embedder.dim,
+            'count': self.count,
+            'manifest': self.manifest,
+            'sources': self.sources,
+            'deleted': self.deleted,
+            'passages_bytes': (self._data / 'passages.jsonl').stat().st_size if self.count else 0,
+            'ivf_lists': 0 if self._centroids is None else len(self._centroids),
+        }
+        tmp = self.dir / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.dir / 'meta.json')
+
+    def _live_mask(self) -> np.ndarray:
+        live = np.ones(self.count, dtype=bool)
+        for start, end in self.deleted:
+            live[start:end] = False
+        return live
+
+    @property
+    def live_count(self) -> int:
+        return int(self._live.sum())
+
+    # --- updates ---
+    def add(self, passages: List[Dict[str, Any]], batch_size: int = 256) -> None:
+        """
+        Embed passages and append them (vectors, passage store, IVF assignment).
+
+        Passages are grouped by source document; a source that is already
+        indexed is tombstoned first, so adding a document again replaces it.
+        """
+        if not passages:
+            return
+        for source in {p['source'] for p in passages}:
+            self._tombstone(source)
+        passages = sorted(passages, key=lambda p: p['source'])
+        start = self.count
+        new_offsets = array('Q')
+        with open(self._data / 'vectors.f32', 'ab') as vec_fh, open(self._data / 'passages.jsonl', 'ab') as doc_fh:
+            for i in range(0, len(passages), batch_size):
+                batch = passages[i:i + batch_size]
+                vectors = self.embedder.embed([f"{p.get('title', '')} {p['content']}" for p in batch])
+                vec_fh.write(vectors.tobytes())
+                for passage in batch:
+                    new_offsets.append(doc_fh.tell())
+                    doc_fh.write(json.dumps(passage, ensure_ascii=False).encode('utf-8') + b'\n')
+        with open(self._data / 'passage_offsets.u64', 'ab') as fh:
+            new_offsets.tofile(fh)
+        self._offsets.extend(new_offsets)
+        for row, passage in enumerate(passages, start):
+            self.sources.setdefault(passage['source'], [row, row])[1] = row + 1
+        self.count += len(passages)
+        self._vectors = self._map_vectors()
+        self._passages = self._map_passages()
+        self._live = self._live_mask()
+
+        if self._centroids is not None:
+            assignments = self._assign(np.asarray(self._vectors[start:]))
+            with open(self._data / 'assignments.i32', 'ab') as fh:
+                fh.write(assignments.tobytes())
+            self._assignments = np.concatenate([self._assignments, assignments])
+            self._lists = None
+        elif self.live_count >= self.ivf_min_vectors:
+            self.train_ivf()
+        self._save_meta()
+
+    def remove_source(self, source: str) -> int:
+        """Tombstone every passage of a KB file; returns the number removed."""
+        removed = self._tombstone(source)
+        self._save_meta()
+        return removed
+
+    def _tombstone(self, source: str) -> int:
+        rows = self.sources.pop(source, None)
+        if rows is None:
+            return 0
+        self.deleted.append(rows)
+        self._live[rows[0]:rows[1]] = False
+        return rows[1] - rows[0]
+
+    def sync_directory(self, kb_root: str) -> Dict[str, int]:
+        """
+        Bring the index in line with a KB directory, touching only changed files.
+
+        Returns:
+            Counts of added, updated and removed files
+        """
+        root = Path(kb_root)
+        current = kb_manifest(root)
+        stats = {'added': 0, 'updated': 0, 'removed': 0}
+        for source in set(self.manifest) - set(current):
+            self._tombstone(source)
+            stats['removed'] += 1
+        new_passages: List[Dict[str, Any]] = []
+        for path in iter_kb_files(root):
+            source = path.relative_to(root).as_posix()
+            if self.manifest.get(source) == current[source]:
+                continue
+            stats['updated' if source in self.manifest else 'added'] += 1
+            self._tombstone(source)
+            new_passages.extend(split_markdown(path.read_text(encoding='utf-8'), source))
+        self.manifest = current
+        if any(stats.values()):
+            self.version += 1
+        self.add(new_passages)
+        self._save_meta()
+        if any(stats.values()):
+            logger.info(f"Vector index synced with {root}: {stats}, {self.live_count} live passages")
+        if self.count and self.live_count < self.count // 2:
+            self.compact()
+        return stats
+
+    def compact(self) -> None:
+        """
+        Rewrite the index without tombstoned rows (and retrain IVF if it was trained).
+
+        The data is written to a new generation directory and committed by
+        meta.json, so other open instances keep reading the old generation.
+        """
+        keep = np.flatnonzero(self._live)
+        passages = [self._passage(int(row)) for row in keep]
+        vectors = np.asarray(self._vectors[keep])
+        retrain = self._centroids is not None
+        old_data = self._data
+
+        self.generation += 1
+        self._data = self.dir / f"gen-{self.generation}"
+        self._data.mkdir(exist_ok=True)
+        with open(self._data / 'vectors.f32', 'wb') as fh:
+            fh.write(vectors.tobytes())
+        self._offsets = array('Q')
+        with open(self._data / 'passages.jsonl', 'wb') as fh:
+            for passage in passages:
+                self._offsets.append(fh.tell())
+                fh.write(json.dumps(passage, ensure_ascii=False).encode('utf-8') + b'\n')
+        with open(self._data / 'passage_offsets.u64', 'wb') as fh:
+            self._offsets.tofile(fh)
+        self.count = len(keep)
+        self.deleted = []
+        self.sources = {}
+        for row, passage in enumerate(passages):
+            self.sources.setdefault(passage['source'], [row, row])[1] = row + 1
+        self._vectors = self._map_vectors()
+        self._passages = self._map_passages()
+        self._live = self._live_mask()
+        self._centroids = self._assignments = self._lists = None
+        if retrain and self.count:
+            self.train_ivf()
+        self._save_meta()
+        # Open memory maps of the old generation stay valid after its files are unlinked
+        shutil.rmtree(old_data, ignore_errors=True)
+
+    # --- IVF ---
+    def train_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> None:
+        """Partition the vectors with spherical k-means (nlist defaults to ~sqrt(count))."""
+        nlist = min(nlist or max(1, int(np.sqrt(self.count))), self.count)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(self.count, size=min(sample_size, self.count), replace=False))
+        sample = np.asarray(self._vectors[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            empty = np.bincount(nearest, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self._centroids = centroids
+        self._assignments = self._assign(np.asarray(self._vectors))
+        self._lists = None
+        centroids.tofile(self._data / 'centroids.f32')
+        self._assignments.tofile(self._data / 'assignments.i32')
+        self._save_meta()
+        logger.info(f"Trained IVF partition: {nlist} lists over {self.count} vectors")
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for i in range(0, len(vectors), self.block_rows):
+            assignments[i:i + self.block_rows] = np.argmax(vectors[i:i + self.block_rows] @ self._centroids.T, axis=1)
+        return assignments
+
+    def _ivf_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows grouped by list, start offset of each list) built lazily from the assignments."""
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind='stable')
+            bounds = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    # --- querying ---
+    def search_batch(self, queries: Sequence[str], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Dense search for several queries at once.
+
+        Args:
+            queries: Query texts
+            top_k: Passages per query
+
+        Returns:
+            Per query, passages with 'dense_score' (cosine similarity) and
+            'relevance_score' (the cosine clipped to 0-1)
+        """
+        if not queries:
+            return []
+        if self.live_count == 0:
+            return [[] for _ in queries]
+        q = self.embedder.embed(list(queries))
+        if self._centroids is not None:
+            hits = [self._search_ivf(vector, top_k) for vector in q]
+        else:
+            hits = self._search_exact(q, top_k)
+        results = []
+        for row_hits in hits:
+            passages = []
+            for row, score in row_hits:
+                passage = self._passage(row)
+                passage['dense_score'] = round(float(score), 4)
+                passage['relevance_score'] = round(max(0.0, float(score)), 4)
+                passages.append(passage)
+            results.append(passages)
+        return results
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        return self.search_batch([query], top_k)[0]
+
+    def _search_exact(self, q: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        # Keep the best candidates of each block so memory stays at block_rows x queries
+        k = top_k
+        best_rows = np.empty((len(q), 0), dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        for start in range(0, self.count, self.block_rows):
+            scores = q @ np.asarray(self._vectors[start:start + self.block_rows]).T
+            scores[:, ~self._live[start:start + self.block_rows]] = -np.inf
+            top = _top_k(scores, k)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        order = _top_k(best_scores, best_rows.shape[1])
+        results = []
+        for rows, scores in zip(np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)):
+            hits = [(int(r), float(s)) for r, s in zip(rows, scores) if np.isfinite(s)]
+            results.append(hits[:top_k])
+        return results
+
+    def _search_ivf(self, vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        order, bounds = self._ivf_lists()
+        probes = _top_k((self._centroids @ vector)[None, :], self.nprobe)[0]
+        rows = np.concatenate([order[bounds[p]:bounds[p + 1]] for p in probes])
+        rows = rows[self._live[rows]]
+        if len(rows) == 0:
+            return []
+        rows.sort()
+        scores = np.asarray(self._vectors[rows]) @ vector
+        top = _top_k(scores[None, :], top_k)[0]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+def open_vector_index(kb_root: str, index_dir: Optional[str] = None, **kwargs) -> VectorIndex:
+    """
+    Open the vector index of a KB and sync it incrementally with the KB files.
+
+    Args:
+        kb_root: Directory of markdown files
+        index_dir: Where the index lives (default: vectors/ under default_index_dir(kb_root))
+    """
+    index = VectorIndex(index_dir or os.path.join(default_index_dir(kb_root), 'vectors'), **kwargs)
+    index.sync_directory(kb_root)
+    return index
@@ -0,0 +1,235 @@
+"""Pipeline orchestration - admission, stage hops, refinement and streaming (no Ray import)."""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, AsyncIterator, List, Tuple
+
+from ray_app.handlers import refinement
+from ray_app.handlers.admission import AdmissionController, estimate_urgency
+from ray_app.handlers.response_generator import ResponseGenerator
+from ray_app.serve.stages import project, sse_event, stage_fields
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineOrchestrator:
+    """
+    Drives a ticket through the stage deployments of a fusion plan.
+    
+    Stage deployments are only called through `.remote()`, so the
+    orchestration runs against Ray Serve handles in the pipeline deployment
+    and against plain stand-ins in tests.
+    """
+    
+    def __init__(self, fusion_plan: List[Tuple[str, ...]], *stage_deployments):
+        """
+        Initialize the orchestrator.
+        
+        Args:
+            fusion_plan: Stage groups, one per deployment (see parse_fusion_plan)
+            stage_deployments: Deployment handles, in fusion_plan order
+        """
+        self.fusion_plan = [tuple(stages) for stages in fusion_plan]
+        self.stage_deployments = list(stage_deployments)
+        self.input_fields = [stage_fields(stages)[0] for stages in self.fusion_plan]
+        # A refinement round re-runs generation and every deployment up to validation
+        first = next(i for i, stages in enumerate(self.fusion_plan) if 'generate' in stages)
+        last = next(i for i, stages in enumerate(self.fusion_plan) if 'validate' in stages)
+        self.refinement_stages = range(first, last + 1)
+        # Stages fused after validation (e.g. format) wait for the refinement loop to settle
+        self.validation_group_continues = self.fusion_plan[last][-1] != 'validate'
+        self.generate_deployment = self.stage_deployments[first]
+        self.admission = AdmissionController.from_env()
+        self.latency_budget_s = float(os.getenv('TICKET_DEADLINE_S', '5.0'))
+        self.max_refinements = refinement.DEFAULT_MAX_ATTEMPTS
+        self.refinement_min_budget_s = refinement.DEFAULT_MIN_BUDGET_S
+    
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Process a ticket as server-sent events.
+        
+        Events: 'admitted', then a 'stage' event after each deployment hop
+        (including refinement rounds). While the response is generated, its
+        text arrives as 'response' events ({'text', 'attempt'}) as the model
+        produces it. A draft that then fails validation is withdrawn with a
+        'retract' event for its attempt: the client discards that attempt's
+        text, and a refinement round streams a new draft. 'done' comes last
+        with the same result process() returns; its status tells whether the
+        last draft stands ('completed') or the ticket was escalated. A ticket
+        that is turned away or fails before generation only gets 'done'.
+        """
+        progress = asyncio.Queue()
+        task = asyncio.ensure_future(self.process(request, progress))
+        task.add_done_callback(lambda _: progress.put_nowait(None))
+        while True:
+            event = await progress.get()
+            if event is None:
+                break
+            yield sse_event(*event)
+        yield sse_event('done', task.result())
+    
+    async def process(self, request: Dict[str, Any], progress: asyncio.Queue = None) -> Dict[str, Any]:
+        """
+        Process customer support ticket through the pipeline.
+        
+        Args:
+            request: Dictionary containing ticket data:
+                - ticket_id: Unique ticket identifier
+                - customer_id: Customer identifier
+                - message: Customer message/text
+                - source: Source of ticket (email, chat, etc.)
+            progress: Optional queue receiving (event, data) progress events, see
+                stream(); with one, generation is streamed
+        
+        Returns:
+            Dictionary with formatted response, or a structured 'deferred' /
+            'rejected' response when admission control turns the ticket away
+        """
+        # Validate input
+        if not request.get('message') or len(request.get('message', '').strip()) == 0:
+            return {
+                'error': 'Message cannot be empty',
+                'ticket_id': request.get('ticket_id')
+            }
+        
+        ticket_data = request.copy()
+        ticket_data['validation_status'] = 'valid'
+        # Admission tracks in-flight tickets by id, so every ticket needs its own
+        if not ticket_data.get('ticket_id'):
+            ticket_data['ticket_id'] = f"ticket-{uuid.uuid4().hex}"
+        ticket_id = str(ticket_data['ticket_id'])
+        
+        admission = self.admission.admit(ticket_id, estimate_urgency(ticket_data))
+        if admission['decision'] in ('defer', 'reject'):
+            return {
+                'ticket_id': ticket_data.get('ticket_id'),
+                'status': 'deferred' if admission['decision'] == 'defer' else 'rejected',
+                'error': f"Ticket not admitted ({admission['reason']})",
+                'retry_after_s': admission['retry_after_s'],
+                'admission': admission
+            }
+        ticket_data['admission'] = admission
+        started = time.monotonic()
+        if progress is not None:
+            progress.put_nowait(('admitted', {'ticket_id': ticket_data.get('ticket_id'), 'decision': admission['decision']}))
+        
+        try:
+            # Tickets downgraded under load skip validation
+            if admission['decision'] == 'downgrade':
+                ticket_data['service_level'] = 'reduced'
+            
+            # Classify, retrieve, generate, validate and format, one hop per deployment,
+            # regenerating a low-scoring response while attempts and time remain
+            for index, stages in enumerate(self.fusion_plan):
+                ticket_data = await self._run_stage(index, ticket_data, started, progress)
+                if 'validate' in stages and admission['decision'] != 'downgrade':
+                    ticket_data = await self._refine(ticket_data, started, progress)
+                    if ticket_data.get('escalate') and self.validation_group_continues:
+                        # The group's later stages skipped the rejected draft; run them on the settled ticket
+                        ticket_data['validation_settled'] = True
+                        ticket_data = await self._run_stage(index, ticket_data, started, progress)
+                    if ticket_data.get('validation_passed'):
+                        # Only validated responses are reused; the ticket does not wait for it
+                        self.generate_deployment.remember_response.remote(
+                            project(ticket_data, ResponseGenerator.REMEMBER_FIELDS)
+                        )
+            
+            if ticket_data.get('escalate'):
+                ticket_data['status'] = 'escalated'
+            
+            return ticket_data
+            
+        except Exception as e:
+            logger.error(f"Error processing ticket {ticket_data.get('ticket_id')}: {e}")
+            return {
+                'error': str(e),
+                'ticket_id': ticket_data.get('ticket_id'),
+                'status': 'failed'
+            }
+        
+        finally:
+            self.admission.complete(ticket_id, time.monotonic() - started)
+    
+    async def _run_stage(
+        self,
+        index: int,
+        ticket_data: Dict[str, Any],
+        started: float,
+        progress: asyncio.Queue = None
+    ) -> Dict[str, Any]:
+        """Send a deployment only the fields its stages read and merge back the fields they wrote."""
+        request = project(ticket_data, self.input_fields[index])
+        attempt = ticket_data.get('refinement_attempts', 0)
+        if progress is not None and self.fusion_plan[index] == ('generate',):
+            ticket_data.update(await self._stream_generation(index, request, attempt, progress))
+        else:
+            ticket_data.update(await self.stage_deployments[index].remote(request))
+        if progress is not None:
+            if 'validate' in self.fusion_plan[index] and ticket_data.get('needs_refinement') \
+                    and not ticket_data.get('validation_settled'):
+                # The streamed draft of this attempt failed validation
+                progress.put_nowait(('retract', {
+                    'attempt': attempt, 'reason': 'validation_failed', 'judge_score': ticket_data.get('judge_score')
+                }))
+            progress.put_nowait(('stage', {
+                'stage': '+'.join(self.fusion_plan[index]),
+                'refinement_attempt': ticket_data.get('refinement_attempts', 0),
+                'elapsed_s': round(time.monotonic() - started, 4),
+            }))
+        return ticket_data
+    
+    async def _stream_generation(
+        self,
+        index: int,
+        request: Dict[str, Any],
+        attempt: int,
+        progress: asyncio.Queue
+    ) -> Dict[str, Any]:
+        """Generate through the deployment's stream, forwarding text as 'response' events."""
+        output = {}
+        async for item in self.stage_deployments[index].options(stream=True).generate_stream.remote(request):
+            if 'text' in item:
+                progress.put_nowait(('response', {'text': item['text'], 'attempt': attempt}))
+            else:
+                output = item['result']
+        return output
+    
+    async def _refine(
+        self,
+        ticket_data: Dict[str, Any],
+        started: float,
+        progress: asyncio.Queue = None
+    ) -> Dict[str, Any]:
+        """
+        Regenerate a response that failed validation, with the validator's feedback.
+        
+        At most max_refinements rounds run, and only while the ticket's deadline
+        (its deadline_at, else TICKET_DEADLINE_S from arrival) leaves
+        refinement_min_budget_s for another round; otherwise the ticket is
+        marked for escalation.
+        """
+        while ticket_data.get('needs_refinement'):
+            deadline = ticket_data.get('deadline_at')
+            remaining = (
+                float(deadline) - time.time() if deadline is not None
+                else self.latency_budget_s - (time.monotonic() - started)
+            )
+            step = refinement.next_step(
+                ticket_data.get('refinement_attempts', 0), remaining, self.max_refinements, self.refinement_min_budget_s
+            )
+            if step != 'refine':
+                refinement.finish(ticket_data, step)
+                ticket_data['escalate'] = True
+                return ticket_data
+            refinement.start_attempt(ticket_data, ticket_data['refinement_feedback'])
+            for index in self.refinement_stages:
+                ticket_data = await self._run_stage(index, ticket_data, started, progress)
+        refinement.finish(ticket_data, 'passed')
+        return ticket_data
+    
+    async def admission_metrics(self) -> Dict[str, Any]:
+        """Admission controller state (in-flight, latency EWMA, decision counts)."""
+        return self.admission.snapshot()
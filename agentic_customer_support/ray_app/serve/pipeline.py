@@ -1,195 +1,177 @@
 """Ray Serve deployment graph for customer support pipeline."""
 
-import logging
-from typing import Dict, Any
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 
 from ray import serve
 from ray.serve import Application
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
 
-from ray_app.handlers.intent_classifier import IntentClassifier
-from ray_app.handlers.knowledge_retriever import KnowledgeRetriever
-from ray_app.handlers.response_generator import ResponseGenerator
-from ray_app.handlers.response_validator import ResponseValidator
+from ray_app.serve.orchestrator import PipelineOrchestrator
+from ray_app.serve.stages import DEFAULT_FUSION_PLAN, STAGES, parse_fusion_plan, project, run_stages, stage_fields
 
-logger = logging.getLogger(__name__)
+# Dynamic request batching of the stage deployments; a max batch size of 1 turns it off
+MAX_BATCH_SIZE = int(os.getenv('SERVE_MAX_BATCH_SIZE', '8'))
+BATCH_WAIT_TIMEOUT_S = float(os.getenv('SERVE_BATCH_WAIT_TIMEOUT_S', '0.01'))
 
 
-@serve.deployment(
-    name="intent-classifier",
-    num_replicas=2,
-    autoscaling_config={
-        "min_replicas": 0,
-        "max_replicas": 10,
-        "target_num_ongoing_requests_per_replica": 5,
-    }
-)
-class IntentClassifierDeployment:
-    """Ray Serve deployment for intent classification."""
-    
-    def __init__(self):
-        self.classifier = IntentClassifier()
-    
-    async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle classification request."""
-        return self.classifier.classify(request)
+def configure_batching(batch_method, max_batch_size: int = None, batch_wait_timeout_s: float = None) -> None:
+    """Override the module-level batching defaults for one replica's @serve.batch method."""
+    if max_batch_size is not None:
+        batch_method.set_max_batch_size(int(max_batch_size))
+    if batch_wait_timeout_s is not None:
+        batch_method.set_batch_wait_timeout_s(float(batch_wait_timeout_s))
 
 
-@serve.deployment(
-    name="knowledge-retriever",
-    num_replicas=2,
-    autoscaling_config={
-        "min_replicas": 0,
-        "max_replicas": 10,
-        "target_num_ongoing_requests_per_replica": 5,
-    }
-)
-class KnowledgeRetrieverDeployment:
-    """Ray Serve deployment for knowledge retrieval."""
-    
-    def __init__(self):
-        self.retriever = KnowledgeRetriever()
-    
-    async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle knowledge retrieval request."""
-        return self.retriever.retrieve(request)
+# Handler code is synchronous, so each stage replica runs it in its own thread pool and
+# its event loop stays free to accept and batch requests; 0 threads runs it inline
+HANDLER_THREADS = int(os.getenv('SERVE_HANDLER_THREADS', '4'))
 
 
-@serve.deployment(
-    name="response-generator",
-    num_replicas=1,
-    autoscaling_config={
-        "min_replicas": 0,
-        "max_replicas": 5,
-        "target_num_ongoing_requests_per_replica": 2,
-    }
-)
-class ResponseGeneratorDeployment:
-    """Ray Serve deployment for response generation."""
-    
-    def __init__(self):
-        self.generator = ResponseGenerator()
-    
-    async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle response generation request."""
-        return self.generator.generate(request)
+def handler_executor(name: str, handler_threads: int = None) -> Optional[ThreadPoolExecutor]:
+    """Per-replica pool for handler calls (None when handler_threads is 0)."""
+    threads = HANDLER_THREADS if handler_threads is None else int(handler_threads)
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix=name) if threads > 0 else None
 
 
-@serve.deployment(
-    name="response-validator",
-    num_replicas=1,
-    autoscaling_config={
-        "min_replicas": 0,
-        "max_replicas": 5,
-        "target_num_ongoing_requests_per_replica": 5,
-    }
-)
-class ResponseValidatorDeployment:
-    """Ray Serve deployment for response validation."""
-    
-    def __init__(self):
-        self.validator = ResponseValidator(threshold=0.7)
-    
-    async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle response validation request."""
-        return self.validator.validate(request)
+async def run_handler(executor: Optional[ThreadPoolExecutor], func, *args):
+    """Run a synchronous handler call off the event loop (inline without a pool)."""
+    if executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
 
 
-@serve.deployment(
-    name="customer-support-pipeline",
-    route_prefix="/support"
-)
-class CustomerSupportPipeline:
-    """Main pipeline orchestrator."""
+@serve.deployment
+class StageDeployment:
+    """Ray Serve deployment for one pipeline stage, or several fused ones."""
     
     def __init__(
         self,
-        intent_classifier,
-        knowledge_retriever,
-        response_generator,
-        response_validator
+        stages: Tuple[str, ...],
+        max_batch_size: int = None,
+        batch_wait_timeout_s: float = None,
+        handler_threads: int = None
     ):
-        self.intent_classifier = intent_classifier
-        self.knowledge_retriever = knowledge_retriever
-        self.response_generator = response_generator
-        self.response_validator = response_validator
+        self.stages = tuple(stages)
+        self.handlers = {stage: STAGES[stage][0]() for stage in self.stages}
+        self.output_fields = stage_fields(self.stages)[1]
+        configure_batching(self.handle_batch, max_batch_size, batch_wait_timeout_s)
+        self.executor = handler_executor('-'.join(self.stages), handler_threads)
     
     async def __call__(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Process customer support ticket through the pipeline.
+        Handle a ticket through this deployment's stages (batched with concurrent requests).
         
         Args:
-            request: Dictionary containing ticket data:
-                - ticket_id: Unique ticket identifier
-                - customer_id: Customer identifier
-                - message: Customer message/text
-                - source: Source of ticket (email, chat, etc.)
+            request: The ticket fields the stages read (see stage_fields)
         
         Returns:
-            Dictionary with formatted response
+            Only the fields the stages wrote
         """
-        # Validate input
-        if not request.get('message') or len(request.get('message', '').strip()) == 0:
-            return {
-                'error': 'Message cannot be empty',
-                'ticket_id': request.get('ticket_id')
-            }
+        return await self.handle_batch(request)
+    
+    @serve.batch(max_batch_size=MAX_BATCH_SIZE, batch_wait_timeout_s=BATCH_WAIT_TIMEOUT_S)
+    async def handle_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Handle a batch of tickets in one handler call per stage."""
+        tickets = await run_handler(self.executor, run_stages, self.handlers, self.stages, requests)
+        return [project(ticket_data, self.output_fields) for ticket_data in tickets]
+    
+    async def generate_stream(self, request: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate one ticket's response as a stream (call through handle.options(stream=True)).
+        
+        Streamed tickets skip the request batching: each is its own model call.
         
-        ticket_data = request.copy()
-        ticket_data['validation_status'] = 'valid'
+        Yields:
+            {'text': piece} as the model produces text, then {'result': the fields
+            the stage wrote}
+        """
+        ticket_data = dict(request)
+        pieces = self.handlers['generate'].generate_stream(ticket_data)
+        while True:
+            piece = await run_handler(self.executor, next, pieces, None)
+            if piece is None:
+                break
+            yield {'text': piece}
+        yield {'result': project(ticket_data, self.output_fields)}
+    
+    async def remember_response(self, ticket_data: Dict[str, Any]) -> bool:
+        """Cache a validated response in this replica's response cache (False without the generate stage)."""
+        if 'generate' not in self.handlers:
+            return False
+        return await run_handler(self.executor, self.handlers['generate'].remember_response, ticket_data)
+    
+    async def cache_metrics(self) -> Dict[str, Any]:
+        """Retrieval cache hit rates of this replica (empty without the retrieve stage)."""
+        return self.handlers['retrieve'].cache_metrics() if 'retrieve' in self.handlers else {}
+    
+    async def judge_metrics(self) -> Dict[str, Any]:
+        """Judge escalation rate of this replica (empty without the validate stage)."""
+        return self.handlers['validate'].metrics() if 'validate' in self.handlers else {}
+
+
+def stage_deployment(stages: Tuple[str, ...]):
+    """StageDeployment configured with the name and scaling options of a stage group."""
+    options = dict(STAGES[stages[0]][2])
+    options['name'] = '-'.join(STAGES[stage][2]['name'] for stage in stages)
+    return StageDeployment.options(**options)
+
+
+def wants_stream(request: Request) -> bool:
+    """Streaming was asked for with ?stream=true or an Accept: text/event-stream header."""
+    return (
+        request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+        or 'text/event-stream' in request.headers.get('accept', '')
+    )
+
+
+@serve.deployment(
+    name="customer-support-pipeline",
+    route_prefix="/support"
+)
+class CustomerSupportPipeline(PipelineOrchestrator):
+    """Main pipeline orchestrator (see PipelineOrchestrator for the ticket flow)."""
+    
+    async def __call__(self, request):
+        """
+        Handle a ticket from HTTP or a deployment handle.
         
-        try:
-            # Step 1: Classify intent
-            ticket_data = await self.intent_classifier.remote(ticket_data)
-            
-            # Step 2: Retrieve knowledge
-            ticket_data = await self.knowledge_retriever.remote(ticket_data)
-            
-            # Step 3: Generate response
-            ticket_data = await self.response_generator.remote(ticket_data)
-            
-            # Step 4: Validate response
-            ticket_data = await self.response_validator.remote(ticket_data)
-            
-            # Step 5: Format response
-            formatted_response = {
-                'ticket_id': ticket_data.get('ticket_id'),
-                'customer_id': ticket_data.get('customer_id'),
-                'response_text': ticket_data.get('generated_response'),
-                'intent': ticket_data.get('intent'),
-                'urgency': ticket_data.get('urgency'),
-                'quality_score': ticket_data.get('judge_score'),
-                'formatted_at': __import__('datetime').datetime.utcnow().isoformat(),
-                'sources': ticket_data.get('context_sources', [])
-            }
-            
-            ticket_data['formatted_response'] = formatted_response
-            ticket_data['status'] = 'completed'
-            
-            return ticket_data
-            
-        except Exception as e:
-            logger.error(f"Error processing ticket {ticket_data.get('ticket_id')}: {e}")
-            return {
-                'error': str(e),
-                'ticket_id': ticket_data.get('ticket_id'),
-                'status': 'failed'
-            }
+        HTTP clients get the JSON result of process(), or a text/event-stream
+        from stream() when they ask for streaming (see wants_stream).
+        """
+        if isinstance(request, Request):
+            ticket = await request.json()
+            if wants_stream(request):
+                return StreamingResponse(
+                    self.stream(ticket), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'}
+                )
+            request = ticket
+        return await self.process(request)
 
 
 # Build the deployment graph
-def build_app() -> Application:
-    """Build the Ray Serve application."""
-    intent_classifier = IntentClassifierDeployment.bind()
-    knowledge_retriever = KnowledgeRetrieverDeployment.bind()
-    response_generator = ResponseGeneratorDeployment.bind()
-    response_validator = ResponseValidatorDeployment.bind()
+def build_app(args: Dict[str, str] = None) -> Application:
+    """
+    Build the Ray Serve application.
     
-    pipeline = CustomerSupportPipeline.bind(
-        intent_classifier,
-        knowledge_retriever,
-        response_generator,
-        response_validator
-    )
+    Args:
+        args: Optional builder arguments, e.g. from
+            `serve run ray_app.serve.pipeline:build_app max_batch_size=16`:
+            - fusion_plan: Stages per deployment, e.g. 'classify+retrieve,generate,validate+format'
+              (default PIPELINE_FUSION_PLAN or 'classify,retrieve,generate,validate+format')
+            - max_batch_size: Largest batch per stage call (default SERVE_MAX_BATCH_SIZE or 8)
+            - batch_wait_timeout_s: Longest wait for a batch to fill (default SERVE_BATCH_WAIT_TIMEOUT_S or 0.01)
+            - handler_threads: Handler thread pool size per replica (default SERVE_HANDLER_THREADS
+              or 4; 0 runs handlers on the event loop)
+    """
+    args = args or {}
+    fusion_plan = parse_fusion_plan(args.get('fusion_plan') or DEFAULT_FUSION_PLAN)
+    stage_options = {key: args.get(key) for key in ('max_batch_size', 'batch_wait_timeout_s', 'handler_threads')}
+    stage_deployments = [stage_deployment(stages).bind(stages, **stage_options) for stages in fusion_plan]
+    
+    pipeline = CustomerSupportPipeline.bind(fusion_plan, *stage_deployments)
     
     return pipeline
-
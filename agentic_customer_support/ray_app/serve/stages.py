@@ -0,0 +1,126 @@
+"""Pipeline stage registry, fusion plans and ticket-field helpers (no Ray import)."""
+
+import json
+import os
+from typing import Dict, Any, List, Tuple
+
+from ray_app.handlers.intent_classifier import IntentClassifier
+from ray_app.handlers.knowledge_retriever import KnowledgeRetriever
+from ray_app.handlers.response_formatter import ResponseFormatter
+from ray_app.handlers.response_generator import ResponseGenerator
+from ray_app.handlers.response_validator import ResponseValidator
+
+# Pipeline stages in order: handler class, batch method and deployment options.
+# A fused deployment takes the name of each of its stages and the options of its first one.
+# Handler classes declare the ticket fields they read and write (INPUT_FIELDS / OUTPUT_FIELDS).
+STAGES = {
+    'classify': (IntentClassifier, 'classify_batch', {
+        'name': 'intent-classifier',
+        'num_replicas': 2,
+        'autoscaling_config': {"min_replicas": 0, "max_replicas": 10, "target_num_ongoing_requests_per_replica": 5},
+    }),
+    'retrieve': (KnowledgeRetriever, 'retrieve_batch', {
+        'name': 'knowledge-retriever',
+        'num_replicas': 2,
+        'autoscaling_config': {"min_replicas": 0, "max_replicas": 10, "target_num_ongoing_requests_per_replica": 5},
+    }),
+    'generate': (ResponseGenerator, 'generate_batch', {
+        'name': 'response-generator',
+        'num_replicas': 1,
+        'autoscaling_config': {"min_replicas": 0, "max_replicas": 5, "target_num_ongoing_requests_per_replica": 2},
+    }),
+    'validate': (ResponseValidator, 'validate_batch', {
+        'name': 'response-validator',
+        'num_replicas': 1,
+        'autoscaling_config': {"min_replicas": 0, "max_replicas": 5, "target_num_ongoing_requests_per_replica": 5},
+    }),
+    'format': (ResponseFormatter, 'format_batch', {
+        'name': 'response-formatter',
+        'num_replicas': 1,
+        'autoscaling_config': {"min_replicas": 0, "max_replicas": 5, "target_num_ongoing_requests_per_replica": 5},
+    }),
+}
+
+# Comma-separated deployments, '+' joining the stages fused into one. Each fused
+# group saves a network hop and a serialization round per ticket.
+DEFAULT_FUSION_PLAN = os.getenv('PIPELINE_FUSION_PLAN', 'classify,retrieve,generate,validate+format')
+
+
+def parse_fusion_plan(plan: str) -> List[Tuple[str, ...]]:
+    """
+    Parse a fusion plan such as 'classify+retrieve,generate,validate+format'.
+    
+    Every stage must appear exactly once, in pipeline order, and generation
+    stays a deployment of its own so it scales on its own accelerators.
+    
+    Returns:
+        One tuple of stage names per deployment
+    
+    Raises:
+        ValueError: If the plan does not meet these rules
+    """
+    groups = [
+        tuple(stage.strip() for stage in group.split('+') if stage.strip())
+        for group in plan.split(',') if group.strip()
+    ]
+    if [stage for group in groups for stage in group] != list(STAGES):
+        raise ValueError(f"Fusion plan {plan!r} must list each of {', '.join(STAGES)} once, in that order")
+    if any('generate' in group and len(group) > 1 for group in groups):
+        raise ValueError(f"Fusion plan {plan!r} fuses 'generate'; it must be its own deployment")
+    return groups
+
+
+def stage_fields(stages: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Ticket fields a stage group reads and writes.
+    
+    The group reads what any of its stages reads, so a field written by an
+    earlier stage of the group is still sent when it is also an input.
+    
+    Returns:
+        (input_fields, output_fields)
+    """
+    inputs, outputs = [], []
+    for stage in stages:
+        handler_class = STAGES[stage][0]
+        inputs += [f for f in handler_class.INPUT_FIELDS if f not in inputs]
+        outputs += [f for f in handler_class.OUTPUT_FIELDS if f not in outputs]
+    if 'validate' in stages:
+        # run_stages skips validation for downgraded tickets and for tickets whose refinement has settled
+        inputs += ['service_level', 'validation_settled']
+    return tuple(inputs), tuple(outputs)
+
+
+def project(ticket_data: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """The given fields of a ticket (missing ones are left out)."""
+    return {field: ticket_data[field] for field in fields if field in ticket_data}
+
+
+def run_stages(handlers: Dict[str, Any], stages: Tuple[str, ...], tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run consecutive stages over a batch of tickets in one process.
+    
+    Tickets downgraded under load (service_level 'reduced') and tickets whose
+    refinement loop has settled (validation_settled) skip validation. Stages
+    after validation skip tickets that failed it: the pipeline either sends
+    them back for refinement or settles them, and only then are they formatted.
+    """
+    for position, stage in enumerate(stages):
+        batch_method = getattr(handlers[stage], STAGES[stage][1])
+        if stage == 'validate':
+            validated = [t for t in tickets if t.get('service_level') != 'reduced' and not t.get('validation_settled')]
+            if validated:
+                batch_method(validated)
+        elif 'validate' in stages[:position]:
+            ready = [i for i, t in enumerate(tickets) if not t.get('needs_refinement') or t.get('validation_settled')]
+            if ready:
+                for i, ticket in zip(ready, batch_method([tickets[i] for i in ready])):
+                    tickets[i] = ticket
+        else:
+            tickets = batch_method(tickets)
+    return tickets
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
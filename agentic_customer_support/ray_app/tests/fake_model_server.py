@@ -0,0 +1,143 @@
+"""Local fake of an OpenAI-compatible completions server, for tests and local runs.
+
+    python -m ray_app.tests.fake_model_server --port 8000 --latency-ms 50
+
+then point the handlers at it with LLM_BASE_URL=http://127.0.0.1:8000.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+
+class FakeModelServer:
+    """
+    Threaded HTTP/1.1 server answering POST /v1/completions (single or list prompt).
+
+    Requests with "stream": true get the completion of their (single) prompt
+    as server-sent events, one word per event, then "data: [DONE]".
+
+    Args:
+        reply: prompt -> completion text
+        latency_s: Fixed delay, or a callable (request number -> delay)
+        fail_first: Number of initial requests answered with `fail_status`
+        fail_status: Status used for the injected failures
+        token_latency_s: Delay before each streamed word
+    """
+
+    def __init__(
+        self,
+        reply: Optional[Callable[[str], str]] = None,
+        latency_s=0.0,
+        fail_first: int = 0,
+        fail_status: int = 503,
+        token_latency_s: float = 0.0,
+        port: int = 0
+    ):
+        self.reply = reply or (lambda prompt: f"echo: {prompt[:40]}")
+        self.latency_s = latency_s
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.token_latency_s = token_latency_s
+        self.requests: List[dict] = []
+        self.client_ports = set()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with server._lock:
+                    number = len(server.requests)
+                    server.requests.append(body)
+                    server.client_ports.add(self.client_address[1])
+                delay = server.latency_s(number) if callable(server.latency_s) else server.latency_s
+                if delay:
+                    time.sleep(delay)
+                if number < server.fail_first:
+                    self._send(server.fail_status, {'error': 'injected failure'})
+                    return
+                if body.get('stream'):
+                    self._stream(server.reply(body.get('prompt', '')))
+                    return
+                prompts = body.get('prompt', '')
+                prompts = prompts if isinstance(prompts, list) else [prompts]
+                texts = [server.reply(prompt) for prompt in prompts]
+                self._send(200, {
+                    'choices': [{'index': i, 'text': text} for i, text in enumerate(texts)],
+                    'usage': {
+                        'prompt_tokens': sum(len(prompt.split()) for prompt in prompts),
+                        'completion_tokens': sum(len(text.split()) for text in texts),
+                    },
+                })
+
+            def _stream(self, text):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for word in re.findall(r'\S+\s*', text):
+                    if server.token_latency_s:
+                        time.sleep(server.token_latency_s)
+                    self._chunk({'choices': [{'index': 0, 'text': word}]})
+                self._chunk({'choices': [], 'usage': {'completion_tokens': len(text.split())}})
+                self._chunk('[DONE]')
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _chunk(self, document):
+                data = f"data: {document if isinstance(document, str) else json.dumps(document)}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+                self.wfile.flush()
+
+            def _send(self, status, document):
+                data = json.dumps(document).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> 'FakeModelServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible completions server")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    with FakeModelServer(latency_s=args.latency_ms / 1000, port=args.port) as server:
+        print(f"Fake model server listening on {server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
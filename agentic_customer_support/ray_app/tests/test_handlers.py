@@ -1,10 +1,17 @@
 """Unit tests for Ray Serve handlers."""
 
 import pytest
+from ray_app.handlers import refinement
+from ray_app.handlers.admission import AdmissionController
 from ray_app.handlers.intent_classifier import IntentClassifier
 from ray_app.handlers.knowledge_retriever import KnowledgeRetriever
+from ray_app.handlers.llm_client import LLMClient
+from ray_app.handlers.response_formatter import ResponseFormatter
 from ray_app.handlers.response_generator import ResponseGenerator
+from ray_app.handlers.response_cache import SemanticResponseCache
 from ray_app.handlers.response_validator import ResponseValidator
+from ray_app.handlers.retrieval_cache import RetrievalCache
+from ray_app.tests.fake_model_server import FakeModelServer
 
 
 def test_intent_classifier():
@@ -36,6 +43,73 @@ def test_knowledge_retriever():
     assert 'context_sources' in result
 
 
+
+def test_knowledge_retriever_bm25_index(tmp_path):
+    """Test BM25 retrieval over a markdown KB."""
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    (tmp_path / 'login.md').write_text("# Login\n\nReset your password from the sign-in page.\n")
+
+    retriever = KnowledgeRetriever(knowledge_base_path=str(tmp_path), reload_interval_s=0)
+    result = retriever.retrieve({'ticket_id': 'T1', 'message': 'I forgot my password', 'intent': 'technical_support'})
+    assert result['context_sources'][0] == 'login.md'
+    assert result['knowledge_context'][0]['relevance_score'] > 0
+
+
+
+def test_knowledge_retriever_dense_mode(tmp_path):
+    """Test dense retrieval with the hashing embedder."""
+    pytest.importorskip('numpy')
+    (tmp_path / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    (tmp_path / 'login.md').write_text("# Login\n\nReset your password from the sign-in page.\n")
+
+    retriever = KnowledgeRetriever(knowledge_base_path=str(tmp_path), retrieval_mode='dense', reload_interval_s=0)
+    result = retriever.retrieve({'ticket_id': 'T1', 'message': 'I forgot my password', 'intent': 'technical_support'})
+    assert result['context_sources'][0] == 'login.md'
+    assert 'dense_score' in result['knowledge_context'][0]
+
+
+
+def test_retrieval_cache_eviction_and_ttl():
+    """Test the LRU bound and TTL of the retrieval cache."""
+    cache = RetrievalCache(max_entries=2, ttl_s=60)
+    for message in ('refund please', 'cancel order', 'login broken'):
+        cache.put('question', message, [{'source': message}], version=1)
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.get('question', 'refund please', version=1) is None
+    assert cache.get('question', 'broken login', version=1) == [{'source': 'login broken'}]
+    assert cache.get('question', 'broken login', version=2) is None
+
+    cache.ttl_s = 0
+    cache.put('question', 'cancel order', [{'source': 'x'}], version=2)
+    assert cache.get('question', 'cancel order', version=2) is None
+
+
+def test_kb_index_default_location_survives_restarts(tmp_path, monkeypatch):
+    """Test that the default index dir is reused after a restart and not shared by live processes."""
+    from ray_app.handlers import kb_index
+    monkeypatch.setattr(kb_index.tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    kb = tmp_path / 'kb'
+    kb.mkdir()
+    (kb / 'refunds.md').write_text("# Refunds\n\nRefunds are processed within 5-7 business days.\n")
+    first = kb_index.open_index(str(kb))
+    assert kb_index.default_index_dir(str(kb)) == first.index_dir
+
+    # Another live process on the host gets its own slot
+    held = kb_index._claimed_slots.copy()
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    assert kb_index.default_index_dir(str(kb)) != first.index_dir
+
+    # After both exit, a restarted process loads the first slot's index without rebuilding
+    for _, lock_file in list(held.values()) + list(kb_index._claimed_slots.values()):
+        lock_file.close()
+    monkeypatch.setattr(kb_index, '_claimed_slots', {})
+    monkeypatch.setattr(kb_index, '_full_rebuild', lambda *args, **kwargs: pytest.fail('index rebuilt'))
+    reopened = kb_index.open_index(str(kb))
+    assert reopened.index_dir == first.index_dir and reopened.version == first.version
+    assert '5-7 business days' in reopened.search('refund', top_k=1)[0]['content']
+
+
 def test_response_generator():
     """Test response generation."""
     generator = ResponseGenerator()
@@ -53,6 +127,42 @@ def test_response_generator():
     assert len(result['generated_response']) > 0
 
 
+
+def test_response_generator_semantic_cache():
+    """Test that near-duplicate tickets reuse a re-templated response once it passed validation."""
+    generator = ResponseGenerator(response_cache=SemanticResponseCache(similarity_threshold=0.9))
+    ticket = {'intent': 'cancellation', 'knowledge_context': []}
+    first = generator.generate({**ticket, 'ticket_id': 'T1', 'message': 'Please cancel my subscription, account jane@example.com'})
+    assert not generator.remember_response({**first, 'validation_passed': False})
+    draft = generator.generate({**ticket, 'ticket_id': 'T2', 'message': 'please cancel my subscription, account bob@example.org'})
+    assert draft['response_provenance'] == {'source': 'llm'}
+    
+    validated = {**first, 'validation_passed': True}
+    assert generator.remember_response({f: validated[f] for f in ResponseGenerator.REMEMBER_FIELDS if f in validated})
+    result = generator.generate({**ticket, 'ticket_id': 'T2', 'message': 'please cancel my subscription, account bob@example.org'})
+    assert result['response_provenance']['source'] == 'semantic_cache'
+    assert 'bob@example.org' in result['generated_response']
+
+
+
+def test_response_cache_templates_whole_values_only():
+    """Test that a short id occurring inside the response text is not turned into a placeholder."""
+    cache = SemanticResponseCache()
+    ticket = {'ticket_id': 'T1', 'customer_id': '5', 'message': 'How long does a refund for order 12345 take?'}
+    cache.store(ticket, 'refund', '', 'Refunds for order 12345 take 5-7 business days.')
+    reused = cache.lookup({'ticket_id': 'T2', 'customer_id': '9', 'message': 'How long does a refund for order 67890 take?'}, 'refund', '')
+    assert reused['response'] == 'Refunds for order 67890 take 5-7 business days.'
+
+
+def test_response_generator_packs_context():
+    """Test that the generator keeps context within the token budget and reports it."""
+    generator = ResponseGenerator(context_token_budget=16)
+    passages = [{'content': f'Passage {i} about refunds and order processing times.', 'relevance_score': i / 10} for i in range(10)]
+    result = generator.generate({'ticket_id': 'T1', 'message': 'refund', 'intent': 'refund', 'knowledge_context': passages})
+    assert 0 < result['context_tokens'] <= 16
+    assert 'Passage 9' in result['generated_response']
+
+
 def test_response_validator():
     """Test response validation."""
     validator = ResponseValidator(threshold=0.7)
@@ -68,3 +178,117 @@ def test_response_validator():
     assert result['judge_score'] <= 1.0
     assert 'validation_passed' in result
 
+
+def test_response_validator_llm_judge():
+    """Test that uncertain scores are judged through the pooled client in one batch."""
+    tickets = [
+        {'ticket_id': 'T1', 'message': 'refund', 'generated_response': 'Thank you, we can help with that refund request today.'},
+        {'ticket_id': 'T2', 'message': 'refund', 'generated_response': 'No.'},
+        {'ticket_id': 'T3', 'message': 'refund', 'generated_response': 'Your refund request was received and is now being processed.'},
+    ]
+    with FakeModelServer(reply=lambda prompt: ' 0.42') as server:
+        client = LLMClient(server.url, max_retries=0)
+        validator = ResponseValidator(threshold=0.7, judge_client=client)
+        results = validator.validate_batch(tickets)
+        assert [r['judge_tier'] for r in results] == ['llm', 'heuristic', 'llm']
+        assert results[0]['judge_score'] == 0.42
+        assert results[0]['needs_refinement']
+        assert client.metrics()['calls'] == 1
+        assert validator.metrics()['escalated'] == 2
+        client.close()
+
+
+def test_refinement_feedback_and_regeneration():
+    """Test that a failed response carries feedback the generator acts on, within the attempt limit."""
+    validator = ResponseValidator(threshold=0.7)
+    generator = ResponseGenerator()
+    ticket = validator.validate({'ticket_id': 'T1', 'message': 'Where is my order?', 'generated_response': 'No.'})
+    assert ticket['needs_refinement']
+    assert ticket['refinement_feedback']['issues']
+    
+    assert refinement.next_step(0, None, max_attempts=2, min_budget_s=1.0) == 'refine'
+    assert refinement.next_step(0, 0.5, max_attempts=2, min_budget_s=1.0) == 'deadline'
+    assert refinement.next_step(2, None, max_attempts=2, min_budget_s=1.0) == 'max_attempts'
+    
+    refinement.start_attempt(ticket, ticket['refinement_feedback'])
+    ticket = validator.validate(generator.generate(ticket))
+    assert not ticket['needs_refinement']
+    refinement.finish(ticket, 'passed')
+    assert ticket['refinement_attempts'] == 1
+    assert ticket['refinement_outcome'] == 'passed'
+
+
+def test_batch_apis_match_single_calls():
+    """Test that the batched handler paths give the single-call results, with one model request per batch."""
+    messages = ['I need a refund', 'The app is not working', 'How do I cancel?']
+    tickets = [{'ticket_id': f'T{i}', 'customer_id': 'C1', 'message': m} for i, m in enumerate(messages)]
+    classifier = IntentClassifier()
+    retriever = KnowledgeRetriever()
+    batched = retriever.retrieve_batch(classifier.classify_batch([dict(t) for t in tickets]))
+    single = [retriever.retrieve(classifier.classify(dict(t))) for t in tickets]
+    assert [t['intent'] for t in batched] == [t['intent'] for t in single]
+    assert [t['context_sources'] for t in batched] == [t['context_sources'] for t in single]
+    
+    with FakeModelServer(reply=lambda prompt: 'Thank you, we will help.') as server:
+        client = LLMClient(server.url, max_retries=0)
+        generator = ResponseGenerator(llm_client=client)
+        results = generator.generate_batch(batched)
+        assert len(server.requests) == 1
+        assert [r['generated_response'] for r in results] == ['Thank you, we will help.'] * 3
+        assert results[0]['llm_usage']['batch_size'] == 3
+        client.close()
+
+
+def test_response_formatter():
+    """Test that formatting finalizes the response and keeps the escalation status."""
+    formatter = ResponseFormatter()
+    tickets = [
+        {'ticket_id': 'T1', 'customer_id': 'C1', 'validation_status': 'valid', 'generated_response': 'Thank you.', 'judge_score': 0.9},
+        {'ticket_id': 'T2', 'customer_id': 'C1', 'validation_status': 'valid', 'generated_response': 'No.', 'escalate': True},
+    ]
+    results = formatter.format_batch(tickets)
+    assert results[0]['formatted_response']['response_text'] == 'Thank you.'
+    assert results[0]['formatted_response']['quality_score'] == 0.9
+    assert [r['status'] for r in results] == ['completed', 'escalated']
+
+
+def test_stage_field_declarations():
+    """Test that each handler writes only its OUTPUT_FIELDS and needs only its INPUT_FIELDS."""
+    ticket = {'ticket_id': 'T1', 'customer_id': 'C1', 'message': 'I need a refund for order 1234', 'validation_status': 'valid'}
+    for handler, method in [
+        (IntentClassifier, 'classify'),
+        (KnowledgeRetriever, 'retrieve'),
+        (ResponseGenerator, 'generate'),
+        (ResponseValidator, 'validate'),
+        (ResponseFormatter, 'format'),
+    ]:
+        before = dict(ticket)
+        # Fresh handlers, so the second call is not served from the response cache
+        full = getattr(handler(), method)(dict(ticket))
+        projected = getattr(handler(), method)({f: ticket[f] for f in handler.INPUT_FIELDS if f in ticket})
+        written = {f for f in full if f not in before or full[f] != before[f]}
+        assert written <= set(handler.OUTPUT_FIELDS)
+        assert written <= set(projected)
+        for field in written - {'response_generated_at', 'formatted_response'}:
+            assert projected[field] == full[field]
+        ticket = full
+
+
+def test_admission_controller():
+    """Test admission decisions across load levels."""
+    controller = AdmissionController(soft_watermark=2, hard_watermark=3, latency_slo_s=1.0)
+    assert controller.admit('T-1', 'low')['decision'] == 'admit'
+    assert controller.admit('T-2', 'medium')['decision'] == 'admit'
+    assert controller.admit('T-3', 'medium')['decision'] == 'downgrade'
+    assert controller.admit('T-4', 'low')['decision'] == 'reject'
+    assert controller.admit('T-5', 'high')['decision'] == 'admit'
+    
+    for ticket_id in ['T-1', 'T-2', 'T-3', 'T-5']:
+        controller.complete(ticket_id, latency_s=2.0)
+    # Queue drained, but latency above the SLO keeps pressure elevated
+    assert controller.admit('T-6', 'low')['decision'] == 'defer'
+    
+    metrics = controller.snapshot()
+    assert metrics['pressure'] == 'elevated'
+    assert metrics['in_flight'] == 0
+    assert metrics['rejected_total'] == 1
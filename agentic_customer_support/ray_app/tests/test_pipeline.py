@@ -0,0 +1,340 @@
+"""Unit tests for the Ray Serve pipeline's stage plans and orchestration (run without Ray)."""
+
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+from ray_app.handlers.llm_client import LLMClient
+from ray_app.handlers.response_cache import SemanticResponseCache
+from ray_app.handlers.response_formatter import ResponseFormatter
+from ray_app.handlers.response_generator import ResponseGenerator
+from ray_app.handlers.response_validator import ResponseValidator
+from ray_app.serve.orchestrator import PipelineOrchestrator
+from ray_app.serve.stages import (
+    STAGES, parse_fusion_plan, project, run_stages, sse_event, stage_fields
+)
+from ray_app.tests.fake_model_server import FakeModelServer
+
+PLAN = [('classify',), ('retrieve',), ('generate',), ('validate', 'format')]
+
+
+class InProcessDeployment:
+    """Stand-in for a StageDeployment handle that runs the real handlers in this process."""
+
+    def __init__(self, stages, **handlers):
+        self.stages = stages
+        self.handlers = {stage: handlers.get(stage) or STAGES[stage][0]() for stage in stages}
+        self.output_fields = stage_fields(stages)[1]
+        self.requests = []
+        self.remembered = []
+        self.remember_response = SimpleNamespace(remote=self._remember)
+        self.generate_stream = SimpleNamespace(remote=self._generate_stream)
+
+    def options(self, stream=False):
+        return self
+
+    def remote(self, request):
+        self.requests.append(request)
+
+        async def call():
+            tickets = run_stages(self.handlers, self.stages, [dict(request)])
+            return project(tickets[0], self.output_fields)
+
+        return call()
+
+    def _generate_stream(self, request):
+        self.requests.append(request)
+
+        async def items():
+            ticket_data = dict(request)
+            for piece in self.handlers['generate'].generate_stream(ticket_data):
+                yield {'text': piece}
+            yield {'result': project(ticket_data, self.output_fields)}
+
+        return items()
+
+    def _remember(self, ticket_data):
+        self.remembered.append(ticket_data)
+        return self.handlers['generate'].remember_response(ticket_data)
+
+
+class ScriptedDeployment(InProcessDeployment):
+    """Stand-in whose outputs come from a function of the request and the call number."""
+
+    def __init__(self, stages, script):
+        super().__init__(stages)
+        self.script = script
+
+    def remote(self, request):
+        self.requests.append(request)
+
+        async def call():
+            return self.script(request, len(self.requests))
+
+        return call()
+
+    def _generate_stream(self, request):
+        self.requests.append(request)
+
+        async def items():
+            output = self.script(request, len(self.requests))
+            yield {'text': output['generated_response']}
+            yield {'result': output}
+
+        return items()
+
+    def _remember(self, ticket_data):
+        self.remembered.append(ticket_data)
+
+
+def test_parse_fusion_plan():
+    """Test that plans keep every stage once, in order, with generation on its own."""
+    assert parse_fusion_plan('classify+retrieve, generate ,validate+format') == [
+        ('classify', 'retrieve'), ('generate',), ('validate', 'format')
+    ]
+    for plan in (
+        'classify,retrieve,generate,validate',
+        'retrieve,classify,generate,validate,format',
+        'classify,retrieve,generate,validate,format,format',
+        'classify,retrieve+generate,validate,format',
+    ):
+        with pytest.raises(ValueError):
+            parse_fusion_plan(plan)
+
+
+def test_stage_fields_of_a_fused_group():
+    """Test that a fused group reads its stages' inputs and writes only their outputs."""
+    inputs, outputs = stage_fields(('validate', 'format'))
+    assert 'generated_response' in inputs and 'service_level' in inputs
+    # Written by validate and read by format: still an input, as the group may skip validation
+    assert 'judge_score' in inputs and 'judge_score' in outputs
+    assert set(outputs) == set(STAGES['validate'][0].OUTPUT_FIELDS) | set(STAGES['format'][0].OUTPUT_FIELDS)
+    assert 'knowledge_context' not in inputs
+    assert project({'a': 1, 'b': 2}, ('a', 'c')) == {'a': 1}
+
+
+def test_run_stages_skips_validation_for_reduced_service():
+    """Test that downgraded tickets are formatted without being validated."""
+    handlers = {stage: STAGES[stage][0]() for stage in ('validate', 'format')}
+    ticket = {'ticket_id': 'T1', 'message': 'refund', 'validation_status': 'valid',
+              'generated_response': 'Thank you for contacting us, we will help you with the refund.'}
+    full, reduced = run_stages(handlers, ('validate', 'format'), [dict(ticket), {**ticket, 'service_level': 'reduced'}])
+    assert 'judge_score' in full and full['status'] == 'completed'
+    assert 'judge_score' not in reduced and reduced['status'] == 'completed'
+
+
+def test_sse_event():
+    """Test server-sent event framing."""
+    event = sse_event('stage', {'stage': 'generate'})
+    assert event.startswith('event: stage\ndata: ') and event.endswith('\n\n')
+    assert json.loads(event.split('data: ', 1)[1]) == {'stage': 'generate'}
+
+
+def scripted_pipeline(validate_script):
+    """Pipeline over scripted deployments: classify, retrieve and generate always succeed."""
+    def generate(request, n):
+        return {'generated_response': f"draft {n}", 'response_provenance': {'source': 'llm'}, 'response_cache_scope': 's'}
+
+    deployments = [
+        ScriptedDeployment(('classify',), lambda request, n: {'intent': 'refund', 'urgency': 'low'}),
+        ScriptedDeployment(('retrieve',), lambda request, n: {'knowledge_context': [{'content': 'Refund policy'}]}),
+        ScriptedDeployment(('generate',), generate),
+        ScriptedDeployment(('validate', 'format'), validate_script),
+    ]
+    return PipelineOrchestrator(PLAN, *deployments), deployments
+
+
+def test_refine_regenerates_with_feedback_then_caches():
+    """Test that a failed response is regenerated with feedback and only the passing one is cached."""
+    def validate(request, n):
+        if n == 1:
+            return {'judge_score': 0.3, 'validation_passed': False, 'needs_refinement': True,
+                    'refinement_feedback': {'score': 0.3, 'issues': ['Be specific']}}
+        return {'judge_score': 0.9, 'validation_passed': True, 'needs_refinement': False, 'status': 'completed'}
+
+    pipeline, (_, _, generate, validator) = scripted_pipeline(validate)
+    result = asyncio.run(pipeline.process({'ticket_id': 'T1', 'message': 'I want a refund'}))
+
+    assert result['status'] == 'completed' and result['generated_response'] == 'draft 2'
+    assert result['refinement_attempts'] == 1 and result['refinement_outcome'] == 'passed'
+    assert 'refinement_feedback' not in generate.requests[0]
+    assert generate.requests[1]['refinement_feedback'] == {'score': 0.3, 'issues': ['Be specific']}
+    assert len(validator.requests) == 2
+    # Each hop only gets the fields its stages read
+    assert 'knowledge_context' not in validator.requests[0]
+
+    [remembered] = generate.remembered
+    assert remembered['generated_response'] == 'draft 2'
+    assert set(remembered) <= set(ResponseGenerator.REMEMBER_FIELDS)
+
+
+def test_refine_escalates_when_attempts_run_out():
+    """Test that a response that keeps failing is escalated and never cached."""
+    def validate(request, n):
+        return {'judge_score': 0.3, 'validation_passed': False, 'needs_refinement': True,
+                'refinement_feedback': {'score': 0.3, 'issues': []}, 'status': 'completed'}
+
+    pipeline, (_, _, generate, _) = scripted_pipeline(validate)
+    pipeline.max_refinements = 1
+    result = asyncio.run(pipeline.process({'ticket_id': 'T2', 'message': 'I want a refund'}))
+
+    assert result['status'] == 'escalated' and result['escalate']
+    assert result['refinement_outcome'] == 'max_attempts' and len(generate.requests) == 2
+    assert generate.remembered == []
+
+
+def test_process_generates_a_ticket_id_when_missing():
+    """Test that tickets without an id get distinct ids, so admission tracks them apart."""
+    pipeline, _ = scripted_pipeline(lambda request, n: {'validation_passed': True, 'status': 'completed'})
+    first = asyncio.run(pipeline.process({'message': 'I want a refund'}))
+    second = asyncio.run(pipeline.process({'message': 'I want a refund'}))
+    assert first['ticket_id'] and second['ticket_id'] and first['ticket_id'] != second['ticket_id']
+    assert pipeline.admission.snapshot()['in_flight'] == 0
+
+
+class DraftGenerator:
+    """Generator stand-in that answers with the next of a list of drafts."""
+
+    def __init__(self, drafts):
+        self.drafts = list(drafts)
+
+    def generate_batch(self, tickets):
+        for ticket in tickets:
+            ticket['generated_response'] = self.drafts.pop(0) if len(self.drafts) > 1 else self.drafts[0]
+            ticket['response_provenance'] = {'source': 'llm'}
+        return tickets
+
+    def generate_stream(self, ticket):
+        yield from re.findall(r'\S+\s*', self.generate_batch([ticket])[0]['generated_response'])
+
+    def remember_response(self, ticket_data):
+        return False
+
+
+GOOD_DRAFT = 'Thank you for contacting us. We will help you with your refund within 5-7 business days of the return.'
+
+
+class RecordingFormatter(ResponseFormatter):
+    """Formatter that records the drafts it was given."""
+
+    def __init__(self):
+        self.formatted = []
+
+    def format_batch(self, tickets):
+        self.formatted += [ticket.get('generated_response') for ticket in tickets]
+        return super().format_batch(tickets)
+
+
+def drafted_pipeline(drafts, max_refinements=2):
+    """Pipeline over in-process deployments with the default validate+format fusion."""
+    handlers = {
+        'generate': DraftGenerator(drafts), 'validate': ResponseValidator(judge_client=None), 'format': RecordingFormatter()
+    }
+    deployments = [
+        InProcessDeployment(stages, **{stage: handlers[stage] for stage in stages if stage in handlers})
+        for stages in PLAN
+    ]
+    pipeline = PipelineOrchestrator(PLAN, *deployments)
+    pipeline.max_refinements = max_refinements
+    return pipeline, handlers['format']
+
+
+def test_refined_ticket_is_formatted_from_the_accepted_draft():
+    """Test that a fused formatter never formats a draft that validation rejected."""
+    pipeline, formatter = drafted_pipeline(['No.', GOOD_DRAFT])
+    result = asyncio.run(pipeline.process({'ticket_id': 'T5', 'message': 'I need a refund'}))
+
+    assert result['status'] == 'completed' and result['refinement_attempts'] == 1
+    assert formatter.formatted == [GOOD_DRAFT]
+    assert result['generated_response'] == GOOD_DRAFT
+    assert result['formatted_response']['response_text'] == GOOD_DRAFT
+    assert result['formatted_response']['quality_score'] == result['judge_score']
+
+
+def test_escalated_ticket_is_formatted_once_refinement_settles():
+    """Test that a ticket escalated by the refinement loop is formatted with its final state."""
+    pipeline, formatter = drafted_pipeline(['No.'], max_refinements=1)
+    result = asyncio.run(pipeline.process({'ticket_id': 'T6', 'message': 'I need a refund'}))
+
+    assert result['status'] == 'escalated' and result['refinement_outcome'] == 'max_attempts'
+    assert result['formatted_response']['response_text'] == 'No.'
+    # Two rejected rounds are not formatted; the settled ticket is, once
+    assert formatter.formatted == ['No.'] and result['validation_settled']
+
+
+def stream_events(pipeline, request):
+    """(event, data) pairs of a streamed ticket."""
+    async def collect():
+        return [event async for event in pipeline.stream(request)]
+
+    return [
+        (event.split('\n')[0][len('event: '):], json.loads(event.split('\n')[1][len('data: '):]))
+        for event in asyncio.run(collect())
+    ]
+
+
+def test_stream_sends_progress_then_response_chunks():
+    """Test the event sequence of a streamed ticket through in-process deployments."""
+    cache = SemanticResponseCache()
+    deployments = [
+        InProcessDeployment(stages, generate=ResponseGenerator(response_cache=cache, llm_client=None))
+        for stages in PLAN
+    ]
+    pipeline = PipelineOrchestrator(PLAN, *deployments)
+    events = stream_events(pipeline, {'ticket_id': 'T3', 'message': 'I need a refund for my order'})
+
+    names = [name for name, _ in events]
+    assert names[0] == 'admitted' and names[-1] == 'done' and 'retract' not in names
+    assert [data['stage'] for name, data in events if name == 'stage'] == ['classify', 'retrieve', 'generate', 'validate+format']
+
+    done = events[-1][1]
+    assert done['status'] == 'completed'
+    assert ''.join(data['text'] for name, data in events if name == 'response') == done['generated_response']
+    # The text arrives while the generate hop is still running, before its 'stage' event
+    generate_event = next(i for i, (name, data) in enumerate(events) if name == 'stage' and data['stage'] == 'generate')
+    assert max(i for i, name in enumerate(names) if name == 'response') < generate_event
+    assert cache.metrics()['entries'] == 1
+
+
+def test_stream_forwards_model_text_as_it_is_generated():
+    """Test that model output reaches the client piece by piece, before generation finishes."""
+    answer = 'Thank you for contacting us. We will help you with the refund, which takes 5-7 business days to process.'
+    with FakeModelServer(reply=lambda prompt: answer, token_latency_s=0.01) as server:
+        client = LLMClient(server.url)
+        generator = ResponseGenerator(response_cache=SemanticResponseCache(), llm_client=client)
+        pipeline = PipelineOrchestrator(PLAN, *[InProcessDeployment(stages, generate=generator) for stages in PLAN])
+        events = stream_events(pipeline, {'ticket_id': 'T7', 'message': 'I need a refund'})
+        client.close()
+
+    pieces = [data['text'] for name, data in events if name == 'response']
+    done = events[-1][1]
+    assert len(pieces) == len(answer.split()) and ''.join(pieces) == answer == done['generated_response']
+    assert server.requests[0]['stream'] is True
+    assert done['llm_usage']['streamed'] and done['llm_usage']['first_text_s'] < done['llm_usage']['latency_s']
+
+
+def test_stream_retracts_a_draft_that_fails_validation():
+    """Test that a rejected draft is streamed, then retracted before the refined one."""
+    pipeline, _ = drafted_pipeline(['No.', GOOD_DRAFT])
+    events = stream_events(pipeline, {'ticket_id': 'T8', 'message': 'I need a refund'})
+
+    names = [name for name, _ in events]
+    retract = names.index('retract')
+    assert events[retract][1]['attempt'] == 0 and events[retract][1]['reason'] == 'validation_failed'
+    assert [data['text'] for name, data in events[:retract] if name == 'response'] == ['No.']
+    refined = [data for name, data in events[retract:] if name == 'response']
+    assert {data['attempt'] for data in refined} == {1} and ''.join(data['text'] for data in refined) == GOOD_DRAFT
+    assert names.count('retract') == 1 and events[-1][1]['status'] == 'completed'
+
+
+def test_stream_of_a_turned_away_ticket_only_sends_done():
+    """Test that an invalid ticket gets a single 'done' event."""
+    pipeline, _ = scripted_pipeline(lambda request, n: {})
+
+    async def collect():
+        return [event async for event in pipeline.stream({'ticket_id': 'T4', 'message': '  '})]
+
+    [event] = asyncio.run(collect())
+    assert event.startswith('event: done\n') and 'Message cannot be empty' in event
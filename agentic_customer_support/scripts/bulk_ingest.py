@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Script to bulk-ingest historical tickets (JSONL files or directories) into Asya."""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "asya_app"))
+
+from handlers.bulk_ingester import BulkIngester, SqsPublisher  # noqa: E402
+
+
+class DryRunPublisher:
+    """Validates and builds envelopes but publishes nothing."""
+
+    def publish_batch(self, actor, envelopes):
+        pass
+
+    def queue_depth(self, actor):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream JSONL tickets into the first Asya actor's queue")
+    parser.add_argument("paths", nargs="+", help="JSONL files or directories (searched recursively for *.jsonl)")
+    parser.add_argument(
+        "--transport",
+        choices=["sqs", "dry-run"],
+        default="dry-run",
+        help="'sqs' publishes to the actor queues; 'dry-run' only validates and reports"
+    )
+    parser.add_argument(
+        "--queue-url-template",
+        help="SQS queue URL with an {actor} placeholder, e.g. https://sqs.<region>.amazonaws.com/<account>/asya-{actor}"
+    )
+    parser.add_argument("--endpoint-url", help="SQS endpoint override (e.g. LocalStack)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Records validated per chunk")
+    parser.add_argument("--batch-size", type=int, default=100, help="Envelopes per publish call")
+    parser.add_argument("--max-queue-depth", type=int, help="Pause while the first queue holds more messages than this")
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint file for resuming an interrupted run (a dry run starts from it but never updates it)"
+    )
+    parser.add_argument("--limit", type=int, help="Stop after publishing this many tickets")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.transport == "sqs":
+        if not args.queue_url_template:
+            print("Error: --queue-url-template is required for transport 'sqs'", file=sys.stderr)
+            sys.exit(1)
+        publisher = SqsPublisher(args.queue_url_template, endpoint_url=args.endpoint_url)
+    else:
+        publisher = DryRunPublisher()
+        if args.checkpoint:
+            logging.info("Dry run: reading %s but leaving it unchanged", args.checkpoint)
+
+    ingester = BulkIngester(
+        publisher,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        max_queue_depth=args.max_queue_depth,
+        checkpoint_path=args.checkpoint,
+        update_checkpoint=args.transport != "dry-run",
+    )
+    report = ingester.run(args.paths, limit=args.limit)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
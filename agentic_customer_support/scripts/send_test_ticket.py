@@ -4,6 +4,7 @@
 import argparse
 import json
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -25,6 +26,57 @@ def send_to_ray_serve(ticket_data: dict, endpoint: str = "http://localhost:8000/
         sys.exit(1)
 
 
+def stream_from_ray_serve(ticket_data: dict, endpoint: str = "http://localhost:8000/support"):
+    """Send ticket to Ray Serve in streaming mode, printing each event as it arrives with its timing."""
+    started = time.perf_counter()
+    first_byte_s = first_chunk_s = None
+    result = {}
+    event, data_lines = "message", []
+    try:
+        with httpx.stream(
+            "POST", endpoint, json=ticket_data, headers={"Accept": "text/event-stream"}, timeout=30.0
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                elapsed = time.perf_counter() - started
+                if first_byte_s is None:
+                    first_byte_s = elapsed
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
+                elif not line and data_lines:
+                    data = json.loads("\n".join(data_lines))
+                    if event == "response":
+                        first_chunk_s = first_chunk_s if first_chunk_s is not None else elapsed
+                        print(f"[{elapsed * 1000:8.1f} ms] response: {data['text']!r}", file=sys.stderr)
+                    elif event == "retract":
+                        print(
+                            f"[{elapsed * 1000:8.1f} ms] retract: draft {data['attempt']} discarded ({data['reason']})",
+                            file=sys.stderr
+                        )
+                    elif event == "done":
+                        result = data
+                        print(f"[{elapsed * 1000:8.1f} ms] done: {data.get('status')}", file=sys.stderr)
+                    else:
+                        print(f"[{elapsed * 1000:8.1f} ms] {event}: {json.dumps(data)}", file=sys.stderr)
+                    event, data_lines = "message", []
+    except httpx.RequestError as e:
+        print(f"Error connecting to Ray Serve: {e}", file=sys.stderr)
+        sys.exit(1)
+    except httpx.HTTPStatusError as e:
+        print(f"HTTP error from Ray Serve: {e.response.status_code}", file=sys.stderr)
+        sys.exit(1)
+
+    total_s = time.perf_counter() - started
+    timings = [f"first byte {first_byte_s * 1000:.1f} ms" if first_byte_s is not None else "no data"]
+    if first_chunk_s is not None:
+        timings.append(f"first response chunk {first_chunk_s * 1000:.1f} ms")
+    timings.append(f"total {total_s * 1000:.1f} ms")
+    print(f"Stream timing: {', '.join(timings)}", file=sys.stderr)
+    return result
+
+
 def send_to_asya(ticket_data: dict, endpoint: Optional[str] = None):
     """Send ticket to Asya gateway HTTP endpoint."""
     if not endpoint:
@@ -66,6 +118,11 @@ def main():
         "--endpoint",
         help="Endpoint URL (Ray serve HTTP endpoint or Asya gateway URL)",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream progress events and the response as server-sent events, with timings (Ray only)"
+    )
     
     args = parser.parse_args()
     
@@ -80,7 +137,13 @@ def main():
     # Send to appropriate framework
     if args.framework == "ray":
         endpoint = args.endpoint or "http://localhost:8000/support"
-        result = send_to_ray_serve(ticket_data, endpoint)
+        if args.stream:
+            result = stream_from_ray_serve(ticket_data, endpoint)
+        else:
+            result = send_to_ray_serve(ticket_data, endpoint)
+    elif args.stream:
+        print("Error: --stream is only supported for framework 'ray'", file=sys.stderr)
+        sys.exit(1)
     else:
         result = send_to_asya(ticket_data, args.endpoint)
 
@@ -0,0 +1,95 @@
+"""
+Compare envelope codecs on the payload shapes captured in ``selected_logs``.
+
+Usage (from merge_actor_mesh_into_asya/):
+    python -m benchmarks.bench_envelope_codec [--iterations 2000]
+
+Each ``[DIAG] Calling user_func with payload`` / ``user_func returned`` line is
+turned into an envelope using the route seen in the DecisionRouter log, then
+encoded/decoded with every codec. Reports mean encode/decode time and wire size.
+"""
+
+import argparse
+import ast
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from handlers.envelope_codec import BINARY_CODEC, BinaryCodec, JsonCodec, advertise
+
+LOG_DIR = Path(__file__).resolve().parent.parent / "selected_logs"
+PAYLOAD_RE = re.compile(r"\[DIAG\] (?:Calling user_func with payload|user_func returned): (\{.*\})\s*$")
+ROUTE_RE = re.compile(r"DecisionRouter: current=(\d+), actors=(\[.*\])")
+
+
+def load_envelopes(log_dir: Path = LOG_DIR) -> List[Tuple[str, Dict[str, Any]]]:
+    actors: List[str] = []
+    payloads: List[Tuple[str, Dict[str, Any]]] = []
+    for path in sorted(log_dir.glob("*.txt")):
+        for line in path.read_text().splitlines():
+            route_match = ROUTE_RE.search(line)
+            if route_match and not actors:
+                actors = ast.literal_eval(route_match.group(2))
+            payload_match = PAYLOAD_RE.search(line)
+            if payload_match:
+                payloads.append((path.stem, ast.literal_eval(payload_match.group(1))))
+
+    envelopes = []
+    for idx, (source, payload) in enumerate(payloads):
+        envelopes.append(
+            (
+                f"{source}#{idx}",
+                {
+                    "id": f"bench-{idx}",
+                    "payload": payload,
+                    "route": {"actors": actors, "current": 4},
+                    "headers": advertise({}),
+                },
+            )
+        )
+    return envelopes
+
+
+def bench(codec: Any, envelope: Dict[str, Any], iterations: int) -> Tuple[float, float, int]:
+    encoded = codec.encode(envelope)
+    assert codec.decode(encoded) == envelope, f"{codec.name} round-trip mismatch"
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(envelope)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.decode(encoded)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+    return encode_us, decode_us, len(encoded)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threshold", type=int, default=1024, help="Compression threshold for asya-bin (bytes)")
+    args = parser.parse_args()
+
+    codecs = [
+        ("json", JsonCodec()),
+        (BINARY_CODEC, BinaryCodec(compress_threshold=None)),
+        (f"{BINARY_CODEC}+zlib>{args.threshold}", BinaryCodec(compress_threshold=args.threshold)),
+    ]
+    envelopes = load_envelopes()
+    if not envelopes:
+        raise SystemExit(f"No payloads found under {LOG_DIR}")
+
+    print(f"{'envelope':<42} {'codec':<22} {'encode_us':>10} {'decode_us':>10} {'bytes':>7} {'vs_json':>8}")
+    for label, envelope in envelopes:
+        json_size = None
+        for name, codec in codecs:
+            encode_us, decode_us, size = bench(codec, envelope, args.iterations)
+            json_size = json_size or size
+            print(f"{label:<42} {name:<22} {encode_us:>10.1f} {decode_us:>10.1f} {size:>7} {size / json_size:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
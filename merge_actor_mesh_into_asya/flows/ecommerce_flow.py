@@ -4,8 +4,10 @@ import handlers.context_retriever
 import handlers.execution_coordinator
 import handlers.guardrail_validator
 import handlers.intent_analyzer
+import handlers.refinement
 import handlers.response_aggregator
 import handlers.response_generator
+import handlers.route_pruning
 import handlers.sentiment_analyzer
 
 
@@ -20,9 +22,16 @@ def ecommerce_flow(p: dict) -> dict:
 
     p = sentiment.process(p)
     p = intent.process(p)
-    p = context.process(p)
+    # Skip predicates are evaluated right before the hop, so their inputs are final.
+    if not handlers.route_pruning.should_skip("context-retriever", p):
+        p = context.process(p)
     p = responder.process(p)
     p = guardrail.process(p)
-    p = executor.process(p)
+    # Bounded: the guardrail stops asking for regeneration after the attempt limit or near the deadline.
+    while handlers.refinement.should_regenerate(p):
+        p = responder.process(p)
+        p = guardrail.process(p)
+    if not handlers.route_pruning.should_skip("execution-coordinator", p):
+        p = executor.process(p)
     p = aggregator.process(p)
     return p
@@ -0,0 +1,305 @@
+"""
+Claim-check offloading for large payload fields.
+
+Top-level payload fields whose encoded size exceeds a threshold (long customer
+messages, full order histories from ContextRetriever, generated responses) are
+written to an object store and replaced in the envelope by a small reference::
+
+    {"$claim_check": {"key": "<prefix>/<sha256>", "size": 48213, "codec": "asya-bin"}}
+
+Handlers decorated with ``@claim_checked`` receive a ``LazyPayload``: a reference
+is only downloaded when the handler actually reads that field, so an actor that
+never touches ``context`` never fetches it, and ``{**payload, ...}`` forwards
+unread references untouched. On the way out, large fields are offloaded again;
+content addressing means unchanged values are not re-uploaded. The terminal
+actor (``@claim_checked(terminal=True)``) instead rehydrates every reference, so
+nothing leaves the pipeline as a ``$claim_check`` ref. Flow router predicates
+read the payload through ``lazy_view``.
+
+Configuration (unset ``ASYA_CLAIM_CHECK_URL`` disables the layer entirely):
+
+- ``ASYA_CLAIM_CHECK_URL``: ``file:///var/lib/claims`` or ``s3://bucket/prefix``
+- ``ASYA_CLAIM_CHECK_THRESHOLD``: size in bytes above which fields are offloaded
+- ``ASYA_CLAIM_CHECK_ENDPOINT``: S3 endpoint for MinIO/LocalStack stand-ins
+"""
+
+import functools
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from .envelope_codec import BinaryCodec, decode_envelope
+
+logging.basicConfig(level=logging.INFO)
+
+REF_KEY = "$claim_check"
+DEFAULT_THRESHOLD = 16 * 1024
+
+
+class LocalFileStore:
+    """Filesystem-backed object store; useful for tests and single-node runs."""
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Claim-check key escapes store root: {key}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if path.exists():
+            return  # content-addressed: same key, same bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+
+class S3Store:
+    """S3-compatible object store (AWS S3, MinIO, LocalStack)."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, client: Any = None) -> None:
+        if client is None:
+            try:
+                import boto3
+            except ImportError as exc:  # pragma: no cover - depends on image
+                raise ImportError("S3Store requires boto3; install it or use a file:// claim-check URL") from exc
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def store_from_url(url: str, endpoint_url: Optional[str] = None) -> Any:
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return LocalFileStore(parsed.path)
+    if parsed.scheme == "s3":
+        return S3Store(parsed.netloc, parsed.path, endpoint_url=endpoint_url)
+    raise ValueError(f"Unsupported claim-check store URL: {url}")
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and REF_KEY in value
+
+
+class ClaimCheck:
+    def __init__(
+        self,
+        store: Any,
+        threshold: int = DEFAULT_THRESHOLD,
+        fields: Optional[Iterable[str]] = None,
+        key_prefix: str = "claims",
+    ) -> None:
+        """
+        Args:
+            store: Object store with ``put``/``get``/``delete``
+            threshold: Encoded size in bytes above which a field is offloaded
+            fields: Restrict offloading to these top-level keys (default: any)
+            key_prefix: Prefix for object keys
+        """
+        self.store = store
+        self.threshold = int(threshold)
+        self.fields = set(fields) if fields is not None else None
+        self.key_prefix = key_prefix.strip("/")
+        # Compression is applied per blob; the threshold already selected big values.
+        self.codec = BinaryCodec(compress_threshold=0)
+        self.stats: Dict[str, int] = {"offloaded": 0, "reused": 0, "resolved": 0, "bytes_offloaded": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ClaimCheck"]:
+        url = os.getenv("ASYA_CLAIM_CHECK_URL")
+        if not url:
+            return None
+        store = store_from_url(url, endpoint_url=os.getenv("ASYA_CLAIM_CHECK_ENDPOINT"))
+        threshold = int(os.getenv("ASYA_CLAIM_CHECK_THRESHOLD", DEFAULT_THRESHOLD))
+        return cls(store, threshold=threshold)
+
+    def offload(self, payload: Dict[str, Any], known_refs: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Return a plain dict with large fields replaced by references.
+
+        ``known_refs`` are the references the message arrived with; a field whose
+        content hash still matches is re-referenced without another upload.
+        """
+        known = dict(known_refs or {})
+        if isinstance(payload, LazyPayload):
+            known.update(payload.known_refs())
+        result: Dict[str, Any] = {}
+        for field, value in dict.items(payload):
+            if is_ref(value) or (self.fields is not None and field not in self.fields):
+                result[field] = value
+                continue
+            data = self.codec.encode(value)
+            if len(data) <= self.threshold:
+                result[field] = value
+                continue
+            key = f"{self.key_prefix}/{hashlib.sha256(data).hexdigest()}"
+            previous = known.get(field)
+            if previous and previous[REF_KEY]["key"] == key:
+                self.stats["reused"] += 1
+            else:
+                self.store.put(key, data)
+                self.stats["offloaded"] += 1
+                self.stats["bytes_offloaded"] += len(data)
+            result[field] = {REF_KEY: {"key": key, "size": len(data), "codec": self.codec.name}}
+        return result
+
+    def resolve(self, ref: Dict[str, Any]) -> Any:
+        self.stats["resolved"] += 1
+        return decode_envelope(self.store.get(ref[REF_KEY]["key"]))
+
+    def rehydrate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a plain dict with every reference replaced by its value."""
+        return {field: self.resolve(value) if is_ref(value) else value for field, value in dict.items(payload)}
+
+    def wrap(self, payload: Dict[str, Any]) -> "LazyPayload":
+        return LazyPayload(payload, self)
+
+
+class LazyPayload(dict):
+    """
+    Dict that downloads claim-checked fields on first read.
+
+    Unread references stay as-is in the underlying storage, so dict copies and
+    ``{**payload}`` (which bypass ``__getitem__``) forward them without I/O.
+    """
+
+    def __init__(self, payload: Dict[str, Any], claim_check: ClaimCheck) -> None:
+        super().__init__(payload)
+        self._claim_check = claim_check
+        self._refs: Dict[str, Dict[str, Any]] = {}
+
+    def _resolve(self, key: Any, value: Any) -> Any:
+        if not is_ref(value):
+            return value
+        resolved = self._claim_check.resolve(value)
+        self._refs[key] = value
+        dict.__setitem__(self, key, resolved)
+        return resolved
+
+    def known_refs(self) -> Dict[str, Dict[str, Any]]:
+        """References this payload arrived with, by field (resolved or not)."""
+        refs = {key: value for key, value in dict.items(self) if is_ref(value)}
+        refs.update(self._refs)
+        return refs
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            return default
+        return self[key]
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = self[key]
+        dict.__delitem__(self, key)
+        return value
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def values(self):  # type: ignore[override]
+        return [self[key] for key in self]
+
+    def items(self):  # type: ignore[override]
+        return [(key, self[key]) for key in self]
+
+
+_DEFAULT_SENTINEL = object()
+_default_claim_check: Any = _DEFAULT_SENTINEL
+
+
+def default_claim_check() -> Optional[ClaimCheck]:
+    global _default_claim_check
+    if _default_claim_check is _DEFAULT_SENTINEL:
+        _default_claim_check = ClaimCheck.from_env()
+        if _default_claim_check is not None:
+            logging.info(
+                "Claim-check enabled (store=%s, threshold=%d bytes)",
+                type(_default_claim_check.store).__name__,
+                _default_claim_check.threshold,
+            )
+    return _default_claim_check
+
+
+def lazy_view(payload: Any) -> Any:
+    """
+    The payload with references resolved on read, for code outside a decorated
+    handler (e.g. Flow router predicates). Returns ``payload`` itself when the
+    layer is disabled or it is already lazy.
+    """
+    claim_check = default_claim_check()
+    if claim_check is None or not isinstance(payload, dict) or isinstance(payload, LazyPayload):
+        return payload
+    return claim_check.wrap(payload)
+
+
+def claim_checked(
+    method: Optional[Callable] = None, *, envelope_mode: bool = False, terminal: bool = False
+) -> Callable:
+    """
+    Decorate a handler ``process`` method with lazy claim-check resolution.
+
+    A no-op when ``ASYA_CLAIM_CHECK_URL`` is unset. Use ``envelope_mode=True``
+    for routers that receive the whole envelope, and ``terminal=True`` for the
+    last actor, whose output is rehydrated instead of offloaded.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self: Any, message: Dict[str, Any]) -> Any:
+            claim_check = default_claim_check()
+            if claim_check is None:
+                return func(self, message)
+
+            if envelope_mode:
+                wrapped = claim_check.wrap(message.get("payload") or {})
+                message["payload"] = wrapped
+                result = func(self, message)
+                if isinstance(result, dict) and isinstance(result.get("payload"), dict):
+                    result["payload"] = claim_check.offload(result["payload"], wrapped.known_refs())
+                return result
+
+            wrapped = claim_check.wrap(message)
+            result = func(self, wrapped)
+            if not isinstance(result, dict):
+                return result
+            if terminal:
+                return claim_check.rehydrate(result)
+            return claim_check.offload(result, wrapped.known_refs())
+
+        return wrapper
+
+    return decorator(method) if method is not None else decorator
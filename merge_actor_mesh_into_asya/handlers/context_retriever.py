@@ -4,21 +4,42 @@ Asya-compatible ContextRetriever in payload mode.
 Simulates the Actor Mesh context enrichment step with local in-memory data.
 Fetches customer, order, and tracking details (when available) and appends a
 ``context`` object to the payload for downstream actors.
+
+Recent lookups are kept in a small TTL cache. When the message's deadline
+budget drops below ``CONTEXT_CACHE_ONLY_BELOW_S`` the retriever answers from
+that cache only and marks the context ``degraded`` on a miss rather than
+calling the backing services.
 """
 
 import logging
+import os
 import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from .claim_check import claim_checked
+from .deadline import shed_expired, short_on_time
 
 logging.basicConfig(level=logging.INFO)
 
 
 class ContextRetriever:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("context",)
+    # Payload fields read by should_skip()
+    SKIP_READS = ("customer_email", "customer_message", "intent")
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
 
+        self.cache_only_below_s = float(os.getenv("CONTEXT_CACHE_ONLY_BELOW_S", "1.0"))
+        self.cache_ttl_s = float(os.getenv("CONTEXT_CACHE_TTL_S", "300"))
+        self.cache_size = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+        self._cache: "OrderedDict[Tuple[str, Optional[str]], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
         # Mock data representing our "APIs"
         self.customers: Dict[str, Dict[str, Any]] = {
             "user@example.com": {
@@ -62,12 +83,18 @@ class ContextRetriever:
             }
         }
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Attach mock context data to the payload."""
         try:
             customer_email = str(payload.get("customer_email") or "").lower()
             intent = payload.get("intent") or {}
 
+            if short_on_time(payload, self.cache_only_below_s):
+                order_number = self._extract_order_number(intent, payload)
+                return {**payload, "context": self._cached_context(customer_email, order_number)}
+
             customer_data = self._get_customer(customer_email)
             order_number = self._extract_order_number(intent, payload)
             order_data = self._get_order(order_number, customer_data)
@@ -92,6 +119,7 @@ class ContextRetriever:
                 missing.append("tracking")
             if missing:
                 context["missing"] = missing
+            self._remember((customer_email, order_number), context)
 
             self.logger.info(
                 "Context retrieved: customer=%s order=%s tracking=%s",
@@ -111,6 +139,33 @@ class ContextRetriever:
             }
             return {**payload, "context": fallback}
 
+    def should_skip(self, payload: Dict[str, Any]) -> bool:
+        """Nothing to look up without a customer email or an order number."""
+        customer_email = str(payload.get("customer_email") or "").strip()
+        return not customer_email and not self._extract_order_number(payload.get("intent") or {}, payload)
+
+    def _cached_context(self, customer_email: str, order_number: Optional[str]) -> Dict[str, Any]:
+        """Deadline-constrained lookup: serve from the cache, never the services."""
+        entry = self._cache.get((customer_email, order_number))
+        if entry is not None and time.monotonic() - entry[0] <= self.cache_ttl_s:
+            self.logger.info("Context served from cache (deadline budget low)")
+            return {**entry[1], "source": "cache"}
+
+        self.logger.info("Context cache miss with low deadline budget; skipping lookups")
+        return {
+            "source": "cache_miss",
+            "degraded": "deadline",
+            "retrieved_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def _remember(self, key: Tuple[str, Optional[str]], context: Dict[str, Any]) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = (time.monotonic(), context)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
     def _get_customer(self, email: str) -> Dict[str, Any]:
         """Return customer record or a minimal stub."""
         if not email:
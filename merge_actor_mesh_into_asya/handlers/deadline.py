@@ -0,0 +1,139 @@
+"""
+End-to-end deadline propagation for the ecommerce flow.
+
+The flow entrypoint (``handlers.flow_entry``) stamps an absolute deadline in
+epoch seconds into ``payload["metadata"]["deadline_at"]`` and mirrors it into
+``headers["deadline_at"]``. Payload-mode actors only see the payload, so the
+payload copy is the one actors read; the header copy is for routers, sidecar
+logs and tracing.
+
+Actors use ``remaining_s`` / ``short_on_time`` to pick a cheaper mode when the
+budget is nearly spent, and ``@shed_expired`` skips the work for messages whose
+deadline has already passed: the ticket is marked ``deadline_expired`` and
+escalated, and goes on to ResponseAggregator, which reports it as escalated so
+a human picks it up. Messages without a deadline are never degraded or shed.
+
+Configuration:
+
+- ``ASYA_DEADLINE_BUDGET_S``: end-to-end budget stamped at the entrypoint (default 5s)
+"""
+
+import functools
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+DEADLINE_KEY = "deadline_at"
+EXPIRED_KEY = "deadline_expired"
+DEFAULT_BUDGET_S = 5.0
+RESPONSE_AGGREGATOR = "response-aggregator"
+
+
+def budget_from_env() -> float:
+    return float(os.getenv("ASYA_DEADLINE_BUDGET_S", DEFAULT_BUDGET_S))
+
+
+def stamp(payload: Dict[str, Any], budget_s: Optional[float] = None, now: Optional[float] = None) -> float:
+    """
+    Set ``payload["metadata"]["deadline_at"]`` unless a caller already did.
+
+    Returns the effective deadline.
+    """
+    metadata = payload.setdefault("metadata", {})
+    existing = _as_float(metadata.get(DEADLINE_KEY))
+    if existing is not None:
+        return existing
+    deadline = (time.time() if now is None else now) + (budget_from_env() if budget_s is None else budget_s)
+    metadata[DEADLINE_KEY] = deadline
+    return deadline
+
+
+def deadline_of(payload: Dict[str, Any], headers: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    metadata = payload.get("metadata")
+    deadline = _as_float(metadata.get(DEADLINE_KEY)) if isinstance(metadata, dict) else None
+    if deadline is None and headers:
+        deadline = _as_float(headers.get(DEADLINE_KEY))
+    return deadline
+
+
+def remaining_s(payload: Dict[str, Any], headers: Optional[Dict[str, Any]] = None, now: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline, or ``None`` when no deadline is set."""
+    deadline = deadline_of(payload, headers)
+    if deadline is None:
+        return None
+    return deadline - (time.time() if now is None else now)
+
+
+def short_on_time(payload: Dict[str, Any], needed_s: float, headers: Optional[Dict[str, Any]] = None) -> bool:
+    remaining = remaining_s(payload, headers)
+    return remaining is not None and remaining < needed_s
+
+
+def expired(payload: Dict[str, Any], headers: Optional[Dict[str, Any]] = None) -> bool:
+    remaining = remaining_s(payload, headers)
+    return remaining is not None and remaining <= 0
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def mark_expired(payload: Dict[str, Any], actor: str, late_s: float) -> None:
+    """Record where the ticket expired and flag it for escalation."""
+    payload[EXPIRED_KEY] = {"actor": actor, "late_s": round(late_s, 4)}
+    payload["escalated"] = True
+    reasons = list(payload.get("escalation_reasons") or [])
+    if "deadline_expired" not in reasons:
+        reasons.append("deadline_expired")
+    payload["escalation_reasons"] = reasons
+
+
+def shed_expired(method: Optional[Callable] = None, *, envelope_mode: bool = False) -> Callable:
+    """
+    Decorate a handler ``process`` method to skip its work past the deadline.
+
+    The message is marked expired and escalated (see ``mark_expired``) and
+    passed on unchanged otherwise; later actors pass it through as well. Use
+    ``envelope_mode=True`` for routers that receive the whole envelope; they
+    re-route the message straight to the ResponseAggregator.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self: Any, message: Dict[str, Any]) -> Any:
+            if envelope_mode:
+                payload, headers = message.get("payload") or {}, message.get("headers")
+            else:
+                payload, headers = message, None
+            if payload.get(EXPIRED_KEY):
+                shed = True
+            else:
+                remaining = remaining_s(payload, headers)
+                shed = remaining is not None and remaining <= 0
+                if shed:
+                    logging.warning(
+                        "Shedding expired message in %s (%.3fs past deadline); escalating",
+                        type(self).__name__,
+                        -remaining,
+                    )
+                    mark_expired(payload, type(self).__name__, -remaining)
+            if not shed:
+                return func(self, message)
+            if envelope_mode:
+                message["payload"] = payload
+                route = message.get("route") or {}
+                current = int(route.get("current", 0))
+                route["actors"] = (route.get("actors") or [])[: current + 1] + [RESPONSE_AGGREGATOR]
+            return message
+
+        return wrapper
+
+    return decorator(method) if method is not None else decorator
@@ -3,12 +3,29 @@ Asya-compatible DecisionRouter.
 
 Translates the actor-mesh decision routing logic to envelope mode handlers:
 - Reads envelope["payload"] enrichments
+- Evaluates the ``decision_router`` rules from ``routing_rules.json``
 - Mutates envelope["route"]["actors"] (future steps only)
+- Prunes future actors whose skip predicate holds (see ``route_pruning``)
 - Advances route["current"] so the sidecar sends to the next actor
+
+Optional load-aware mode (``LOAD_AWARE_ROUTING=true``) also consults recent
+per-actor service time and queue depth from ``ASYA_LOAD_METRICS_PATH``. When an
+upcoming actor is overloaded, low-priority high-confidence tickets take a
+cheaper path: decisions marked ``degrade_when_overloaded`` in the rules are
+dropped and, if ``LIGHT_RESPONSE_GENERATOR`` names a lighter generator actor,
+it replaces the regular generator. Applied degradations are recorded in
+``headers["degradation"]``.
 """
 
 import logging
-from typing import Any, Dict, List, Optional
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .claim_check import claim_checked
+from .deadline import shed_expired
+from .load_metrics import ActorLoadFeed
+from .route_pruning import prune_route
+from .rule_engine import DecisionTable, RoutePlanner, load_rules
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,61 +38,111 @@ class DecisionRouter:
     EXECUTION_COORDINATOR = "execution-coordinator"
     CONTEXT_RETRIEVER = "context-retriever"
 
-    def __init__(self) -> None:
-        # Explicit no-arg init so the Asya runtime can instantiate the class handler
-        pass
+    # Log route-plan cache stats every N plan lookups (envelopes where a decision fired)
+    PLAN_STATS_EVERY = 1000
 
+    def __init__(self) -> None:
+        # Explicit no-arg init so the Asya runtime can instantiate the class handler.
+        # Rules are compiled once here; per-message cost is one lookup per feature.
+        self.table = DecisionTable(load_rules()["decision_router"], self._features())
+        self.planner = RoutePlanner(max_size=int(os.getenv("ROUTE_PLAN_CACHE_SIZE", "1024")))
+
+        self.load_feed: Optional[ActorLoadFeed] = None
+        if os.getenv("LOAD_AWARE_ROUTING", "false").lower() == "true":
+            self.load_feed = ActorLoadFeed(
+                os.getenv("ASYA_LOAD_METRICS_PATH", "/var/run/asya/load-metrics.json"),
+                recover_ratio=float(os.getenv("LOAD_AWARE_RECOVER_RATIO", "0.8")),
+            )
+        self.max_wait_s = float(os.getenv("LOAD_AWARE_MAX_WAIT_S", "2.0"))
+        self.min_confidence = float(os.getenv("LOAD_AWARE_MIN_CONFIDENCE", "0.8"))
+        self.light_generator = os.getenv("LIGHT_RESPONSE_GENERATOR") or None
+
+    @shed_expired(envelope_mode=True)
+    @claim_checked(envelope_mode=True)
     def process(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
         payload = envelope["payload"]
         route = envelope["route"]
         current = route["current"]
 
-        sentiment = payload.get("sentiment") or {}
-        intent = payload.get("intent") or {}
-        context = payload.get("context") or {}
-
         logging.info("DecisionRouter: current=%s, actors=%s", current, route.get("actors"))
-        self._make_routing_decisions(route, current, sentiment, intent, context)
+        self._make_routing_decisions(route, current, payload, envelope)
+        pruned = prune_route(route, payload, current)
+        if pruned:
+            headers = envelope.setdefault("headers", {})
+            headers["pruned_actors"] = list(headers.get("pruned_actors") or []) + pruned
         self._advance_route_pointer(route, current)
         logging.info("DecisionRouter: advanced to current=%s, actors=%s", route.get("current"), route.get("actors"))
         return envelope
 
     def _make_routing_decisions(
-        self,
-        route: Dict[str, Any],
-        current: int,
-        sentiment: Dict[str, Any],
-        intent: Dict[str, Any],
-        context: Dict[str, Any],
+        self, route: Dict[str, Any], current: int, payload: Dict[str, Any], envelope: Dict[str, Any]
     ) -> Dict[str, Any]:
-        changes: Dict[str, Any] = {}
-
-        if self._should_escalate_immediately(sentiment, intent, context):
-            changes["immediate_escalation"] = True
-            self._override_future(route, current, [self.ESCALATION_ROUTER, self.RESPONSE_AGGREGATOR])
-            logging.info("Immediate escalation triggered; rerouting to escalation flow.")
-            return changes
-
-        if self._needs_priority_processing(sentiment, intent):
-            changes["priority_processing"] = True
-            self._insert_priority_steps(route, current)
-
-        if self._needs_action_execution(intent, context):
-            changes["action_execution"] = True
-            self._ensure_execution_coordinator(route, current)
-
-        if self._has_low_confidence(intent):
-            changes["low_confidence"] = True
-            self._add_human_review(route, current)
-
-        if self._is_complex_query(intent, context):
-            changes["complex_processing"] = True
-            self._add_enhanced_processing(route, current)
-
-        if changes:
+        decisions = self.table.evaluate(payload)
+        if decisions and decisions[0].get("terminal"):
+            decisions = decisions[:1]
+
+        degradation: Dict[str, Any] = {}
+        if self.load_feed is not None and not (decisions and decisions[0].get("terminal")):
+            decisions, degradation = self._degrade_under_load(route, current, payload, decisions)
+        changes: Dict[str, Any] = {decision["name"]: True for decision in decisions}
+
+        if decisions:
+            route["actors"] = self.planner.plan(route["actors"], current, decisions)
+            if "immediate_escalation" in changes:
+                logging.info("Immediate escalation triggered; rerouting to escalation flow.")
             logging.info("Applied routing changes: %s", changes)
+            lookups = self.planner.hits + self.planner.misses
+            if lookups % self.PLAN_STATS_EVERY == 0:
+                logging.info("DecisionRouter route-plan cache: %s", self.planner.stats())
+
+        if degradation:
+            if "light_generator" in degradation["applied"]:
+                route["actors"] = route["actors"][: current + 1] + [
+                    self.light_generator if actor == self.RESPONSE_GENERATOR else actor
+                    for actor in route["actors"][current + 1 :]
+                ]
+            envelope.setdefault("headers", {})["degradation"] = degradation
+            logging.info("Load-aware degradation applied: %s", degradation)
+
         return changes
 
+    def _degrade_under_load(
+        self, route: Dict[str, Any], current: int, payload: Dict[str, Any], decisions: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Pick a cheaper path for low-priority, high-confidence tickets when upcoming actors are overloaded."""
+        urgency = self._get_urgency_level(payload.get("sentiment") or {})
+        try:
+            confidence = float((payload.get("intent") or {}).get("confidence", 0.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        if urgency in {"high", "critical"} or confidence < self.min_confidence:
+            return decisions, {}
+
+        upcoming = list(route.get("actors") or [])[current + 1 :]
+        upcoming += [decision["edit"]["actor"] for decision in decisions if (decision.get("edit") or {}).get("actor")]
+        overloaded = self.load_feed.overloaded(upcoming, self.max_wait_s)
+        if not overloaded:
+            return decisions, {}
+
+        applied: List[str] = []
+        kept: List[Dict[str, Any]] = []
+        for decision in decisions:
+            if decision.get("degrade_when_overloaded") in overloaded:
+                applied.append(f"skip_{decision['name']}")
+            else:
+                kept.append(decision)
+        if self.light_generator and self.RESPONSE_GENERATOR in overloaded:
+            applied.append("light_generator")
+        if not applied:
+            return decisions, {}
+
+        return kept, {
+            "mode": "load_aware",
+            "overloaded": overloaded,
+            "estimated_wait_s": {actor: round(self.load_feed.estimated_wait_s(actor), 3) for actor in overloaded},
+            "applied": applied,
+        }
+
     def _advance_route_pointer(self, route: Dict[str, Any], current: int) -> None:
         """Move the pointer to the next actor so the runtime forwards correctly."""
         if route.get("actors"):
@@ -83,95 +150,27 @@ class DecisionRouter:
         else:
             route["current"] = current + 1
 
-    def _should_escalate_immediately(
-        self, sentiment: Dict[str, Any], intent: Dict[str, Any], context: Dict[str, Any]
-    ) -> bool:
-        urgency_level = self._get_urgency_level(sentiment)
-        sentiment_label, sentiment_intensity = self._get_sentiment_label_and_intensity(sentiment)
-
-        if urgency_level == "critical":
-            return True
-        if sentiment_label == "negative" and sentiment_intensity > 0.8:
-            return True
-
-        intent_type = intent.get("intent", "")
-        if intent_type in {"legal_threat", "formal_complaint", "regulatory_complaint"}:
-            return True
-
-        customer_tier = (context.get("customer") or {}).get("tier", "")
-        if customer_tier == "VIP" and urgency_level in {"high", "critical"}:
-            return True
-
-        return False
-
-    def _needs_priority_processing(self, sentiment: Dict[str, Any], intent: Dict[str, Any]) -> bool:
-        if self._get_urgency_level(sentiment) == "high":
-            return True
-        intent_type = intent.get("intent", "")
-        return intent_type in {"billing_inquiry", "refund_request", "payment_issue"}
-
-    def _needs_action_execution(self, intent: Dict[str, Any], context: Dict[str, Any]) -> bool:
-        intent_type = intent.get("intent", "")
-        actionable_intents = {
-            "refund_request",
-            "order_modification",
-            "shipping_change",
-            "billing_update",
-            "account_update",
-            "order_cancellation",
-        }
-        return intent_type in actionable_intents
-
-    def _has_low_confidence(self, intent: Dict[str, Any]) -> bool:
-        return float(intent.get("confidence", 1.0)) < 0.6
-
-    def _is_complex_query(self, intent: Dict[str, Any], context: Dict[str, Any]) -> bool:
-        intent_type = intent.get("intent", "")
-        complex_intents = {"technical_support", "product_compatibility", "bulk_order"}
-        orders = context.get("orders") or []
-        if len(orders) > 5:
-            return True
-        return intent_type in complex_intents
-
-    def _override_future(self, route: Dict[str, Any], current: int, new_tail: List[str]) -> None:
-        prefix = route["actors"][: current + 1]
-        route["actors"] = prefix + new_tail
-
-    def _insert_priority_steps(self, route: Dict[str, Any], current: int) -> None:
-        next_steps = route["actors"][current + 1 :]
-        if self.RESPONSE_GENERATOR not in next_steps[:2]:
-            route["actors"].insert(current + 1, self.RESPONSE_GENERATOR)
-
-    def _ensure_execution_coordinator(self, route: Dict[str, Any], current: int) -> None:
-        actors = route["actors"]
-        if self.EXECUTION_COORDINATOR in actors:
-            return
-        response_idx = self._find_step_index(actors, self.RESPONSE_GENERATOR)
-        if response_idx is not None and response_idx > current:
-            actors.insert(response_idx, self.EXECUTION_COORDINATOR)
-        else:
-            actors.append(self.EXECUTION_COORDINATOR)
-
-    def _add_human_review(self, route: Dict[str, Any], current: int) -> None:
-        actors = route["actors"]
-        if self.ESCALATION_ROUTER in actors:
-            return
-        aggregator_idx = self._find_step_index(actors, self.RESPONSE_AGGREGATOR)
-        if aggregator_idx is not None and aggregator_idx > current:
-            actors.insert(aggregator_idx, self.ESCALATION_ROUTER)
-        else:
-            actors.append(self.ESCALATION_ROUTER)
+    def _features(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Feature extractors referenced by the ``decision_router`` rules."""
 
-    def _add_enhanced_processing(self, route: Dict[str, Any], current: int) -> None:
-        remaining_steps = route["actors"][current + 1 :]
-        if self.CONTEXT_RETRIEVER not in remaining_steps:
-            route["actors"].insert(current + 1, self.CONTEXT_RETRIEVER)
+        def sentiment(payload: Dict[str, Any]) -> Dict[str, Any]:
+            return payload.get("sentiment") or {}
 
-    def _find_step_index(self, steps: List[str], step_name: str) -> Optional[int]:
-        try:
-            return steps.index(step_name)
-        except ValueError:
-            return None
+        def intent(payload: Dict[str, Any]) -> Dict[str, Any]:
+            return payload.get("intent") or {}
+
+        def context(payload: Dict[str, Any]) -> Dict[str, Any]:
+            return payload.get("context") or {}
+
+        return {
+            "urgency": lambda p: self._get_urgency_level(sentiment(p)),
+            "sentiment_label": lambda p: self._get_sentiment_label_and_intensity(sentiment(p))[0],
+            "sentiment_intensity": lambda p: self._get_sentiment_label_and_intensity(sentiment(p))[1],
+            "intent": lambda p: intent(p).get("intent", ""),
+            "confidence": lambda p: float(intent(p).get("confidence", 1.0)),
+            "customer_tier": lambda p: (context(p).get("customer") or {}).get("tier", ""),
+            "order_count": lambda p: len(context(p).get("orders") or []),
+        }
 
     def _get_urgency_level(self, sentiment: Dict[str, Any]) -> str:
         urgency = sentiment.get("urgency")
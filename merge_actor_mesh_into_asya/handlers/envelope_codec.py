@@ -0,0 +1,341 @@
+"""
+Pluggable wire codecs for Asya envelopes.
+
+Envelopes are plain dicts shaped like ``{"id", "payload", "route", "headers"}``
+(see ``docs/implementation.md``). JSON stays the interoperable default; the
+``asya-bin`` codec is a compact tagged binary encoding that replaces the known
+envelope/payload keys (and a handful of common values) with one-byte schema
+hints and optionally zlib-compresses bodies above a size threshold.
+
+Version negotiation happens through ``headers["codec"]``: senders advertise the
+versions they can decode and receivers pick the highest common one, falling
+back to JSON so mixed fleets keep interoperating while images roll out.
+"""
+
+import json
+import logging
+import struct
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+CODEC_HEADER = "codec"
+JSON_CODEC = "json"
+BINARY_CODEC = "asya-bin"
+
+MAGIC = b"\xa5\x1a"
+FLAG_COMPRESSED = 0x01
+
+# Schema hints per binary version. Tables are append-only between versions and
+# frozen once released: a decoder must see exactly the table the encoder used.
+_SCHEMA_V1: Tuple[str, ...] = (
+    # envelope
+    "id", "payload", "route", "headers", "actors", "current",
+    # payload inputs and enrichments
+    "customer_message", "customer_email", "sentiment", "intent", "context",
+    "response", "action_plan", "guardrail_check", "execution_result",
+    "final_response", "escalated", "escalation_reasons", "recovery_log",
+    # sentiment
+    "label", "confidence", "score", "keywords", "urgency", "level",
+    "is_complaint", "escalation_needed", "keywords_detected",
+    "sentiment_keywords", "urgency_keywords", "complaint_keywords",
+    "escalation_keywords", "analysis_method", "processed_at", "model_info",
+    "analyzer_type", "version", "compatible_with",
+    # intent
+    "entities", "order_number", "tracking_id", "email", "matched_keywords",
+    "detected_at",
+    # context
+    "customer", "order", "orders", "tracking", "source", "retrieved_at",
+    "missing", "name", "tier", "order_id", "customer_id", "items", "status",
+    "expected_delivery", "location",
+    # response / plan / execution
+    "text", "tone", "generated_at", "metadata", "action_items", "action",
+    "detail", "created_at", "results", "executed_at",
+    # guardrail / aggregation
+    "pass", "issues", "validated_at", "recommended_action", "type", "message",
+    "severity", "pattern", "guardrail", "execution", "completed_at", "error",
+    # common values
+    "rule_based", "mock_data", "all_platforms", "1.0.0", "pending",
+    "completed", "partial", "resolved", "needs_review", "deliver",
+    "regenerate", "positive", "negative", "neutral", "low", "medium", "high",
+    "critical", "premium", "VIP", "shipped", "processing", "in_transit",
+    "empathetic", "professional", "concise", "cheerful",
+    "sentiment-analyzer", "intent-analyzer", "context-retriever",
+    "decision-router", "response-generator", "guardrail-validator",
+    "execution-coordinator", "response-aggregator", "escalation-router",
+    "start-ecommerce-flow",
+)
+
+SCHEMAS: Dict[int, Tuple[str, ...]] = {1: _SCHEMA_V1}
+SUPPORTED_VERSIONS: Tuple[int, ...] = tuple(sorted(SCHEMAS))
+
+# Type tags
+_T_NONE = 0x00
+_T_FALSE = 0x01
+_T_TRUE = 0x02
+_T_INT = 0x03
+_T_FLOAT = 0x04
+_T_STR = 0x05
+_T_HINT = 0x06
+_T_LIST = 0x07
+_T_DICT = 0x08
+_T_BYTES = 0x09
+# Short strings carry their byte length in the tag (0x40-0x7f) and the first
+# 128 schema hints are a single byte (0x80-0xff).
+_T_SHORT_STR = 0x40
+_T_INLINE_HINT = 0x80
+
+_pack_double = struct.Struct(">d").pack
+_unpack_double = struct.Struct(">d").unpack_from
+
+
+class CodecError(ValueError):
+    """Raised when a frame cannot be decoded."""
+
+
+class JsonCodec:
+    name = JSON_CODEC
+    version = 0
+
+    def encode(self, envelope: Dict[str, Any]) -> bytes:
+        return json.dumps(envelope, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        try:
+            return json.loads(data)
+        except ValueError as exc:  # includes JSONDecodeError and UnicodeDecodeError
+            raise CodecError(f"Corrupt {JSON_CODEC} frame: {exc}") from exc
+
+
+class BinaryCodec:
+    """Tagged binary codec with schema hints and threshold-based compression."""
+
+    name = BINARY_CODEC
+
+    def __init__(self, version: int = SUPPORTED_VERSIONS[-1], compress_threshold: Optional[int] = 1024, compress_level: int = 1) -> None:
+        if version not in SCHEMAS:
+            raise ValueError(f"Unsupported {BINARY_CODEC} version: {version}")
+        self.version = version
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self._hints: Tuple[str, ...] = SCHEMAS[version]
+        self._hint_index: Dict[str, int] = {value: idx for idx, value in enumerate(self._hints)}
+
+    # --- encoding ---
+    def encode(self, envelope: Dict[str, Any]) -> bytes:
+        body = bytearray()
+        self._write(envelope, body)
+        flags = 0
+        if self.compress_threshold is not None and len(body) > self.compress_threshold:
+            compressed = zlib.compress(bytes(body), self.compress_level)
+            if len(compressed) < len(body):
+                body = bytearray(compressed)
+                flags |= FLAG_COMPRESSED
+        return MAGIC + bytes((self.version, flags)) + bytes(body)
+
+    def _write(self, value: Any, out: bytearray) -> None:
+        # bool must be tested before int (bool is an int subclass)
+        if value is None:
+            out.append(_T_NONE)
+        elif value is True:
+            out.append(_T_TRUE)
+        elif value is False:
+            out.append(_T_FALSE)
+        elif isinstance(value, str):
+            idx = self._hint_index.get(value)
+            if idx is None:
+                raw = value.encode("utf-8")
+                if len(raw) < _T_INLINE_HINT - _T_SHORT_STR:
+                    out.append(_T_SHORT_STR + len(raw))
+                else:
+                    out.append(_T_STR)
+                    _write_varint(len(raw), out)
+                out += raw
+            elif idx < 0x100 - _T_INLINE_HINT:
+                out.append(_T_INLINE_HINT + idx)
+            else:
+                out.append(_T_HINT)
+                _write_varint(idx, out)
+        elif isinstance(value, dict):
+            out.append(_T_DICT)
+            _write_varint(len(value), out)
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    raise TypeError(f"Envelope keys must be str, not {type(key).__name__}")
+                self._write(key, out)
+                self._write(item, out)
+        elif isinstance(value, (list, tuple)):
+            out.append(_T_LIST)
+            _write_varint(len(value), out)
+            for item in value:
+                self._write(item, out)
+        elif isinstance(value, int):
+            out.append(_T_INT)
+            # zigzag so small negative numbers stay short
+            _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+        elif isinstance(value, float):
+            out.append(_T_FLOAT)
+            out += _pack_double(value)
+        elif isinstance(value, (bytes, bytearray)):
+            out.append(_T_BYTES)
+            _write_varint(len(value), out)
+            out += value
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not envelope serializable")
+
+    # --- decoding ---
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        version, flags, body = _split_frame(data)
+        if version not in SCHEMAS:
+            raise CodecError(f"Unsupported {BINARY_CODEC} version: {version}")
+        if version != self.version:
+            return BinaryCodec(version, self.compress_threshold, self.compress_level).decode(data)
+        try:
+            if flags & FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            value, pos = self._read(body, 0)
+        except (IndexError, struct.error, UnicodeDecodeError, zlib.error) as exc:
+            # A truncated or corrupted frame; callers fall back on CodecError
+            raise CodecError(f"Corrupt {BINARY_CODEC} frame: {exc!r}") from exc
+        if pos != len(body):
+            raise CodecError(f"Trailing bytes after envelope ({len(body) - pos})")
+        return value
+
+    def _read(self, buf: bytes, pos: int) -> Tuple[Any, int]:
+        tag = buf[pos]
+        pos += 1
+        if tag >= _T_INLINE_HINT:
+            return self._hints[tag - _T_INLINE_HINT], pos
+        if tag >= _T_SHORT_STR:
+            end = _checked_end(buf, pos, tag - _T_SHORT_STR)
+            return buf[pos:end].decode("utf-8"), end
+        if tag == _T_DICT:
+            size, pos = _read_varint(buf, pos)
+            result: Dict[str, Any] = {}
+            read = self._read
+            for _ in range(size):
+                key, pos = read(buf, pos)
+                if type(key) is not str:
+                    # The encoder only writes str keys; anything else is a damaged frame
+                    raise CodecError(f"Non-string {type(key).__name__} key in dict before offset {pos}")
+                result[key], pos = read(buf, pos)
+            return result, pos
+        if tag == _T_LIST:
+            size, pos = _read_varint(buf, pos)
+            items: List[Any] = []
+            read = self._read
+            for _ in range(size):
+                item, pos = read(buf, pos)
+                items.append(item)
+            return items, pos
+        if tag == _T_STR:
+            size, pos = _read_varint(buf, pos)
+            end = _checked_end(buf, pos, size)
+            return buf[pos:end].decode("utf-8"), end
+        if tag == _T_HINT:
+            idx, pos = _read_varint(buf, pos)
+            return self._hints[idx], pos
+        if tag == _T_INT:
+            raw, pos = _read_varint(buf, pos)
+            return (raw >> 1) ^ -(raw & 1), pos
+        if tag == _T_FLOAT:
+            return _unpack_double(buf, pos)[0], pos + 8
+        if tag == _T_NONE:
+            return None, pos
+        if tag == _T_TRUE:
+            return True, pos
+        if tag == _T_FALSE:
+            return False, pos
+        if tag == _T_BYTES:
+            size, pos = _read_varint(buf, pos)
+            end = _checked_end(buf, pos, size)
+            return bytes(buf[pos:end]), end
+        raise CodecError(f"Unknown type tag 0x{tag:02x} at offset {pos - 1}")
+
+
+def _checked_end(buf: bytes, pos: int, size: int) -> int:
+    """End offset of a ``size``-byte field at ``pos``; slicing would silently truncate it."""
+    end = pos + size
+    if end > len(buf):
+        raise CodecError(f"Truncated frame: {size}-byte field at offset {pos} runs past {len(buf)} bytes")
+    return end
+
+
+def _write_varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _split_frame(data: bytes) -> Tuple[int, int, bytes]:
+    if len(data) < 4 or data[:2] != MAGIC:
+        raise CodecError("Not an asya-bin frame")
+    return data[2], data[3], data[4:]
+
+
+# --- registry and negotiation ---
+_CODECS: Dict[str, Callable[..., Any]] = {
+    JSON_CODEC: JsonCodec,
+    BINARY_CODEC: BinaryCodec,
+}
+
+
+def register_codec(name: str, factory: Callable[..., Any]) -> None:
+    """Register an additional codec factory under ``name``."""
+    _CODECS[name] = factory
+
+
+def get_codec(name: str = JSON_CODEC, **kwargs: Any) -> Any:
+    try:
+        factory = _CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown envelope codec: {name}") from None
+    return factory(**kwargs) if kwargs else factory()
+
+
+def advertise(headers: Optional[Dict[str, Any]] = None, versions: Iterable[int] = SUPPORTED_VERSIONS) -> Dict[str, Any]:
+    """Record the binary versions this actor can decode in ``headers``."""
+    headers = headers if headers is not None else {}
+    headers[CODEC_HEADER] = {"name": BINARY_CODEC, "accept": sorted(set(versions))}
+    return headers
+
+
+def negotiate(peer_headers: Optional[Dict[str, Any]], local_versions: Iterable[int] = SUPPORTED_VERSIONS, **kwargs: Any) -> Any:
+    """
+    Pick the codec to answer a peer with.
+
+    Returns the highest binary version both sides understand, or the JSON codec
+    when the peer did not advertise ``asya-bin`` support (older images).
+    """
+    offer = (peer_headers or {}).get(CODEC_HEADER) or {}
+    if offer.get("name") != BINARY_CODEC:
+        return JsonCodec()
+    common = set(local_versions) & {int(v) for v in offer.get("accept") or []}
+    if not common:
+        logging.info("No common %s version with peer offer %s; using JSON", BINARY_CODEC, offer)
+        return JsonCodec()
+    return BinaryCodec(version=max(common), **kwargs)
+
+
+def decode_envelope(data: bytes) -> Dict[str, Any]:
+    """Decode a frame produced by any registered built-in codec."""
+    if data[:2] == MAGIC:
+        return BinaryCodec().decode(data)
+    return JsonCodec().decode(data)
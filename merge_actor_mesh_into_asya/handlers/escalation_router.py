@@ -3,21 +3,30 @@ Asya-compatible EscalationRouter in envelope mode.
 
 Handles low-confidence or policy-violating cases by rewriting the route to end
 at the ResponseAggregator and annotating the payload with escalation details.
+Escalation reasons come from the ``escalation_router`` rules in
+``routing_rules.json``, compiled with the same decision table as DecisionRouter.
 """
 
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
+
+from .claim_check import claim_checked
+from .rule_engine import DecisionTable, load_rules
 
 logging.basicConfig(level=logging.INFO)
 
 
 class EscalationRouter:
     RESPONSE_AGGREGATOR = "response-aggregator"
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("escalated", "escalation_reasons", "recovery_log")
 
     def __init__(self) -> None:
         self.logger = logging.getLogger(__name__)
+        self.table = DecisionTable(load_rules()["escalation_router"], self._features())
 
+    @claim_checked(envelope_mode=True)
     def process(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
         payload = envelope.get("payload", {})
         route = envelope.get("route", {})
@@ -36,33 +45,32 @@ class EscalationRouter:
         return envelope
 
     def _determine_reasons(self, payload: Dict[str, Any]) -> List[str]:
-        reasons: List[str] = []
-
-        guardrail = payload.get("guardrail_check") or {}
-        intent_raw = payload.get("intent")
-        intent = intent_raw if isinstance(intent_raw, dict) else {}
-        sentiment_raw = payload.get("sentiment")
-        sentiment = sentiment_raw if isinstance(sentiment_raw, dict) else {}
-
-        if guardrail and not guardrail.get("pass", True):
-            reasons.append("guardrail_failure")
-
-        try:
-            confidence = float(intent.get("confidence", 1.0))
-            if confidence < 0.6:
-                reasons.append("low_confidence_intent")
-        except (TypeError, ValueError):
-            reasons.append("unknown_confidence")
-
-        sentiment_label = ""
-        if isinstance(sentiment, dict):
-            sentiment_label = (sentiment.get("sentiment") or {}).get("label", "")
-        if sentiment_label == "negative":
-            reasons.append("negative_sentiment")
-
-        if not reasons:
-            reasons.append("manual_review")
-        return reasons
+        return self.table.decide(payload)
+
+    def _features(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Feature extractors referenced by the ``escalation_router`` rules."""
+
+        def as_dict(value: Any) -> Dict[str, Any]:
+            return value if isinstance(value, dict) else {}
+
+        def guardrail_failed(payload: Dict[str, Any]) -> bool:
+            guardrail = payload.get("guardrail_check") or {}
+            return bool(guardrail) and not guardrail.get("pass", True)
+
+        def confidence(payload: Dict[str, Any]) -> Optional[float]:
+            try:
+                return float(as_dict(payload.get("intent")).get("confidence", 1.0))
+            except (TypeError, ValueError):
+                return None
+
+        def sentiment_label(payload: Dict[str, Any]) -> str:
+            return as_dict(as_dict(payload.get("sentiment")).get("sentiment")).get("label", "")
+
+        return {
+            "guardrail_failed": guardrail_failed,
+            "confidence": confidence,
+            "sentiment_label": sentiment_label,
+        }
 
     def _append_recovery_log(self, payload: Dict[str, Any], reasons: List[str]) -> List[Dict[str, Any]]:
         log = payload.get("recovery_log") or []
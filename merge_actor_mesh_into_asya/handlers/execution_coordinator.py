@@ -4,20 +4,38 @@ Asya-compatible ExecutionCoordinator in payload mode.
 Simulates execution of the action plan produced earlier in the pipeline. No
 external API calls are made; instead we return structured results that mirror
 what the real Actor Mesh demo would emit.
+
+When the message's deadline budget drops below ``EXECUTION_DEFER_BELOW_S``,
+only ``CRITICAL_ACTIONS`` run inline; the rest are returned with status
+``deferred`` for follow-up outside the customer's wait.
 """
 
 import logging
+import os
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
+from .claim_check import claim_checked
+from .deadline import shed_expired, short_on_time
+
 logging.basicConfig(level=logging.INFO)
 
 
 class ExecutionCoordinator:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("execution_result", "action_plan")
+    # Payload fields read by should_skip()
+    SKIP_READS = ("action_plan", "intent")
+    # Actions that still run when the deadline budget is low
+    CRITICAL_ACTIONS = ("process_refund", "cancel_order")
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+        self.defer_below_s = float(os.getenv("EXECUTION_DEFER_BELOW_S", "1.0"))
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the planned actions (simulated) and append results."""
         try:
@@ -25,9 +43,15 @@ class ExecutionCoordinator:
             action_plan = payload.get("action_plan") or self._infer_action_plan(intent)
             normalized_actions = self._normalize_actions(action_plan)
 
+            defer_non_critical = short_on_time(payload, self.defer_below_s)
             results: List[Dict[str, Any]] = []
+            deferred: List[str] = []
             for action in normalized_actions:
-                results.append(self._simulate_action(action, payload))
+                if defer_non_critical and action["action"] not in self.CRITICAL_ACTIONS:
+                    results.append({**action, "status": "deferred", "detail": "deferred: deadline budget low"})
+                    deferred.append(action["action"])
+                else:
+                    results.append(self._simulate_action(action, payload))
 
             status = "completed" if all(r.get("status") == "completed" for r in results) else "partial"
             execution_result = {
@@ -35,6 +59,9 @@ class ExecutionCoordinator:
                 "results": results,
                 "executed_at": datetime.now(timezone.utc).isoformat(),
             }
+            if deferred:
+                execution_result["deferred"] = deferred
+                self.logger.info("Deferred non-critical action(s) due to deadline: %s", deferred)
 
             self.logger.info("Execution completed with status=%s for %d action(s)", status, len(results))
             return {**payload, "execution_result": execution_result, "action_plan": normalized_actions}
@@ -49,6 +76,11 @@ class ExecutionCoordinator:
             }
             return {**payload, "execution_result": fallback}
 
+    def should_skip(self, payload: Dict[str, Any]) -> bool:
+        """Skip when the effective plan would at most log a customer note."""
+        action_plan = payload.get("action_plan") or self._infer_action_plan(payload.get("intent"))
+        return all(action["action"] == "add_customer_note" for action in self._normalize_actions(action_plan))
+
     def _infer_action_plan(self, intent: Any) -> List[Dict[str, Any]]:
         """Generate a minimal plan when none is provided."""
         if isinstance(intent, dict):
@@ -0,0 +1,25 @@
+"""
+Entrypoint for the compiled ecommerce Flow.
+
+Stamps the end-to-end deadline (see ``handlers.deadline``) before handing the
+envelope to the generated ``routers.start_ecommerce_flow``. The compiled
+routers module only exists in the routers image, so it is imported lazily.
+"""
+
+import logging
+from typing import Any, Dict
+
+from . import deadline
+
+logging.basicConfig(level=logging.INFO)
+
+
+def start_ecommerce_flow(envelope: Dict[str, Any]) -> Any:
+    payload = envelope.setdefault("payload", {})
+    deadline_at = deadline.stamp(payload)
+    envelope.setdefault("headers", {})[deadline.DEADLINE_KEY] = deadline_at
+    logging.info("Flow %s started with deadline_at=%.3f", envelope.get("id"), deadline_at)
+
+    import routers
+
+    return routers.start_ecommerce_flow(envelope)
@@ -3,7 +3,9 @@ Asya-compatible GuardrailValidator in payload mode.
 
 Performs lightweight rule-based validation on generated responses to catch
 unauthorized promises, risky phrasing, or missing content. Appends a
-``guardrail_check`` field to the payload with the outcome.
+``guardrail_check`` field to the payload with the outcome. A failed response
+is sent back for a bounded number of regenerations and is then escalated (see
+``handlers.refinement``).
 """
 
 import logging
@@ -11,10 +13,17 @@ import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
+from . import refinement
+from .claim_check import claim_checked
+from .deadline import shed_expired
+
 logging.basicConfig(level=logging.INFO)
 
 
 class GuardrailValidator:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("guardrail_check", "refinement")
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
@@ -32,17 +41,21 @@ class GuardrailValidator:
             r"\b\d{15,16}\b",  # numeric CC
         ]
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Validate the generated response and append guardrail results."""
         try:
             response_text = self._extract_response_text(payload.get("response"))
             if not response_text:
+                action, refinement_state = refinement.next_action(payload, False)
                 result = {
                     "pass": False,
                     "issues": [{"type": "missing_response", "message": "No response text to validate"}],
                     "validated_at": datetime.now(timezone.utc).isoformat(),
+                    "recommended_action": action,
                 }
-                return {**payload, "guardrail_check": result}
+                return {**payload, "guardrail_check": result, "refinement": refinement_state}
 
             issues: List[Dict[str, Any]] = []
             issues.extend(self._check_patterns(response_text, self.unauthorized_promises, "unauthorized_promise"))
@@ -52,18 +65,21 @@ class GuardrailValidator:
                 issues.append({"type": "length", "message": "Response too long", "severity": "low"})
 
             passed = len(issues) == 0
+            action, refinement_state = refinement.next_action(payload, passed)
             result = {
                 "pass": passed,
                 "issues": issues,
                 "validated_at": datetime.now(timezone.utc).isoformat(),
-                "recommended_action": "regenerate" if not passed else "deliver",
+                "recommended_action": action,
             }
 
             if not passed:
-                self.logger.warning("Guardrail validation failed with %d issue(s)", len(issues))
+                self.logger.warning("Guardrail validation failed with %d issue(s); action=%s", len(issues), action)
             else:
                 self.logger.info("Guardrail validation passed")
 
+            if refinement_state:
+                return {**payload, "guardrail_check": result, "refinement": refinement_state}
             return {**payload, "guardrail_check": result}
 
         except Exception as exc:  # pragma: no cover - defensive guard
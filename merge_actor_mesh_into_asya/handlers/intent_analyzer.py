@@ -12,10 +12,16 @@ import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Tuple
 
+from .claim_check import claim_checked
+from .deadline import shed_expired
+
 logging.basicConfig(level=logging.INFO)
 
 
 class IntentAnalyzer:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("intent",)
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
@@ -31,6 +37,8 @@ class IntentAnalyzer:
             ("escalation_request", ["manager", "supervisor", "human"]),
         ]
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Detect intent and entities, then append them to the payload."""
         try:
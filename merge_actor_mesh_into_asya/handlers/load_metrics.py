@@ -0,0 +1,102 @@
+"""
+Local feed of recent per-actor load for load-aware routing.
+
+Reads a small JSON document, typically written by a metrics scraper next to the
+router (e.g. from the sidecar's ``asya_actor_processing_seconds`` and the queue
+depth KEDA already polls)::
+
+    {
+      "updated_at": 1733327000.0,
+      "actors": {
+        "response-generator": {"service_time_ms": 850, "queue_depth": 42, "replicas": 3},
+        "context-retriever": {"service_time_ms": 40, "queue_depth": 3, "replicas": 2}
+      }
+    }
+
+The file is re-read at most every ``refresh_interval_s``. A missing, unreadable
+or stale feed (and a malformed actor entry) reports no load, so routing falls
+back to content-only decisions. An actor enters overload above the wait
+threshold and leaves it only once its wait drops below ``recover_ratio`` times
+the threshold, so a wait hovering around the threshold does not flip routes on
+every message.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+
+
+class ActorLoadFeed:
+    def __init__(
+        self, path: str, refresh_interval_s: float = 5.0, max_age_s: float = 60.0, recover_ratio: float = 0.8
+    ) -> None:
+        """
+        Args:
+            path: JSON metrics file
+            refresh_interval_s: Minimum seconds between file reads
+            max_age_s: Ignore the feed when ``updated_at`` is older than this
+            recover_ratio: An overloaded actor recovers below this fraction of the wait threshold
+        """
+        self.path = Path(path)
+        self.refresh_interval_s = refresh_interval_s
+        self.max_age_s = max_age_s
+        self.recover_ratio = min(max(float(recover_ratio), 0.0), 1.0)
+        self._overloaded: Set[str] = set()
+        self._actors: Dict[str, Dict[str, Any]] = {}
+        self._updated_at = 0.0
+        self._loaded_at: Optional[float] = None
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval_s:
+            return
+        self._loaded_at = now
+        try:
+            data = json.loads(self.path.read_text())
+            self._actors = dict(data.get("actors") or {})
+            self._updated_at = float(data.get("updated_at", time.time()))
+        except (OSError, ValueError, TypeError, AttributeError) as exc:
+            logging.debug("Load metrics feed unavailable (%s): %s", self.path, exc)
+            self._actors = {}
+
+    def actor_load(self, actor: str) -> Dict[str, Any]:
+        self._refresh()
+        if time.time() - self._updated_at > self.max_age_s:
+            return {}
+        return self._actors.get(actor) or {}
+
+    def estimated_wait_s(self, actor: str) -> float:
+        """Queueing estimate: backlog per replica times mean service time."""
+        load = self.actor_load(actor)
+        if not load:
+            return 0.0
+        try:
+            service_time_s = float(load.get("service_time_ms", 0.0)) / 1000.0
+            replicas = max(int(load.get("replicas", 1) or 1), 1)
+            queue_depth = float(load.get("queue_depth", 0.0))
+        except (AttributeError, TypeError, ValueError):
+            logging.debug("Malformed load metrics for %s: %r", actor, load)
+            return 0.0
+        return (queue_depth / replicas + 1.0) * service_time_s
+
+    def overloaded(self, actors: List[str], max_wait_s: float) -> List[str]:
+        """
+        Actors whose estimated wait exceeds ``max_wait_s``.
+
+        An actor already overloaded stays so until its wait drops to
+        ``recover_ratio * max_wait_s`` or below.
+        """
+        result = []
+        for actor in dict.fromkeys(actors):
+            wait_s = self.estimated_wait_s(actor)
+            threshold = max_wait_s * self.recover_ratio if actor in self._overloaded else max_wait_s
+            if wait_s > threshold:
+                self._overloaded.add(actor)
+                result.append(actor)
+            else:
+                self._overloaded.discard(actor)
+        return result
@@ -0,0 +1,105 @@
+"""
+Bounded regeneration loop for responses that fail the guardrail check.
+
+GuardrailValidator asks ``next_action`` what to do with a failed response. It
+gets ``regenerate`` while fewer than ``REFINEMENT_MAX_ATTEMPTS`` regenerations
+have run and the deadline (see ``handlers.deadline``) leaves at least
+``REFINEMENT_MIN_BUDGET_S`` for another generate + validate round. Otherwise it
+gets ``escalate``, and ResponseAggregator reports the ticket as escalated. The
+Flow loops on ``should_regenerate``. ResponseGenerator reads the guardrail
+issues as feedback and records the attempt.
+
+Loop state lives in ``payload["refinement"]``:
+
+- ``attempts``: regenerations so far
+- ``feedback``: issues the last attempt was asked to fix
+- ``first_failed_at``: epoch seconds of the first failed check
+- ``extra_latency_s``: time from the first failed check to the last check
+- ``outcome``: ``delivered`` / ``escalated`` once the loop ends
+- ``stopped``: ``max_attempts`` / ``deadline`` when it gave up
+
+Configuration:
+
+- ``REFINEMENT_MAX_ATTEMPTS``: regenerations allowed per ticket (default 2)
+- ``REFINEMENT_MIN_BUDGET_S``: time needed for one more round (default 1.0s)
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from .claim_check import lazy_view
+from .deadline import short_on_time
+
+logging.basicConfig(level=logging.INFO)
+
+REFINEMENT_KEY = "refinement"
+
+
+def max_attempts() -> int:
+    return int(os.getenv("REFINEMENT_MAX_ATTEMPTS", "2"))
+
+
+def min_budget_s() -> float:
+    return float(os.getenv("REFINEMENT_MIN_BUDGET_S", "1.0"))
+
+
+def state(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the payload's refinement state (empty before the first failure)."""
+    current = payload.get(REFINEMENT_KEY)
+    return dict(current) if isinstance(current, dict) else {}
+
+
+def next_action(payload: Dict[str, Any], passed: bool) -> Tuple[str, Dict[str, Any]]:
+    """
+    Decide what happens after a guardrail check.
+
+    Returns ``(recommended_action, refinement_state)``. The action is
+    ``deliver``, ``regenerate`` or ``escalate``. The state is ``{}`` for
+    tickets that passed without entering the loop.
+    """
+    refinement = state(payload)
+    if passed and not refinement:
+        return "deliver", refinement
+
+    now = time.time()
+    refinement.setdefault("attempts", 0)
+    refinement.setdefault("first_failed_at", now)
+    refinement["extra_latency_s"] = round(now - refinement["first_failed_at"], 4)
+
+    if passed:
+        refinement["outcome"] = "delivered"
+        return "deliver", refinement
+    if refinement["attempts"] >= max_attempts():
+        refinement.update(outcome="escalated", stopped="max_attempts")
+    elif short_on_time(payload, min_budget_s()):
+        refinement.update(outcome="escalated", stopped="deadline")
+    else:
+        return "regenerate", refinement
+
+    logging.warning(
+        "Refinement stopped (%s) after %d attempt(s); escalating", refinement["stopped"], refinement["attempts"]
+    )
+    return "escalate", refinement
+
+
+def should_regenerate(payload: Dict[str, Any]) -> bool:
+    """Flow loop condition: the last guardrail check asked for another attempt."""
+    guardrail = lazy_view(payload).get("guardrail_check") or {}
+    return guardrail.get("recommended_action") == "regenerate"
+
+
+def start_attempt(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Feedback for a regeneration and the updated refinement state.
+
+    Returns ``([], state)`` unchanged when the payload is not being regenerated.
+    """
+    refinement = state(payload)
+    if not should_regenerate(payload):
+        return [], refinement
+    issues = [issue for issue in (payload.get("guardrail_check") or {}).get("issues") or [] if isinstance(issue, dict)]
+    refinement["attempts"] = int(refinement.get("attempts", 0)) + 1
+    refinement["feedback"] = issues
+    return issues, refinement
@@ -10,14 +10,21 @@ import logging
 from datetime import datetime, timezone
 from typing import Any, Dict
 
+from .claim_check import claim_checked
+
 logging.basicConfig(level=logging.INFO)
 
 
 class ResponseAggregator:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("final_response",)
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
 
+    # Last actor: its output leaves the pipeline, so references are rehydrated
+    @claim_checked(terminal=True)
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Aggregate the final response and mark resolution state."""
         try:
@@ -37,7 +44,7 @@ class ResponseAggregator:
             status = "resolved"
             if guardrail and not guardrail.get("pass", True):
                 status = "needs_review"
-            if payload.get("escalated"):
+            if payload.get("escalated") or guardrail.get("recommended_action") == "escalate":
                 status = "escalated"
 
             final_response = {
@@ -48,6 +55,8 @@ class ResponseAggregator:
                 "sentiment": sentiment_value,
                 "guardrail": guardrail,
                 "execution": execution,
+                "refinement": payload.get("refinement") or {},
+                "deadline_expired": payload.get("deadline_expired"),
                 "completed_at": datetime.now(timezone.utc).isoformat(),
             }
 
@@ -3,17 +3,27 @@ Asya-compatible ResponseGenerator in payload mode.
 
 Creates empathetic, template-based replies using the enriched payload. Avoids
 LLM calls to keep the demo self contained while still providing structured
-responses and an action plan for the ExecutionCoordinator.
+responses and an action plan for the ExecutionCoordinator. When the guardrail
+check asked for a regeneration (see ``handlers.refinement``), the new text drops
+what the check flagged.
 """
 
 import logging
+import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
+from . import refinement
+from .claim_check import claim_checked
+from .deadline import shed_expired
+
 logging.basicConfig(level=logging.INFO)
 
 
 class ResponseGenerator:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("response", "action_plan", "refinement")
+
     def __init__(self, log_level: str = "INFO") -> None:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
@@ -29,6 +39,8 @@ class ResponseGenerator:
             "general_inquiry": "I'm here to help and will provide the details you need.",
         }
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Generate a customer-facing response and action plan."""
         try:
@@ -47,6 +59,9 @@ class ResponseGenerator:
             tone = self._choose_tone(sentiment_label, urgency)
             action_plan = self._build_action_plan(intent_type, context)
             response_text = self._compose_response_text(intent_type, sentiment_label, context, action_plan)
+            feedback, refinement_state = refinement.start_attempt(payload)
+            if feedback:
+                response_text = self._apply_feedback(response_text, feedback)
 
             response_payload: Dict[str, Any] = {
                 "text": response_text,
@@ -61,7 +76,11 @@ class ResponseGenerator:
             }
 
             self.logger.info("Response generated for intent=%s tone=%s", intent_type, tone)
-            return {**payload, "response": response_payload, "action_plan": action_plan}
+            result = {**payload, "response": response_payload, "action_plan": action_plan}
+            if refinement_state:
+                result["refinement"] = refinement_state
+                self.logger.info("Regeneration attempt %d addressed %d issue(s)", refinement_state["attempts"], len(feedback))
+            return result
 
         except Exception as exc:  # pragma: no cover - defensive guard
             self.logger.error("Response generation failed: %s", exc)
@@ -73,6 +92,19 @@ class ResponseGenerator:
             }
             return {**payload, "response": fallback, "action_plan": []}
 
+    def _apply_feedback(self, text: str, issues: List[Dict[str, Any]]) -> str:
+        """Drop sentences matching flagged patterns and trim overlong text."""
+        patterns = [issue["pattern"] for issue in issues if issue.get("pattern")]
+        sentences = re.split(r"(?<=[.!?])\s+", text)
+        kept = [
+            sentence for sentence in sentences
+            if not any(re.search(pattern, sentence, re.IGNORECASE) for pattern in patterns)
+        ]
+        text = " ".join(kept)
+        if any(issue.get("type") == "length" for issue in issues) and len(text) > 2000:
+            text = text[:2000].rsplit(". ", 1)[0] + "."
+        return text or "Thanks for reaching out. We are looking into this and will follow up shortly."
+
     def _extract_sentiment_label(self, sentiment: Dict[str, Any]) -> str:
         sentiment_info = sentiment.get("sentiment", sentiment)
         if isinstance(sentiment_info, dict):
@@ -0,0 +1,91 @@
+"""
+Route pruning based on per-actor skip predicates.
+
+Actors that can be provably unnecessary for a ticket declare a
+``should_skip(payload)`` method plus the payload fields it reads
+(``SKIP_READS``); every actor declares the fields it writes (``WRITES``).
+``prune_route`` drops skippable future actors from ``route["actors"]`` before
+they are reached, saving a full queue round trip per skipped hop.
+
+A predicate is only trusted when none of the actors still ahead of it writes a
+field it reads; otherwise the answer could change by the time the actor runs,
+so it is kept. Actors without a ``WRITES`` declaration (unknown actors, other
+routers) stop pruning beyond them. If every future actor is skippable, the last
+one is kept so the route still has a next hop after the router.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from .claim_check import lazy_view
+from .context_retriever import ContextRetriever
+from .escalation_router import EscalationRouter
+from .execution_coordinator import ExecutionCoordinator
+from .guardrail_validator import GuardrailValidator
+from .intent_analyzer import IntentAnalyzer
+from .response_aggregator import ResponseAggregator
+from .response_generator import ResponseGenerator
+from .sentiment_analyzer import SentimentAnalyzer
+
+logging.basicConfig(level=logging.INFO)
+
+ACTORS: Dict[str, type] = {
+    "sentiment-analyzer": SentimentAnalyzer,
+    "intent-analyzer": IntentAnalyzer,
+    "context-retriever": ContextRetriever,
+    "response-generator": ResponseGenerator,
+    "guardrail-validator": GuardrailValidator,
+    "execution-coordinator": ExecutionCoordinator,
+    "response-aggregator": ResponseAggregator,
+    "escalation-router": EscalationRouter,
+}
+
+_instances: Dict[str, Any] = {}
+
+
+def _skipper(actor: str) -> Optional[Any]:
+    actor_cls = ACTORS.get(actor)
+    if actor_cls is None or not hasattr(actor_cls, "should_skip"):
+        return None
+    if actor not in _instances:
+        _instances[actor] = actor_cls()
+    return _instances[actor]
+
+
+def should_skip(actor: str, payload: Dict[str, Any]) -> bool:
+    """True when ``actor`` has a skip predicate and it holds for ``payload`` now."""
+    skipper = _skipper(actor)
+    return bool(skipper is not None and skipper.should_skip(lazy_view(payload)))
+
+
+def prune_route(route: Dict[str, Any], payload: Dict[str, Any], current: int) -> List[str]:
+    """
+    Remove skippable actors after ``current`` from ``route["actors"]``.
+
+    Returns the names of the pruned actors.
+    """
+    actors = route.get("actors") or []
+    kept = actors[: current + 1]
+    pruned: List[str] = []
+    pending_writes: Set[str] = set()
+    barrier = False
+
+    for actor in actors[current + 1 :]:
+        skipper = None if barrier else _skipper(actor)
+        if skipper is not None and not pending_writes.intersection(skipper.SKIP_READS) and skipper.should_skip(payload):
+            pruned.append(actor)
+            continue
+        kept.append(actor)
+        actor_cls = ACTORS.get(actor)
+        if actor_cls is None or not hasattr(actor_cls, "WRITES"):
+            barrier = True
+        else:
+            pending_writes.update(actor_cls.WRITES)
+
+    if pruned and len(kept) == current + 1:
+        # Never leave the router last: it would be sent the envelope again
+        kept.append(pruned.pop())
+    if pruned:
+        route["actors"] = kept
+        logging.info("Pruned skippable actors from route: %s", pruned)
+    return pruned
@@ -0,0 +1,298 @@
+"""
+Declarative routing rules compiled into a decision table.
+
+Rules live in ``routing_rules.json`` (one section per router). Each decision is
+a disjunction of condition rows (``when`` or ``when_any``); a row is a
+conjunction of ``{"feature", "op", "value"}`` conditions. At startup every
+feature referenced by the rules is compiled into a lookup from feature value to
+a bitmask of the rows it satisfies:
+
+- categorical features (``eq``/``ne``/``in``/``not_in``/``is_none``) become a dict
+  keyed by every value named in the rules plus a default mask for other values;
+- numeric features (``lt``/``le``/``gt``/``ge``/``is_none``) become sorted
+  thresholds, bisected into precomputed per-interval masks.
+
+Evaluating a payload extracts each referenced feature once, ANDs one mask per
+feature and walks only the rows that fired, so adding rules does not add
+per-message predicate checks.
+"""
+
+import json
+import os
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+RULES_PATH = Path(__file__).with_name("routing_rules.json")
+
+CATEGORICAL_OPS = {"eq", "ne", "in", "not_in"}
+NUMERIC_OPS = {"lt", "le", "gt", "ge"}
+
+FeatureExtractor = Callable[[Dict[str, Any]], Any]
+
+
+def load_rules(path: Optional[str] = None) -> Dict[str, Any]:
+    """Load the rule file (``ROUTING_RULES_PATH`` overrides the bundled one)."""
+    rules_path = Path(path or os.getenv("ROUTING_RULES_PATH") or RULES_PATH)
+    with rules_path.open() as fh:
+        return json.load(fh)
+
+
+def _check(op: str, expected: Any, value: Any) -> bool:
+    if op == "is_none":
+        return value is None
+    if value is None and op in NUMERIC_OPS:
+        return False
+    if op == "eq":
+        return value == expected
+    if op == "ne":
+        return value != expected
+    if op == "in":
+        return value in expected
+    if op == "not_in":
+        return value not in expected
+    if op == "lt":
+        return value < expected
+    if op == "le":
+        return value <= expected
+    if op == "gt":
+        return value > expected
+    if op == "ge":
+        return value >= expected
+    raise ValueError(f"Unknown rule operator: {op}")
+
+
+class _FeatureIndex:
+    """Maps a feature value to the bitmask of rule rows it satisfies."""
+
+    def __init__(self, name: str, row_conditions: Sequence[List[Tuple[str, Any]]]) -> None:
+        self.name = name
+        ops = {op for conditions in row_conditions for op, _ in conditions}
+        unknown = ops - CATEGORICAL_OPS - NUMERIC_OPS - {"is_none"}
+        if unknown:
+            raise ValueError(f"Unknown operator(s) {sorted(unknown)} for feature '{name}'")
+        if ops & NUMERIC_OPS and ops & CATEGORICAL_OPS:
+            raise ValueError(f"Feature '{name}' mixes numeric and categorical operators")
+        self.numeric = bool(ops & NUMERIC_OPS)
+
+        def mask_for(value: Any) -> int:
+            mask = 0
+            for row, conditions in enumerate(row_conditions):
+                if all(_check(op, expected, value) for op, expected in conditions):
+                    mask |= 1 << row
+            return mask
+
+        self.none_mask = mask_for(None)
+        if self.numeric:
+            self.points = sorted({float(expected) for conditions in row_conditions for op, expected in conditions if op in NUMERIC_OPS})
+            self.region_masks: List[int] = []
+            for idx, point in enumerate(self.points):
+                below = (self.points[idx - 1] + point) / 2 if idx else point - 1.0
+                self.region_masks.extend((mask_for(below), mask_for(point)))
+            self.region_masks.append(mask_for(self.points[-1] + 1.0))
+        else:
+            values: List[Any] = []
+            for conditions in row_conditions:
+                for op, expected in conditions:
+                    if op in {"in", "not_in"}:
+                        values.extend(expected)
+                    elif op != "is_none":
+                        values.append(expected)
+            self.value_masks = {value: mask_for(value) for value in values}
+            self.value_masks[None] = self.none_mask
+            self.default_mask = mask_for(_OtherValue())
+
+    def lookup(self, value: Any) -> int:
+        if value is None:
+            return self.none_mask
+        if self.numeric:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return self.none_mask
+            idx = bisect_left(self.points, value)
+            if idx < len(self.points) and self.points[idx] == value:
+                return self.region_masks[2 * idx + 1]
+            return self.region_masks[2 * idx]
+        try:
+            return self.value_masks.get(value, self.default_mask)
+        except TypeError:  # unhashable feature value
+            return self.default_mask
+
+
+class _OtherValue:
+    """Stand-in for any value not named in the rules."""
+
+    def __eq__(self, other: Any) -> bool:
+        return False
+
+    def __ne__(self, other: Any) -> bool:
+        return True
+
+    def __hash__(self) -> int:
+        return id(self)
+
+
+class DecisionTable:
+    def __init__(self, spec: Dict[str, Any], features: Dict[str, FeatureExtractor]) -> None:
+        """
+        Compile one router section of the rule file.
+
+        Args:
+            spec: ``{"decisions": [...], "default": [...]}`` section
+            features: Feature name -> extractor over the payload
+        """
+        self.decisions: List[Dict[str, Any]] = list(spec.get("decisions") or [])
+        self.default: List[str] = list(spec.get("default") or [])
+
+        rows: List[List[Dict[str, Any]]] = []
+        self._row_decision: List[int] = []
+        for order, decision in enumerate(self.decisions):
+            if "name" not in decision:
+                raise ValueError(f"Decision #{order} has no name")
+            alternatives = decision.get("when_any") or [decision.get("when") or []]
+            for conditions in alternatives:
+                rows.append(conditions)
+                self._row_decision.append(order)
+
+        feature_names = sorted({cond["feature"] for row in rows for cond in row})
+        missing = [name for name in feature_names if name not in features]
+        if missing:
+            raise ValueError(f"Rules reference unknown feature(s): {missing}")
+
+        self._extractors = [(name, features[name]) for name in feature_names]
+        self._indexes = [
+            _FeatureIndex(
+                name,
+                [[(cond["op"], cond.get("value")) for cond in row if cond["feature"] == name] for row in rows],
+            )
+            for name in feature_names
+        ]
+        self._all_rows = (1 << len(rows)) - 1
+
+    def extract(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate each referenced feature exactly once."""
+        return {name: extractor(payload) for name, extractor in self._extractors}
+
+    def evaluate(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Return the decisions that fire for ``payload``, in rule-file order."""
+        matched = self._all_rows
+        for (_, extractor), index in zip(self._extractors, self._indexes):
+            matched &= index.lookup(extractor(payload))
+            if not matched:
+                return []
+
+        fired = set()
+        while matched:
+            lowest = matched & -matched
+            fired.add(self._row_decision[lowest.bit_length() - 1])
+            matched ^= lowest
+        return [self.decisions[order] for order in sorted(fired)]
+
+    def decide(self, payload: Dict[str, Any]) -> List[str]:
+        """Names of the fired decisions, or the section default when none fire."""
+        names = [decision["name"] for decision in self.evaluate(payload)]
+        return names or list(self.default)
+
+
+def apply_route_edits(actors: List[str], current: int, decisions: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    Apply the ``edit`` of each fired decision to the future part of the route.
+
+    Stops after the first ``terminal`` decision. Returns a new actor list;
+    already-processed actors (``actors[: current + 1]``) are never changed.
+    """
+    result = list(actors)
+    for decision in decisions:
+        edit = decision.get("edit")
+        if edit:
+            op = edit["op"]
+            actor = edit.get("actor")
+            if op == "replace_tail":
+                result = result[: current + 1] + list(edit["actors"])
+            elif op == "insert_next":
+                upcoming = result[current + 1 :]
+                window = edit.get("unless_within")
+                if actor not in (upcoming[:window] if window else upcoming):
+                    result.insert(current + 1, actor)
+            elif op == "insert_before":
+                if actor not in result:
+                    anchor = edit["anchor"]
+                    anchor_idx = result.index(anchor) if anchor in result else None
+                    if anchor_idx is not None and anchor_idx > current:
+                        result.insert(anchor_idx, actor)
+                    else:
+                        result.append(actor)
+            else:
+                raise ValueError(f"Unknown route edit: {op}")
+        if decision.get("terminal"):
+            break
+    return result
+
+
+class RoutePlanner:
+    """
+    Memoizes ``apply_route_edits`` results.
+
+    Most envelopes reach a router with the same actor list and fall into a few
+    decision combinations, so the final actor list is looked up by
+    ``(actors, current, fired decisions)`` in a bounded LRU instead of being
+    re-spliced on every message. A decision is keyed by its name and its route
+    effect (``edit`` and ``terminal``), so a rule edited under the same name
+    never gets an old plan; ``invalidate()`` drops every plan at once.
+    """
+
+    # Decision fingerprints remembered before the memo is reset
+    MAX_DECISION_KEYS = 4096
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max(0, int(max_size))
+        self._plans: "OrderedDict[Tuple[Any, ...], Tuple[str, ...]]" = OrderedDict()
+        # id(decision) -> (decision, fingerprint); holding the decision keeps its id from being reused
+        self._decision_keys: Dict[int, Tuple[Dict[str, Any], Tuple[Any, ...]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _decision_key(self, decision: Dict[str, Any]) -> Tuple[Any, ...]:
+        entry = self._decision_keys.get(id(decision))
+        if entry is None:
+            if len(self._decision_keys) >= self.MAX_DECISION_KEYS:
+                self._decision_keys.clear()
+            fingerprint = (decision["name"], json.dumps(decision.get("edit"), sort_keys=True), bool(decision.get("terminal")))
+            entry = self._decision_keys[id(decision)] = (decision, fingerprint)
+        return entry[1]
+
+    def plan(self, actors: Sequence[str], current: int, decisions: Sequence[Dict[str, Any]]) -> List[str]:
+        key = (tuple(actors), current, tuple(self._decision_key(decision) for decision in decisions))
+        cached = self._plans.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._plans.move_to_end(key)
+            return list(cached)
+
+        self.misses += 1
+        planned = apply_route_edits(list(actors), current, decisions)
+        if self.max_size:
+            self._plans[key] = tuple(planned)
+            if len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+                self.evictions += 1
+        return planned
+
+    def invalidate(self) -> None:
+        """Drop every memoized plan, e.g. after the rules were reloaded."""
+        self._plans.clear()
+        self._decision_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._plans),
+            "max_size": self.max_size,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
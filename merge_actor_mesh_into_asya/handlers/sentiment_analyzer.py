@@ -11,9 +11,15 @@ import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Set
 
+from .claim_check import claim_checked
+from .deadline import shed_expired
+
 logging.basicConfig(level=logging.INFO)
 
 class SentimentAnalyzer:
+    # Payload fields this actor writes (used by route pruning)
+    WRITES = ("sentiment",)
+
     def __init__(self, log_level: str = "INFO") -> None:
 
         # Lexicons
@@ -81,6 +87,8 @@ class SentimentAnalyzer:
             "hasn't", "hadn't",
         }
 
+    @shed_expired
+    @claim_checked
     def process(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze sentiment/urgency and return the enriched payload."""
         try:
@@ -0,0 +1,115 @@
+"""Round-trip tests for the claim-check layer against a filesystem store and an in-memory S3 stand-in."""
+
+import io
+import random
+import string
+
+import pytest
+
+from handlers import claim_check
+from handlers.claim_check import ClaimCheck, LocalFileStore, S3Store, claim_checked, is_ref
+from handlers.refinement import should_regenerate
+from handlers.response_aggregator import ResponseAggregator
+
+# Incompressible, so it stays above the threshold after encoding
+BIG = "".join(random.Random(0).choices(string.ascii_letters, k=4096))
+
+
+class FakeS3Client:
+    """The subset of the boto3 S3 client used by S3Store, kept in memory (MinIO stand-in)."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+class CountingStore:
+    """Wraps a store and records which keys were downloaded."""
+
+    def __init__(self, store):
+        self.store = store
+        self.downloaded = []
+
+    def put(self, key, data):
+        self.store.put(key, data)
+
+    def get(self, key):
+        self.downloaded.append(key)
+        return self.store.get(key)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+
+class MessageOnlyActor:
+    @claim_checked
+    def process(self, payload):
+        return {**payload, "message_length": len(payload["message"])}
+
+
+@pytest.fixture(params=["file", "s3"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return CountingStore(LocalFileStore(str(tmp_path / "claims")))
+    return CountingStore(S3Store("claims-bucket", "e2e", client=FakeS3Client()))
+
+
+@pytest.fixture
+def enabled(store, monkeypatch):
+    check = ClaimCheck(store, threshold=1024)
+    monkeypatch.setattr(claim_check, "_default_claim_check", check)
+    return check
+
+
+def test_offload_and_lazy_resolution(store):
+    check = ClaimCheck(store, threshold=1024)
+    payload = {"message": "hi", "context": {"orders": [BIG]}}
+    offloaded = check.offload(payload)
+    assert offloaded["message"] == "hi"
+    assert is_ref(offloaded["context"])
+
+    lazy = check.wrap(offloaded)
+    assert store.downloaded == []
+    assert lazy["context"] == {"orders": [BIG]}
+    assert lazy.get("context") == {"orders": [BIG]}
+    assert len(store.downloaded) == 1
+
+    # Unchanged values are re-referenced without another upload
+    again = check.offload(lazy)
+    assert again["context"] == offloaded["context"]
+    assert check.stats["reused"] == 1
+
+
+def test_actor_that_does_not_read_a_field_never_downloads_it(enabled, store):
+    message = enabled.offload({"message": "Where is my order?", "context": BIG})
+    result = MessageOnlyActor().process(message)
+    assert store.downloaded == []
+    assert result["message_length"] == len("Where is my order?")
+    assert result["context"] == message["context"]
+
+
+def test_terminal_actor_output_has_no_references(enabled):
+    guardrail = {"pass": True, "recommended_action": "deliver", "notes": BIG}
+    message = enabled.offload({"message": "hi", "response": {"text": BIG}, "guardrail_check": guardrail, "context": BIG})
+    assert is_ref(message["response"]) and is_ref(message["context"])
+
+    result = ResponseAggregator().process(message)
+    assert not any(is_ref(value) for value in result.values())
+    assert result["context"] == BIG
+    assert result["final_response"]["response"] == BIG
+    assert result["final_response"]["status"] == "resolved"
+
+
+def test_router_predicates_resolve_references(enabled):
+    guardrail = {"pass": False, "recommended_action": "regenerate", "issues": [{"detail": BIG}]}
+    message = enabled.offload({"message": "hi", "guardrail_check": guardrail})
+    assert is_ref(message["guardrail_check"])
+    assert should_regenerate(message)
@@ -0,0 +1,37 @@
+"""Tests for deadline shedding: expired tickets are escalated, never dropped."""
+
+import time
+
+from handlers.decision_router import DecisionRouter
+from handlers.response_aggregator import ResponseAggregator
+from handlers.sentiment_analyzer import SentimentAnalyzer
+
+
+def expired_payload():
+    return {
+        "customer_email": "a@example.com",
+        "customer_message": "Where is my order?",
+        "metadata": {"deadline_at": time.time() - 2},
+    }
+
+
+def test_expired_ticket_is_escalated_through_to_the_aggregator():
+    payload = SentimentAnalyzer().process(expired_payload())
+    assert payload is not None
+    assert "sentiment" not in payload
+    assert payload["deadline_expired"]["actor"] == "SentimentAnalyzer"
+    assert payload["escalation_reasons"] == ["deadline_expired"]
+
+    result = ResponseAggregator().process(payload)
+    assert result["final_response"]["status"] == "escalated"
+    assert result["final_response"]["deadline_expired"]["late_s"] >= 2
+
+
+def test_expired_envelope_is_rerouted_to_the_aggregator():
+    envelope = {
+        "payload": expired_payload(),
+        "route": {"actors": ["intent-analyzer", "decision-router", "context-retriever", "response-generator"], "current": 1},
+    }
+    result = DecisionRouter().process(envelope)
+    assert result["route"]["actors"] == ["intent-analyzer", "decision-router", "response-aggregator"]
+    assert result["payload"]["escalated"] is True
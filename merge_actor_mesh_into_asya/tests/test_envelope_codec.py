@@ -0,0 +1,92 @@
+"""Tests for the envelope codecs: round trips and clean errors on damaged frames."""
+
+import pytest
+
+from handlers.envelope_codec import (
+    MAGIC,
+    BinaryCodec,
+    CodecError,
+    JsonCodec,
+    advertise,
+    decode_envelope,
+    negotiate,
+)
+
+ENVELOPE = {
+    "id": "env-1",
+    "route": {"actors": ["sentiment-analyzer", "intent-analyzer"], "current": 1},
+    "headers": {"trace": None, "retry": False},
+    "payload": {
+        "customer_message": "Where is my order #12345? It was due last week.",
+        "customer_email": "a@example.com",
+        "sentiment": {"label": "negative", "score": -0.75, "urgency": {"level": "high"}},
+        "context": {"orders": [{"order_id": i, "status": "pending"} for i in range(40)]},
+        "attachment": b"\x00\x01\x02",
+    },
+}
+
+
+@pytest.mark.parametrize("compress_threshold", [None, 64])
+def test_binary_round_trip(compress_threshold):
+    codec = BinaryCodec(compress_threshold=compress_threshold)
+    data = codec.encode(ENVELOPE)
+    assert decode_envelope(data) == ENVELOPE
+
+
+@pytest.mark.parametrize("compress_threshold", [None, 64])
+def test_truncated_frames_raise_codec_error(compress_threshold):
+    data = BinaryCodec(compress_threshold=compress_threshold).encode(ENVELOPE)
+    for length in range(2, len(data)):
+        with pytest.raises(CodecError):
+            decode_envelope(data[:length])
+
+
+def test_corrupt_frames_raise_codec_error():
+    codec = BinaryCodec(compress_threshold=None)
+    data = codec.encode({"payload": {"message": "hello"}})
+    # Unknown schema hint, a string running past the end, invalid UTF-8 and a bad tag
+    for body in (b"\x06\xff\x7f", b"\x05\x20hi", b"\x42\xff\xfe", b"\x0f"):
+        with pytest.raises(CodecError):
+            codec.decode(data[:4] + body)
+    with pytest.raises(CodecError):
+        decode_envelope(MAGIC + bytes((1, 1)) + b"not zlib")
+    with pytest.raises(CodecError):
+        decode_envelope(data + b"\x00")
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"\x08\x01\x07\x00\x03\x00",  # {[]: 0}: unhashable list key
+        b"\x08\x01\x08\x00\x03\x00",  # {{}: 0}: unhashable dict key
+        b"\x08\x01\x03\x02\x03\x00",  # {1: 0}: keys are always strings
+    ],
+)
+def test_non_string_dict_keys_raise_codec_error(body):
+    codec = BinaryCodec(compress_threshold=None)
+    header = codec.encode({})[:4]
+    with pytest.raises(CodecError):
+        codec.decode(header + body)
+
+
+def test_unknown_version_raises_codec_error():
+    data = BinaryCodec(compress_threshold=None).encode({"payload": {"message": "hello"}})
+    unknown = data[:2] + bytes((99,)) + data[3:]
+    with pytest.raises(CodecError, match="version: 99"):
+        BinaryCodec().decode(unknown)
+    with pytest.raises(CodecError):
+        decode_envelope(unknown)
+
+
+def test_damaged_json_raises_codec_error():
+    for data in (b'{"payload": ', b"\xff\xfe"):
+        with pytest.raises(CodecError):
+            decode_envelope(data)
+
+
+def test_negotiation_falls_back_to_json():
+    assert isinstance(negotiate({}), JsonCodec)
+    assert isinstance(negotiate({"codec": {"name": "asya-bin", "accept": [99]}}), JsonCodec)
+    assert isinstance(negotiate(advertise()), BinaryCodec)
+    plain = {"id": "env-2", "payload": {"customer_message": "hi"}}
+    assert decode_envelope(JsonCodec().encode(plain)) == plain
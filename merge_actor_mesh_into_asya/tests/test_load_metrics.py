@@ -0,0 +1,123 @@
+"""Tests for the load feed and load-aware degradation in DecisionRouter."""
+
+import json
+import time
+
+import pytest
+
+from handlers.decision_router import DecisionRouter
+from handlers.load_metrics import ActorLoadFeed
+
+ROUTE = ["decision-router", "response-generator", "response-aggregator"]
+
+
+def write_feed(path, actors, updated_at=None):
+    path.write_text(json.dumps({"updated_at": time.time() if updated_at is None else updated_at, "actors": actors}))
+
+
+def generator_load(queue_depth, service_time_ms=1000, replicas=1):
+    return {"response-generator": {"service_time_ms": service_time_ms, "queue_depth": queue_depth, "replicas": replicas}}
+
+
+@pytest.fixture
+def feed_path(tmp_path):
+    return tmp_path / "load-metrics.json"
+
+
+def test_estimated_wait_and_threshold(feed_path):
+    write_feed(feed_path, generator_load(queue_depth=6, service_time_ms=500, replicas=2))
+    feed = ActorLoadFeed(str(feed_path))
+    assert feed.estimated_wait_s("response-generator") == pytest.approx(2.0)
+    assert feed.estimated_wait_s("context-retriever") == 0.0
+    # Overloaded strictly above the threshold
+    assert feed.overloaded(["response-generator"], max_wait_s=2.0) == []
+    assert feed.overloaded(["response-generator", "context-retriever"], max_wait_s=1.9) == ["response-generator"]
+
+
+def test_overload_has_hysteresis(feed_path):
+    feed = ActorLoadFeed(str(feed_path), refresh_interval_s=0, recover_ratio=0.8)
+
+    def overloaded_at(queue_depth):
+        # One replica at 1s per ticket: wait = queue_depth + 1 seconds
+        write_feed(feed_path, generator_load(queue_depth))
+        return feed.overloaded(["response-generator"], max_wait_s=4.0) == ["response-generator"]
+
+    assert [overloaded_at(depth) for depth in (2, 4, 3, 2, 3)] == [False, True, True, False, False]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        None,  # missing file
+        "not json",
+        "[1, 2]",
+        json.dumps({"updated_at": 0, "actors": generator_load(50)}),  # stale
+        json.dumps({"actors": {"response-generator": {"service_time_ms": "slow", "queue_depth": 50}}}),
+        json.dumps({"actors": {"response-generator": 50}}),
+    ],
+)
+def test_missing_stale_or_malformed_feed_reports_no_load(feed_path, content):
+    if content is not None:
+        feed_path.write_text(content)
+    feed = ActorLoadFeed(str(feed_path))
+    assert feed.estimated_wait_s("response-generator") == 0.0
+    assert feed.overloaded(["response-generator"], max_wait_s=0.5) == []
+
+
+def test_feed_is_reread_only_after_the_refresh_interval(feed_path):
+    write_feed(feed_path, generator_load(0))
+    feed = ActorLoadFeed(str(feed_path), refresh_interval_s=60)
+    assert feed.overloaded(["response-generator"], max_wait_s=2.0) == []
+    write_feed(feed_path, generator_load(50))
+    assert feed.overloaded(["response-generator"], max_wait_s=2.0) == []
+    feed.refresh_interval_s = 0
+    assert feed.overloaded(["response-generator"], max_wait_s=2.0) == ["response-generator"]
+
+
+@pytest.fixture
+def load_aware_router(monkeypatch, feed_path):
+    monkeypatch.setenv("LOAD_AWARE_ROUTING", "true")
+    monkeypatch.setenv("ASYA_LOAD_METRICS_PATH", str(feed_path))
+    monkeypatch.setenv("LIGHT_RESPONSE_GENERATOR", "response-generator-light")
+    router = DecisionRouter()
+    router.load_feed.refresh_interval_s = 0
+    return router
+
+
+def route_ticket(router, urgency="low", confidence=0.95):
+    envelope = {
+        "payload": {
+            "intent": {"intent": "technical_support", "confidence": confidence},
+            "sentiment": {"urgency": urgency},
+            "customer_email": "a@example.com",
+        },
+        "route": {"actors": list(ROUTE), "current": 0},
+    }
+    return router.process(envelope)
+
+
+def test_overloaded_path_degrades_low_priority_confident_tickets(load_aware_router, feed_path):
+    write_feed(feed_path, {**generator_load(10), "context-retriever": {"service_time_ms": 3000, "queue_depth": 0}})
+    result = route_ticket(load_aware_router)
+    assert result["route"]["actors"] == ["decision-router", "response-generator-light", "response-aggregator"]
+    degradation = result["headers"]["degradation"]
+    assert degradation["applied"] == ["skip_complex_processing", "light_generator"]
+    assert set(degradation["overloaded"]) == {"response-generator", "context-retriever"}
+
+
+@pytest.mark.parametrize("urgency, confidence", [("high", 0.95), ("critical", 0.95), ("low", 0.5)])
+def test_urgent_or_uncertain_tickets_keep_the_full_path(load_aware_router, feed_path, urgency, confidence):
+    write_feed(feed_path, generator_load(10))
+    result = route_ticket(load_aware_router, urgency, confidence)
+    assert "response-generator-light" not in result["route"]["actors"]
+    assert "degradation" not in (result.get("headers") or {})
+
+
+def test_router_takes_the_full_path_without_load_metrics(load_aware_router, feed_path):
+    result = route_ticket(load_aware_router)
+    assert result["route"]["actors"] == ["decision-router", "context-retriever", "response-generator", "response-aggregator"]
+    assert "degradation" not in (result.get("headers") or {})
+
+    # A feed that goes stale stops degrading as well
+    write_feed(feed_path, generator_load(10), updated_at=time.time() - 3600)
+    assert "degradation" not in (route_ticket(load_aware_router).get("headers") or {})
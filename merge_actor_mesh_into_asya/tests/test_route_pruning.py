@@ -0,0 +1,59 @@
+"""Tests for route pruning: skippable actors are dropped only when nothing ahead can change the answer."""
+
+from handlers.decision_router import DecisionRouter
+from handlers.route_pruning import prune_route
+
+
+def anonymous_payload():
+    # No customer email and no order number: context-retriever has nothing to look up,
+    # and a general inquiry plans at most a customer note for execution-coordinator
+    return {"customer_message": "hello there", "intent": {"intent": "general_inquiry", "confidence": 0.9}}
+
+
+def test_skippable_actors_are_pruned():
+    route = {
+        "actors": ["decision-router", "context-retriever", "execution-coordinator", "response-generator", "response-aggregator"],
+        "current": 0,
+    }
+    assert prune_route(route, anonymous_payload(), 0) == ["context-retriever", "execution-coordinator"]
+    assert route["actors"] == ["decision-router", "response-generator", "response-aggregator"]
+
+
+def test_actor_whose_inputs_are_written_upstream_is_kept():
+    # intent-analyzer writes "intent", which context-retriever's predicate reads
+    route = {"actors": ["decision-router", "intent-analyzer", "context-retriever", "response-aggregator"], "current": 0}
+    assert prune_route(route, anonymous_payload(), 0) == []
+    assert route["actors"] == ["decision-router", "intent-analyzer", "context-retriever", "response-aggregator"]
+
+
+def test_unknown_actor_stops_pruning_beyond_it():
+    route = {"actors": ["decision-router", "custom-enricher", "context-retriever", "response-aggregator"], "current": 0}
+    assert prune_route(route, anonymous_payload(), 0) == []
+
+
+def test_actor_with_work_to_do_is_kept():
+    payload = dict(anonymous_payload(), customer_email="a@example.com")
+    route = {"actors": ["decision-router", "context-retriever", "response-aggregator"], "current": 0}
+    assert prune_route(route, payload, 0) == []
+
+
+def test_router_points_at_the_next_remaining_actor_after_pruning():
+    envelope = {
+        "payload": anonymous_payload(),
+        "route": {
+            "actors": ["intent-analyzer", "decision-router", "context-retriever", "response-generator", "response-aggregator"],
+            "current": 1,
+        },
+    }
+    result = DecisionRouter().process(envelope)
+    route = result["route"]
+    assert route["actors"] == ["intent-analyzer", "decision-router", "response-generator", "response-aggregator"]
+    assert route["actors"][route["current"]] == "response-generator"
+    assert result["headers"]["pruned_actors"] == ["context-retriever"]
+
+
+def test_route_keeps_a_next_hop_when_every_future_actor_is_skippable():
+    envelope = {"payload": anonymous_payload(), "route": {"actors": ["decision-router", "context-retriever"], "current": 0}}
+    route = DecisionRouter().process(envelope)["route"]
+    assert route == {"actors": ["decision-router", "context-retriever"], "current": 1}
+    assert "headers" not in envelope or not envelope["headers"].get("pruned_actors")